@@ -1,4 +1,8 @@
 # backend/app/__init__.py
+import time
+
+_IMPORT_T0 = time.perf_counter()
+
 import os
 from pathlib import Path
 from flask import Flask
@@ -6,8 +10,11 @@ from dotenv import load_dotenv  # ▶ đọc .env sớm
 from .config import Config
 from .extensions import db, migrate, cache, jwt, mail
 from .routes import register_blueprints
+from .cli import register_commands
+from .ai import registry as model_registry
 from datetime import datetime
-from huggingface_hub import login
+
+_IMPORT_MS = round((time.perf_counter() - _IMPORT_T0) * 1000, 1)
 
 # ── Paths
 APP_FILE = Path(__file__).resolve()
@@ -27,11 +34,16 @@ def register_models():
     from .models.otp import OTPVerification
     from .models.subscription import Subscription
     from .models.money_source import MoneySource
+    from .models.rollup import UserDailyTotal, UserMonthCategoryTotal
+    from .models.precompute import PrecomputedResult, PrecomputeRun
 
     return True
 
 
 def create_app(config_class: type[Config] | None = None):
+    t0 = time.perf_counter()
+    timings = {"import_ms": _IMPORT_MS}
+
     # ▶ nạp .env sớm để os.getenv(...) có giá trị
     load_dotenv()
 
@@ -91,7 +103,10 @@ def create_app(config_class: type[Config] | None = None):
         return {"success": False, "message": f"Token error: {str(error)}"}, 401
 
     # Blueprints
+    t_bp = time.perf_counter()
     register_blueprints(app)
+    register_commands(app)
+    timings["blueprints_ms"] = round((time.perf_counter() - t_bp) * 1000, 1)
     app.jinja_env.globals["now"] = datetime.now
 
     # ▶ Serve uploaded files (avatars)
@@ -113,12 +128,19 @@ def create_app(config_class: type[Config] | None = None):
         print(f"[SERVE] Exists: {os.path.exists(full_path)}")
         return send_from_directory(uploads_dir, filename)
 
+    from .utils import http_cache, sql_stats
+
+    sql_stats.init_app(app)
+
     @app.get("/healthz")
     def health_check():
         return {
             "status": "ok",
             "db": app.config.get("SQLALCHEMY_DATABASE_URI"),
             "cache": app.config.get("CACHE_TYPE", "disabled"),
+            "startup": app.extensions.get("startup_timings"),
+            "models": model_registry.status(),
+            "http_cache": http_cache.stats(),
         }, 200
 
     # --- Jinja filters: tiền VND & hiển thị +/- ---
@@ -136,9 +158,28 @@ def create_app(config_class: type[Config] | None = None):
     app.jinja_env.filters["vnd"] = format_vnd
     app.jinja_env.filters["samt"] = sign_amount
 
-    # HuggingFace login (cho huggingface_hub nếu cần)
+    # HuggingFace login (cho huggingface_hub nếu cần): chỉ chạy khi có
+    # code gọi model_registry.get("huggingface") hoặc khi preload
     hf_api_key = os.getenv("HF_API_KEY")
     if hf_api_key:
-        login(hf_api_key)
+
+        def _hf_login():
+            from huggingface_hub import login
+
+            login(hf_api_key)
+            return True
+
+        model_registry.register("huggingface", _hf_login)
+
+    # ▶ Preload model nặng nếu cấu hình MODEL_PRELOAD (vd. worker OCR riêng)
+    t_pre = time.perf_counter()
+    preloaded = model_registry.preload_from_env()
+    if preloaded:
+        timings["preload_ms"] = round((time.perf_counter() - t_pre) * 1000, 1)
+        timings["preloaded"] = preloaded
+
+    timings["create_app_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    app.extensions["startup_timings"] = timings
+    print(f"[INIT] Startup timings: {timings}")
 
     return app
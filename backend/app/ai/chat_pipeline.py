@@ -2,23 +2,18 @@
 
 
 
-import os
 import re
-import json
-import requests
 
-from datetime import date
-from ..models.expense import Expense
-from ..models.budget import Budget
-from ..models.category import Category
-from ..extensions import db
-from sqlalchemy import func
+from ..services import month_snapshot_service
 
-LAST_INTENT = {}
+# intent không có xử lý riêng -> trả lời bằng Groq (câu hỏi chung, cache dùng chung)
+GROQ_INTENTS = {"unknown", "small_talk", "ask_help"}
 
 from .classifier import predict_category_all
 from .nlp_rules import extract_amount_vnd, detect_tx_type, extract_saving_goal
 from .chatbot_intent import detect_intent
+from . import conversation_state, llm_cache, llm_gateway
+from .keyword_rules import BUDGET_CATEGORY, BUDGET_INCREMENT, CHAT_CATEGORY_FIX, INCOME_CATEGORY
 
 
 # ======================================================
@@ -131,50 +126,28 @@ Bạn đã sẵn sàng. Hãy luôn trả lời theo đúng JSON yêu cầu.
 
 """
 
-def call_groq(user_message: str):
-    api_key = os.getenv("GROQ_API_KEY")
-
-    if not api_key:
-        return {"message": "Thiếu GROQ_API_KEY trong .env"}
+def _groq_messages(user_message: str):
+    return [
+        {"role": "system", "content": SYSTEM_GROQ},
+        {"role": "user", "content": user_message}
+    ]
 
-    url = "https://api.groq.com/openai/v1/chat/completions"
-
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-
-    payload = {
-        "model": "llama-3.1-8b-instant",  # FREE + rất nhanh
-        "messages": [
-            {"role": "system", "content": SYSTEM_GROQ},
-            {"role": "user", "content": user_message}
-        ],
-        "temperature": 0.2
-    }
 
+def call_groq(user_message: str):
+    # llama-3.1-8b-instant: FREE + rất nhanh (model đổi qua env GROQ_MODEL)
+    # câu hỏi chung, không kèm dữ liệu user -> cache dùng chung mọi user
     try:
-        r = requests.post(url, json=payload, headers=headers)
-        data = r.json()
+        raw = llm_cache.chat("groq", _groq_messages(user_message), temperature=0.2)
+    except llm_gateway.LlmError as e:
+        return {"message": str(e)}
 
-        # Nếu API trả lỗi
-        if "error" in data:
-            return {"message": f"AI lỗi: {data['error']}"}
+    # Nếu AI trả JSON: parse, trả text thì đưa vào message
+    return llm_gateway.parse_json_reply(raw)
 
-        if "choices" not in data:
-            return {"message": f"Kết quả không hợp lệ: {data}"}
 
-        raw = data["choices"][0]["message"]["content"]
-
-        # Nếu AI trả JSON: parse
-        try:
-            return json.loads(raw)
-        except:
-            # Nếu trả text: đưa vào message
-            return {"message": raw}
-
-    except Exception as e:
-        return {"message": f"Lỗi AI nội bộ: {e}"}
+def stream_groq(user_message: str):
+    """Sinh từng đoạn text Groq trả về (LlmError nếu lỗi)."""
+    return llm_cache.stream("groq", _groq_messages(user_message), temperature=0.2)
 
 
 # ======================================================
@@ -185,91 +158,44 @@ def clean_text(s: str):
 
 #update 
 def fix_category_by_rules(text, ai_category):
-    t = text.lower()
-
-        # --- THU NHẬP ---
-    if any(k in t for k in ["gửi", "gui", "nhận", "nhan", "học bổng", "hoc bong"]):
-        return "Khác (income)"
-    if any(k in t for k in ["lương", "luong", "thưởng", "thuong"]):
-        return "Lương"
-
-    # --- mua sắm ---
-    if any(k in t for k in ["siêu thị", "sieu thi", "mua đồ", "mua do", "shopee", "tiki"]):
-        return "Mua sắm"
-
-    # --- hóa đơn điện / nước ---
-    if any(k in t for k in ["tiền điện", "tien dien", "điện", "dien", "nước", "nuoc"]):
-        return "Khác (expense)"
-
-    # --- phòng trọ / nhà ở ---
-    if any(k in t for k in ["tiền phòng", "tien phong", "phòng trọ", "phong tro", "tiền nhà", "tien nha"]):
-        return "Nhà ở"
-
-    return ai_category
+    # thu nhập > mua sắm > điện nước > nhà ở (keyword_rules.CHAT_CATEGORY_FIX)
+    return CHAT_CATEGORY_FIX.first(text, default=ai_category)
 
 def get_budget_status(user_id):
-    today = date.today()
-    month = today.month
-    year = today.year
-
-    # tổng chi tháng
-    spent = (
-        db.session.query(func.coalesce(func.sum(Expense.amount), 0))
-        .filter(
-            Expense.user_id == user_id,
-            Expense.spent_at >= date(year, month, 1),
-            Expense.spent_at <= today,
-        )
-        .scalar()
-    )
-
-    # tổng ngân sách tháng
-    budget = (
-        db.session.query(func.coalesce(func.sum(Budget.limit_amount), 0))
-        .filter(
-            Budget.user_id == user_id,
-            Budget.period_year == year,
-            Budget.period_month == month,
-        )
-        .scalar()
-    )
-
-    return float(spent), float(budget)
+    # tổng chi + tổng ngân sách tháng này (snapshot, không query DB mỗi lượt chat)
+    snap = month_snapshot_service.get(user_id)
+    return snap["spent"], snap["budget"]
 
 
 def get_top_spending_category(user_id):
-    today = date.today()
-    month = today.month
-    year = today.year
-
-    row = (
-        db.session.query(
-            Category.name,
-            func.sum(Expense.amount).label("total")
-        )
-        .join(Category, Category.id == Expense.category_id)
-        .filter(
-            Expense.user_id == user_id,
-            Expense.spent_at >= date(year, month, 1),
-            Expense.spent_at <= today,
-            Category.type == "expense"
-        )
-        .group_by(Category.name)
-        .order_by(func.sum(Expense.amount).desc())
-        .first()
-    )
-
-    if row:
-        return row.name, float(row.total)
+    top = month_snapshot_service.get(user_id)["top_categories"]
+    if top:
+        return top[0]["name"], top[0]["total"]
     return None, 0.0
 
 # ======================================================
 # MAIN PROCESSOR
 # ======================================================
-def process_chat_message(user_id, user_message):
+def _resolve_intent(user_id, original_text):
+    """Nhận diện intent có xét lượt trước của user, rồi ghi lượt này vào conversation_state."""
+    intent, _ = detect_intent(original_text)
+
+    if intent in ["confirm_yes", "confirm_no"]:
+        return intent
+
+    # Nếu câu trước là ask_report → ép follow-up về ask_report
+    if intent == "unknown" and conversation_state.last_intent(user_id) == "ask_report":
+        intent = "ask_report"
+
+    # Lưu intent hiện tại để xử lý follow-up
+    conversation_state.record(user_id, intent, original_text)
+    return intent
+
+
+def process_chat_message(user_id, user_message, intent=None):
     """
     TRÌNH XỬ LÝ CHÍNH CHO CHATBOT
-    - Bắt intent
+    - Bắt intent (intent truyền vào: đã nhận diện + ghi state ở nơi gọi)
     - Phân tích NLP
     - Phân loại ML
     - Nếu intent unknown → gọi AI (GROQ)
@@ -277,7 +203,8 @@ def process_chat_message(user_id, user_message):
     original_text = user_message.strip()
     text = clean_text(original_text)
 
-    intent, info = detect_intent(original_text)
+    if intent is None:
+        intent = _resolve_intent(user_id, original_text)
 
     if intent in ["confirm_yes", "confirm_no"]:
         return {
@@ -285,14 +212,6 @@ def process_chat_message(user_id, user_message):
             "message": intent  # trả về đơn giản cho FE xử lý
         }
 
-    global LAST_INTENT
-    # Lưu intent hiện tại để xử lý follow-up
-    LAST_INTENT[user_id] = intent
-
-    # Nếu câu trước là ask_report → ép follow-up về ask_report
-    if LAST_INTENT.get(user_id) == "ask_report" and intent == "unknown":
-        intent = "ask_report"
-
 
     # =====================================================
     # 1. SET BUDGET
@@ -302,30 +221,12 @@ def process_chat_message(user_id, user_message):
         amount = extract_amount_vnd(text)
 
         # ===== RULE: Nhận diện danh mục ngân sách =====
-        if "ăn uống" in t or "an uong" in t:
-            budget_category = "Ăn uống"
-
-        elif "di chuyển" in t or "di chuyen" in t:
-            budget_category = "Di chuyển"
-
-        elif "học tập" in t or "hoc tap" in t or "sách vở" in t:
-            budget_category = "Học tập"
-
-        elif "xem phim" in t or "giải trí" in t:
-            budget_category = "Giải trí"
-
-        elif "nhà ở" in t or "nha o" in t or "phòng trọ" in t \
-            or "phong tro" in t or "tiền phòng" in t or "tien phong" in t \
-            or "thuê phòng" in t or "thue phong" in t:
-            budget_category = "Nhà ở"
-
-        else:
-            budget_category = "Khác (expense)"
+        budget_category = BUDGET_CATEGORY.first(t, default="Khác (expense)")
 
         category_id = CATEGORY_MAP.get(budget_category, 12)
 
         # ===== RULE: Nếu câu có từ "thêm / tăng / cộng" thì hiểu là tăng ngân sách =====
-        is_increment = any(kw in t for kw in ["thêm", "them", "tăng", "tang", "cộng", "cong"])
+        is_increment = BUDGET_INCREMENT.any(t)
 
         # Câu xác nhận tự nhiên hơn
         if is_increment:
@@ -418,12 +319,7 @@ def process_chat_message(user_id, user_message):
         amount = extract_amount_vnd(text)
         t = text.lower()
 
-        if "lương" in t or "luong" in t:
-            income_category = "Lương"
-        elif "học bổng" in t or "hoc bong" in t:
-            income_category = "Học bổng"
-        else:
-            income_category = "Khác (income)"
+        income_category = INCOME_CATEGORY.first(t, default="Khác (income)")
 
         return {
             "intent": "add_transaction",
@@ -479,6 +375,15 @@ def process_chat_message(user_id, user_message):
         # Ví dụ "tháng 12/2025" hoặc "tháng 11"
         month_year = re.findall(r"tháng\s*(\d{1,2})(?:/(\d{4}))?", original_text.lower())
 
+        # tháng hiện tại -> trả lời từ snapshot (không query DB)
+        if month_year or "tháng này" in t or "thang nay" in t:
+            this_month = month_snapshot_service.get(user_id)
+            if not month_year or (
+                f"{month_year[0][1] or this_month['month'][:4]}-{int(month_year[0][0]):02d}"
+                == this_month["month"]
+            ):
+                return _month_report(this_month)
+
         if month_year:
             month = int(month_year[0][0])
             year = int(month_year[0][1]) if month_year[0][1] else 2025
@@ -521,12 +426,48 @@ def process_chat_message(user_id, user_message):
 # 7. ASK ANALYSIS (Qwen 2.5 phân tích tài chính)
 # =====================================================
     if intent == "ask_analysis":
-        # 1) lấy dữ liệu thật
-        spent, budget = get_budget_status(user_id)
-        cat_name, cat_total = get_top_spending_category(user_id)
+        # gọi Qwen (dùng API Ollama hoặc Huggingface tùy bạn)
+        from .qwen_client import call_qwen
+        ai_res = call_qwen(_analysis_prompt(user_id, user_message), user_id=user_id)
+
+        # trả lại JSON cho FE (chat UI)
+        return _analysis_result(ai_res)
+
+    # =====================================================
+    # 8. KHÔNG CÓ RULE → hỏi AI (GROQ)
+    # =====================================================
+    if intent in GROQ_INTENTS:
+        return call_groq(original_text)
+
+
+def _month_report(snap):
+    """Báo cáo tháng hiện tại từ month_snapshot_service (kèm meta độ cũ)."""
+    y, m = snap["month"].split("-")
+    vnd = lambda v: f"{v:,.0f}đ".replace(",", ".")
+    analysis = f"Chi tiêu của bạn trong tháng {int(m)}/{y} là {vnd(snap['spent'])}"
+    if snap["budget"] > 0:
+        analysis += f" / ngân sách {vnd(snap['budget'])} (còn {vnd(snap['remaining'])})"
+    analysis += "."
+    if snap["top_categories"]:
+        analysis += " Chi nhiều nhất: " + ", ".join(
+            f"{c['name']} {vnd(c['total'])}" for c in snap["top_categories"][:3]
+        ) + "."
+    return {
+        "intent": "ask_report",
+        "analysis": analysis,
+        "message": f"Mình đã tổng hợp chi tiêu theo danh mục cho tháng {int(m)}/{y}.",
+        "data": {k: v for k, v in snap.items() if k != "meta"},
+        "snapshot": snap["meta"],
+    }
+
+
+def _analysis_prompt(user_id, user_message):
+    # 1) lấy dữ liệu thật
+    spent, budget = get_budget_status(user_id)
+    cat_name, cat_total = get_top_spending_category(user_id)
 
-        # 2) chuẩn bị prompt gửi sang Qwen 2.5
-        prompt = f"""
+    # 2) chuẩn bị prompt gửi sang Qwen 2.5
+    return f"""
     Dữ liệu tháng này của người dùng:
     - Tổng chi tiêu: {spent} VND
     - Ngân sách: {budget} VND
@@ -542,18 +483,46 @@ def process_chat_message(user_id, user_message):
     Không dùng markdown.
     """
 
-        # 3) gọi Qwen (dùng API Ollama hoặc Huggingface tùy bạn)
-        from .qwen_client import call_qwen
-        ai_res = call_qwen(prompt)
 
-        # nếu Qwen fail → fallback
-        if not isinstance(ai_res, dict):
-            ai_res = {
-                "analysis": "Không thể phân tích bằng AI.",
-                "message": "Bạn thử hỏi lại giúp mình nha."
-            }
+def _analysis_result(ai_res):
+    # nếu Qwen fail → fallback
+    if not isinstance(ai_res, dict):
+        ai_res = {
+            "analysis": "Không thể phân tích bằng AI.",
+            "message": "Bạn thử hỏi lại giúp mình nha."
+        }
+    return ai_res
 
-        # 4) trả lại JSON cho FE (chat UI)
-        return ai_res
 
-    
+def stream_chat_message(user_id, user_message):
+    """
+    Như process_chat_message nhưng sinh sự kiện (event, data) cho SSE:
+    - ("token", {"text": ...}) từng đoạn câu trả lời khi intent cần gọi LLM
+    - ("result", {...}) kết quả cuối, cùng định dạng process_chat_message
+    Intent xử lý bằng rule chỉ có 1 sự kiện "result".
+    """
+    original_text = user_message.strip()
+    intent = _resolve_intent(user_id, original_text)
+    if intent == "ask_analysis":
+        from .qwen_client import stream_qwen
+
+        chunks = stream_qwen(_analysis_prompt(user_id, user_message), user_id=user_id)
+        error_prefix = "Lỗi gọi Qwen: "
+    elif intent in GROQ_INTENTS:
+        chunks = stream_groq(original_text)
+        error_prefix = ""
+    else:
+        yield "result", process_chat_message(user_id, user_message, intent=intent)
+        return
+
+    parts = []
+    try:
+        for text in chunks:
+            parts.append(text)
+            yield "token", {"text": text}
+    except llm_gateway.LlmError as e:
+        yield "result", {"message": f"{error_prefix}{e}"}
+        return
+
+    result = llm_gateway.parse_json_reply("".join(parts))
+    yield "result", _analysis_result(result) if intent == "ask_analysis" else result
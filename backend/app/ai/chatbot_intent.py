@@ -1,4 +1,17 @@
+import csv
+import json
 import re
+import time
+from pathlib import Path
+
+try:  # Python 3.11+
+    import re._constants as sre_constants
+    import re._parser as sre_parse
+except ImportError:
+    import sre_constants
+    import sre_parse
+
+from .keyword_engine import KeywordTable
 
 INTENT_PATTERNS = {
     "income_transaction": [
@@ -36,12 +49,6 @@ INTENT_PATTERNS = {
     r"(tiết kiệm).*đi.*(triệu|nghìn|ngàn|k|đ)",
     r"(tiết kiệm).*cho.*(triệu|nghìn|ngàn|k|đ)",
     r"(mục tiêu tiết kiệm).*(triệu|nghìn|ngàn|k|đ)",
-    r"(tiết kiệm).*mục tiêu.*(triệu|nghìn|ngàn|k|đ)",
-    r"(tiết kiệm).*để.*(triệu|nghìn|ngàn|k|đ)",
-    r"(tiết kiệm).*mua.*(triệu|nghìn|ngàn|k|đ)",
-    r"(tiết kiệm).*đi.*(triệu|nghìn|ngàn|k|đ)",
-    r"(tiết kiệm).*cho.*(triệu|nghìn|ngàn|k|đ)",
-    r"(mục tiêu tiết kiệm).*\d+[kK]?",
     ],
 
 
@@ -112,46 +119,163 @@ INTENT_PATTERNS = {
     ],
 }
 
+
+YES_WORDS = {"đúng", "dung", "đồng ý", "dong y", "ok", "oke", "yes", "ừ", "uh"}
+NO_WORDS = {"không", "ko", "k", "no", "không đồng ý"}
+
+
+class IntentEngine:
+    """
+    Compile INTENT_PATTERNS 1 lần lúc import:
+      - pattern trùng bị loại, các pattern của 1 intent gộp thành 1 regex
+        alternation -> tối đa 1 re.search / intent thay vì 1 / pattern;
+      - lọc trước bằng literal: chuỗi chữ cố định mà mỗi pattern bắt buộc
+        bắt đầu bằng (vd "tiết kiệm", "ngân sách") được gom vào 1
+        KeywordTable -> 1 lượt quét tin nhắn cho biết intent nào còn khả năng
+        khớp; intent không có literal nào xuất hiện bị bỏ qua, không chạy regex.
+
+    detect() cho cùng kết quả với vòng lặp cũ (intent đầu tiên theo thứ tự
+    khai báo có pattern khớp); scores() trả mọi intent khớp.
+    """
+
+    def __init__(self, patterns: dict):
+        self.intents = list(patterns)
+        self.pattern_count = 0
+        self._regex = []
+        gated, rules = set(), []
+        for i, pats in enumerate(patterns.values()):
+            uniq = list(dict.fromkeys(pats))
+            self.pattern_count += len(uniq)
+            self._regex.append(re.compile("|".join(f"(?:{p})" for p in uniq)))
+
+            literals = set()
+            for p in uniq:
+                lits = _leading_literals(p)
+                if lits is None:  # pattern không có literal đầu -> luôn phải chạy regex
+                    break
+                literals |= lits
+            else:
+                gated.add(i)
+                rules.append((i, sorted(literals)))
+
+        self._always = [i for i in range(len(self.intents)) if i not in gated]
+        self._gate = KeywordTable(rules)
+
+    def _candidates(self, text_lower: str) -> list[int]:
+        return sorted(self._gate.labels(text_lower).union(self._always))
+
+    def detect(self, text_lower: str) -> str:
+        for i in self._candidates(text_lower):
+            if self._regex[i].search(text_lower):
+                return self.intents[i]
+        return "unknown"
+
+    def scores(self, text_lower: str) -> dict:
+        hit = {i for i in self._candidates(text_lower) if self._regex[i].search(text_lower)}
+        return {name: int(i in hit) for i, name in enumerate(self.intents)}
+
+
+def _leading_literals(pattern: str) -> set[str] | None:
+    r"""
+    Các chuỗi literal mà mọi match của pattern phải bắt đầu bằng, vd
+    r"\b(mua|ăn)\b" -> {"mua", "ăn"}. None nếu không xác định được.
+    """
+    try:
+        return _literal_prefixes(sre_parse.parse(pattern))
+    except re.error:
+        return None
+
+
+def _literal_prefixes(items) -> set[str] | None:
+    buf = ""
+    for op, av in items:
+        if op is sre_constants.AT and not buf:
+            continue  # \b, ^ ở đầu không chiếm ký tự
+        if op is sre_constants.LITERAL:
+            buf += chr(av)
+            continue
+        if op is sre_constants.SUBPATTERN and not (av[1] or av[2]):  # không có inline flag
+            sub = _literal_prefixes(av[3])
+        elif op is sre_constants.BRANCH:
+            subs = [_literal_prefixes(b) for b in av[1]]
+            sub = None if any(x is None for x in subs) else set().union(*subs)
+        else:
+            break
+        if sub is None:
+            break
+        return {buf + x for x in sub}
+    return {buf} if buf else None
+
+
+ENGINE = IntentEngine(INTENT_PATTERNS)
+
+
 def detect_intent(text: str):
     text_lower = text.lower().strip()
 
-    # ============================
-    # CONFIRM YES (chỉ khi user trả lời ngắn)
-    # ============================
-    yes_words = ["đúng", "dung", "đồng ý", "dong y", "ok", "oke", "yes", "ừ", "uh"]
-    if text_lower in yes_words:
+    # confirm yes / no: chỉ khi user trả lời ngắn
+    if text_lower in YES_WORDS:
         return "confirm_yes", {}
-
-    # ============================
-    # CONFIRM NO (chỉ khi trả lời ngắn)
-    # ============================
-    no_words = ["không", "ko", "k", "no", "không đồng ý"]
-    if text_lower in no_words:
+    if text_lower in NO_WORDS:
         return "confirm_no", {}
 
-    # ============================
-    # MATCH INTENT RULES
-    # ============================
-    for intent, patterns in INTENT_PATTERNS.items():
-        for p in patterns:
-            if re.search(p, text_lower):
-                return intent, {}
+    return ENGINE.detect(text_lower), {}
 
-    return "unknown", {}
 
+# ======================================================
+# Benchmark
+# ======================================================
+DEFAULT_CORPUS = Path(__file__).resolve().parents[2] / "chatbot_test_full.csv"
 
-    # =======================
-    # CONFIRM NO
-    # =======================
-    no_words = ["không", "k", "ko", "khong", "no", "không đồng ý"]
-    if any(w in text_lower for w in no_words):
-        return "confirm_no", {}
 
-    text_lower = text.lower()
+def load_messages(path=None) -> list[str]:
+    """
+    Tin nhắn mẫu để benchmark:
+      .csv   -> cột "input" (tự nhận dấu phân cách , hoặc ;)
+      .jsonl -> title + body của mỗi dòng (vd requests.jsonl)
+      khác   -> mỗi dòng 1 tin nhắn
+    """
+    path = Path(path) if path else DEFAULT_CORPUS
+    raw = path.read_text(encoding="utf-8-sig")
+    if path.suffix == ".csv":
+        dialect = csv.Sniffer().sniff(raw.splitlines()[0], delimiters=",;")
+        return [r["input"] for r in csv.DictReader(raw.splitlines(), dialect=dialect) if r.get("input")]
+    if path.suffix == ".jsonl":
+        out = []
+        for line in raw.splitlines():
+            if line.strip():
+                row = json.loads(line)
+                out += [v for v in (row.get("title"), row.get("body")) if v]
+        return out
+    return [line for line in raw.splitlines() if line.strip()]
 
+
+def _detect_naive(text_lower: str) -> str:
+    """Cách cũ: re.search lần lượt từng pattern (chỉ dùng làm mốc benchmark)."""
     for intent, patterns in INTENT_PATTERNS.items():
         for p in patterns:
             if re.search(p, text_lower):
-                return intent, {}
-
+                return intent
     return "unknown"
+
+
+def benchmark(messages: list[str], repeat: int = 20) -> dict:
+    texts = [m.lower().strip() for m in messages]
+
+    def rate(fn):
+        t = time.perf_counter()
+        for _ in range(repeat):
+            for s in texts:
+                fn(s)
+        return len(texts) * repeat / (time.perf_counter() - t)
+
+    naive = rate(_detect_naive)
+    compiled = rate(ENGINE.detect)
+    return {
+        "messages": len(texts),
+        "patterns": ENGINE.pattern_count,
+        "naive_msgs_per_s": round(naive),
+        "compiled_msgs_per_s": round(compiled),
+        "speedup": round(compiled / naive, 2),
+        "mismatches": sum(_detect_naive(s) != ENGINE.detect(s) for s in texts),
+    }
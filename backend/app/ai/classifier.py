@@ -1,28 +1,208 @@
 import pickle
-import unidecode
+import re
+import threading
+from collections import OrderedDict
 from pathlib import Path
 
+import unidecode
+
+from . import registry
+
 # Lấy đường dẫn thư mục chứa file này: backend/app/ai/
 BASE_DIR = Path(__file__).resolve().parent
 
-# Đường dẫn tuyệt đối đến classifier.pkl
+# Đường dẫn tuyệt đối đến classifier.pkl (pipeline sklearn gốc)
 MODEL_PATH = BASE_DIR / "classifier.pkl"
+# Bản export gọn: vocabulary + idf + trọng số LogisticRegression (NumPy)
+WEIGHTS_PATH = BASE_DIR / "classifier.npz"
+
+CACHE_SIZE = 4096
 
-# Load model
-with open(MODEL_PATH, "rb") as f:
-    model = pickle.load(f)
 
 def normalize(text: str):
     return unidecode.unidecode(text.lower().strip())
 
-def predict_category_all(text):
-    clean = normalize(text)
 
-    labels = model.classes_
-    probs = model.predict_proba([clean])[0]
+class ClassifierService:
+    """
+    TF-IDF (ngram 1-2) + LogisticRegression chấm điểm thuần NumPy.
+
+    Tái hiện đúng TfidfVectorizer (token_pattern mặc định, smooth idf,
+    chuẩn hoá l2) và predict_proba của LogisticRegression (softmax), nhưng
+    không cần unpickle sklearn. Cả batch được vector hoá trong 1 lần:
+    mỗi text chỉ đóng góp các cột term có mặt (ma trận thưa dạng COO).
+    Kết quả theo text đã normalize được giữ trong LRU cache.
+    """
+
+    TOKEN_RE = re.compile(r"(?u)\b\w\w+\b")
+
+    def __init__(self, terms, idf, coef, intercept, classes, ngram_range=(1, 2), cache_size=CACHE_SIZE):
+        import numpy as np
+
+        self.vocab = {t: i for i, t in enumerate(terms)}
+        self.idf = np.asarray(idf, dtype=np.float64)
+        # (n_features, n_classes): lấy hàng theo term index khi chấm điểm
+        self.coef_t = np.ascontiguousarray(np.asarray(coef, dtype=np.float64).T)
+        self.intercept = np.asarray(intercept, dtype=np.float64)
+        self.classes = [str(c) for c in classes]
+        self.ngram_range = tuple(ngram_range)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # ---------- load / export ----------
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        tfidf, clf = pipeline.steps[0][1], pipeline.steps[-1][1]
+        vocab = tfidf.vocabulary_
+        terms = sorted(vocab, key=vocab.get)
+        return cls(terms, tfidf.idf_, clf.coef_, clf.intercept_, clf.classes_, tfidf.ngram_range)
+
+    @classmethod
+    def from_npz(cls, path):
+        import numpy as np
+
+        with np.load(path, allow_pickle=False) as d:
+            return cls(
+                d["terms"].tolist(),
+                d["idf"],
+                d["coef"],
+                d["intercept"],
+                d["classes"].tolist(),
+                tuple(d["ngram_range"].tolist()),
+            )
+
+    def export_npz(self, path):
+        import numpy as np
+
+        terms = sorted(self.vocab, key=self.vocab.get)
+        np.savez_compressed(
+            path,
+            terms=np.array(terms),
+            idf=self.idf,
+            coef=self.coef_t.T,
+            intercept=self.intercept,
+            classes=np.array(self.classes),
+            ngram_range=np.array(self.ngram_range),
+        )
+
+    # ---------- scoring ----------
+    def _features(self, clean: str) -> dict:
+        """term index -> số lần xuất hiện (giống CountVectorizer word ngrams)."""
+        tokens = self.TOKEN_RE.findall(clean)
+        lo, hi = self.ngram_range
+        counts = {}
+        for n in range(lo, hi + 1):
+            for i in range(len(tokens) - n + 1):
+                j = self.vocab.get(" ".join(tokens[i:i + n]))
+                if j is not None:
+                    counts[j] = counts.get(j, 0) + 1
+        return counts
+
+    def _proba(self, cleans: list[str]):
+        import numpy as np
+
+        rows, cols, vals = [], [], []
+        for r, clean in enumerate(cleans):
+            for j, c in self._features(clean).items():
+                rows.append(r)
+                cols.append(j)
+                vals.append(c)
+        rows = np.asarray(rows, dtype=np.intp)
+        cols = np.asarray(cols, dtype=np.intp)
+        vals = np.asarray(vals, dtype=np.float64) * self.idf[cols]
+
+        # chuẩn hoá l2 theo từng text
+        norms = np.zeros(len(cleans))
+        np.add.at(norms, rows, vals ** 2)
+        norms = np.sqrt(norms)
+        vals = vals / np.where(norms[rows] > 0, norms[rows], 1.0)
+
+        scores = np.tile(self.intercept, (len(cleans), 1))
+        np.add.at(scores, rows, self.coef_t[cols] * vals[:, None])
+
+        scores -= scores.max(axis=1, keepdims=True)
+        np.exp(scores, out=scores)
+        scores /= scores.sum(axis=1, keepdims=True)
+        return scores
+
+    def predict_proba_many(self, texts) -> list[tuple]:
+        """Xác suất theo self.classes cho từng text (1 lượt vector hoá cho các text chưa cache)."""
+        cleans = [normalize(t or "") for t in texts]
+        out = [None] * len(cleans)
+        missing = {}
+        with self._lock:
+            for i, c in enumerate(cleans):
+                hit = self._cache.get(c)
+                if hit is not None:
+                    self._cache.move_to_end(c)
+                    out[i] = hit
+                    self.hits += 1
+                else:
+                    missing.setdefault(c, []).append(i)
+                    self.misses += 1
+
+        if missing:
+            keys = list(missing)
+            probs = self._proba(keys)
+            with self._lock:
+                for k, p in zip(keys, probs):
+                    p = tuple(float(x) for x in p)
+                    for i in missing[k]:
+                        out[i] = p
+                    self._cache[k] = p
+                    self._cache.move_to_end(k)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return out
+
+    def predict_many(self, texts) -> list[tuple[str, float]]:
+        """(label, prob) có xác suất cao nhất cho từng text."""
+        result = []
+        for probs in self.predict_proba_many(texts):
+            k = max(range(len(probs)), key=probs.__getitem__)
+            result.append((self.classes[k], probs[k]))
+        return result
+
+    def cache_info(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._cache)}
+
+
+def _load_pipeline():
+    # unpickle kéo theo sklearn -> chỉ dùng khi chưa có bản export .npz
+    with open(MODEL_PATH, "rb") as f:
+        return pickle.load(f)
+
+
+def _load_model():
+    if WEIGHTS_PATH.exists():
+        return ClassifierService.from_npz(WEIGHTS_PATH)
+    return ClassifierService.from_pipeline(_load_pipeline())
+
+
+registry.register("classifier", _load_model)
+
+
+def export_weights(path=WEIGHTS_PATH):
+    """Export classifier.pkl sang classifier.npz (gọi lại sau mỗi lần train)."""
+    ClassifierService.from_pipeline(_load_pipeline()).export_npz(path)
+    return path
+
+
+def predict_many(texts):
+    """Batch: list (label, prob) cho từng text."""
+    return registry.get("classifier").predict_many(texts)
+
+
+def predict_category_all(text):
+    model = registry.get("classifier")
+    probs = model.predict_proba_many([text])[0]
 
     result = []
-    for label, p in zip(labels, probs):
+    for label, p in zip(model.classes, probs):
         result.append({
             "label": label,
             "prob": float(p)
@@ -35,9 +215,4 @@ def predict_category(text):
     Trả về (label, prob) dạng tuple đơn giản.
     Dùng trong NLP parser để map category.
     """
-    all_preds = predict_category_all(text)
-    if not all_preds:
-        return None, 0.0
-
-    top = all_preds[0]
-    return top["label"], top["prob"]
+    return predict_many([text])[0]
@@ -0,0 +1,185 @@
+# backend/app/ai/conversation_state.py
+"""
+Trạng thái hội thoại chatbot theo user (thay cho dict LAST_INTENT toàn cục).
+
+Mỗi user giữ: intent gần nhất + lịch sử tối đa CHAT_STATE_HISTORY lượt
+({intent, text, at}, text cắt còn CHAT_STATE_TEXT_MAX ký tự). Hết hạn sau
+CHAT_STATE_TTL giây không hoạt động.
+
+Backend chọn qua env CHAT_STATE_BACKEND:
+  - "memory": LRU trong tiến trình, tối đa CHAT_STATE_MAX_USERS user
+    (chỉ đúng khi chạy 1 worker)
+  - "cache":  Flask-Caching (Redis / memcached ... chia sẻ giữa worker)
+  - "sqlite": file instance/chat_state.sqlite3 (nhiều worker trên 1 máy)
+  - "auto" (mặc định): "cache" nếu app có CACHE_TYPE, ngược lại "sqlite"
+Cần app context với backend "cache" / "sqlite".
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from flask import current_app
+
+from ..extensions import cache
+
+CHAT_STATE_BACKEND = os.getenv("CHAT_STATE_BACKEND", "auto")
+CHAT_STATE_TTL = int(os.getenv("CHAT_STATE_TTL", "1800"))
+CHAT_STATE_HISTORY = int(os.getenv("CHAT_STATE_HISTORY", "10"))
+CHAT_STATE_MAX_USERS = int(os.getenv("CHAT_STATE_MAX_USERS", "10000"))
+CHAT_STATE_TEXT_MAX = 200
+
+
+class MemoryStore:
+    name = "memory"
+
+    def __init__(self, max_users: int = CHAT_STATE_MAX_USERS):
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+
+    def load(self, uid: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(uid)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[uid]
+                return None
+            self._entries.move_to_end(uid)
+            return entry[1]
+
+    def save(self, uid: str, state: dict, ttl: int):
+        with self._lock:
+            self._entries[uid] = (time.time() + ttl, state)
+            self._entries.move_to_end(uid)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def delete(self, uid: str):
+        with self._lock:
+            self._entries.pop(uid, None)
+
+    def size(self) -> int | None:
+        return len(self._entries)
+
+
+class FlaskCacheStore:
+    name = "cache"
+
+    def load(self, uid: str) -> dict | None:
+        return cache.get(f"chat_state:{uid}")
+
+    def save(self, uid: str, state: dict, ttl: int):
+        cache.set(f"chat_state:{uid}", state, timeout=ttl)
+
+    def delete(self, uid: str):
+        cache.delete(f"chat_state:{uid}")
+
+    def size(self) -> int | None:
+        return None  # backend cache không hỗ trợ đếm
+
+
+class SqliteStore:
+    name = "sqlite"
+    PURGE_EVERY = 200  # số lần ghi giữa 2 lần xoá bản ghi hết hạn
+
+    def __init__(self, path: str | Path | None = None):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.path is None:
+                self.path = Path(current_app.instance_path) / "chat_state.sqlite3"
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chat_state ("
+                " user_id TEXT PRIMARY KEY, state TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def load(self, uid: str) -> dict | None:
+        row = self._conn().execute(
+            "SELECT state FROM chat_state WHERE user_id = ? AND expires_at > ?",
+            (uid, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, uid: str, state: dict, ttl: int):
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO chat_state (user_id, state, expires_at) VALUES (?, ?, ?)"
+            " ON CONFLICT(user_id) DO UPDATE SET state = excluded.state, expires_at = excluded.expires_at",
+            (uid, json.dumps(state, ensure_ascii=False), now + ttl),
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM chat_state WHERE expires_at <= ?", (now,))
+
+    def delete(self, uid: str):
+        self._conn().execute("DELETE FROM chat_state WHERE user_id = ?", (uid,))
+
+    def size(self) -> int | None:
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM chat_state WHERE expires_at > ?", (time.time(),)
+        ).fetchone()[0]
+
+
+STORES = {"memory": MemoryStore, "cache": FlaskCacheStore, "sqlite": SqliteStore}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                name = CHAT_STATE_BACKEND
+                if name == "auto":
+                    name = "cache" if "cache" in current_app.extensions else "sqlite"
+                if name not in STORES:
+                    raise ValueError(f"CHAT_STATE_BACKEND không hợp lệ: {name} (hỗ trợ: auto, {', '.join(STORES)})")
+                _store = STORES[name]()
+    return _store
+
+
+# ----------------- public -----------------
+def get(user_id) -> dict:
+    return get_store().load(str(user_id)) or {"last_intent": None, "history": []}
+
+
+def last_intent(user_id) -> str | None:
+    return get(user_id)["last_intent"]
+
+
+def record(user_id, intent: str, text: str) -> dict:
+    """Ghi 1 lượt chat (giữ CHAT_STATE_HISTORY lượt gần nhất), gia hạn TTL."""
+    state = get(user_id)
+    history = state["history"][-(CHAT_STATE_HISTORY - 1):] if CHAT_STATE_HISTORY > 1 else []
+    history.append({"intent": intent, "text": (text or "")[:CHAT_STATE_TEXT_MAX], "at": int(time.time())})
+    state = {"last_intent": intent, "history": history}
+    get_store().save(str(user_id), state, CHAT_STATE_TTL)
+    return state
+
+
+def clear(user_id):
+    get_store().delete(str(user_id))
+
+
+def stats() -> dict:
+    store = get_store()
+    return {"backend": store.name, "users": store.size(), "ttl": CHAT_STATE_TTL}
@@ -0,0 +1,135 @@
+# backend/app/ai/keyword_engine.py
+"""
+Bộ so khớp từ khoá dùng chung cho các rule map danh mục / phương thức
+thanh toán / loại giao dịch.
+
+Mỗi bảng rule được compile 1 lần lúc import thành:
+  - 1 regex gộp mọi từ khoá (dựng từ trie, tiền tố chung được gộp) -> quét
+    text 1 lượt (trong C) để tìm các vị trí có từ khoá bắt đầu;
+  - 1 trie ký tự -> tại mỗi vị trí đó liệt kê đủ mọi từ khoá khớp (kể cả
+    các từ khoá chồng lên nhau, vd "tiền điện" và "điện").
+Chi phí ~ O(len(text) + số hit) thay vì O(số rule × len(text)).
+
+Khớp theo chuỗi con trên text đã lower(), giống `kw in text.lower()` trước đây.
+fold=True: mỗi từ khoá có dấu được thêm bản không dấu (unidecode), vd
+"tiền phòng" khớp cả "tien phong".
+"""
+from __future__ import annotations
+
+import re
+from typing import NamedTuple
+
+import unidecode
+
+_END = ""  # khoá đánh dấu node kết thúc từ khoá trong trie
+
+
+class Hit(NamedTuple):
+    label: object
+    keyword: str
+    start: int
+    end: int
+    priority: int
+    rule: int  # thứ tự khai báo rule
+
+
+class KeywordTable:
+    """
+    rules: list (label, keywords) hoặc (label, keywords, priority), hay dict
+    {label: keywords}. Khi nhiều label cùng khớp, `first` chọn priority lớn
+    nhất; bằng nhau thì rule khai báo trước thắng (giống vòng for cũ).
+    """
+
+    def __init__(self, rules, fold: bool = False):
+        if isinstance(rules, dict):
+            rules = list(rules.items())
+
+        self._rules = []  # index -> (label, priority)
+        self._trie: dict = {}
+
+        for idx, (label, kws, *rest) in enumerate(rules):
+            self._rules.append((label, rest[0] if rest else 0))
+            for kw in kws:
+                kw = kw.lower()
+                variants = {kw, unidecode.unidecode(kw)} if fold else {kw}
+                for v in variants:
+                    if v:
+                        _insert(self._trie, v, idx)
+
+        # thứ hạng khi chọn rule thắng: nhỏ hơn = ưu tiên hơn
+        self._rank = [(-prio, idx) for idx, (_, prio) in enumerate(self._rules)]
+        self._top = min(self._rank) if self._rank else None
+
+        # regex sinh từ trie (tiền tố chung được gộp) -> mỗi vị trí chỉ thử
+        # theo nhánh ký tự, không thử lần lượt từng từ khoá
+        self._re = re.compile(_trie_regex(self._trie)) if self._trie else None
+
+    # ---------- matching ----------
+    def _scan(self, low: str):
+        """Sinh (rule index, start, end) cho mọi từ khoá khớp, theo vị trí."""
+        n = len(low)
+        search = self._re.search
+        m = search(low)
+        while m:
+            i = j = m.start()
+            node = self._trie
+            while j < n:
+                node = node.get(low[j])
+                if node is None:
+                    break
+                j += 1
+                for idx in node.get(_END, ()):
+                    yield idx, i, j
+            # từ khoá có thể chồng lên nhau -> tìm tiếp từ vị trí kế
+            m = search(low, i + 1)
+
+    def find(self, text: str) -> list[Hit]:
+        """Mọi từ khoá xuất hiện trong text (1 lượt quét), theo vị trí."""
+        if not text or self._re is None:
+            return []
+        low = text.lower()
+        hits = []
+        for idx, i, j in self._scan(low):
+            label, prio = self._rules[idx]
+            hits.append(Hit(label, low[i:j], i, j, prio, idx))
+        return hits
+
+    def labels(self, text: str) -> set:
+        return {h.label for h in self.find(text)}
+
+    def first(self, text: str, default=None):
+        """Label của rule ưu tiên cao nhất có từ khoá xuất hiện trong text."""
+        if not text or self._re is None:
+            return default
+        best = None
+        for idx, _, _ in self._scan(text.lower()):
+            if best is None or self._rank[idx] < self._rank[best]:
+                best = idx
+                if self._rank[idx] == self._top:
+                    break  # không rule nào hơn được nữa
+        return default if best is None else self._rules[best][0]
+
+    def any(self, text: str) -> bool:
+        if not text or self._re is None:
+            return False
+        return self._re.search(text.lower()) is not None
+
+
+def _insert(trie: dict, kw: str, idx: int):
+    node = trie
+    for ch in kw:
+        node = node.setdefault(ch, {})
+    node.setdefault(_END, []).append(idx)
+
+
+def _trie_regex(node: dict) -> str:
+    """Trie -> regex tương đương, vd {a:{b:END, c:END}} -> a(?:b|c)."""
+    alts = [re.escape(ch) + _trie_regex(child) for ch, child in sorted(node.items()) if ch != _END]
+    if not alts:
+        return ""
+    if _END in node:
+        # từ khoá kết thúc tại đây -> phần đuôi là tuỳ chọn
+        return "(?:" + "|".join(alts) + ")?"
+    if len(alts) == 1:
+        return alts[0]
+    return "(?:" + "|".join(alts) + ")"
@@ -0,0 +1,84 @@
+# backend/app/ai/keyword_rules.py
+"""
+Toàn bộ bảng rule từ khoá (OCR hoá đơn + chatbot + loại giao dịch) khai báo
+tại đây, compile 1 lần lúc import bằng keyword_engine.KeywordTable.
+Thứ tự rule = thứ tự ưu tiên khi nhiều rule cùng khớp.
+"""
+from .keyword_engine import KeywordTable
+
+# ======================================================
+# OCR hoá đơn (ocr_parser) -> id danh mục / phương thức thanh toán
+# ======================================================
+OCR_CATEGORY = KeywordTable([
+    (5,  ["ăn", "uống", "food", "drink", "coffee", "cafe", "quán", "restaurant", "kfc", "lotteria"]),
+    (6,  ["grab", "taxi", "bus", "vé xe", "gojek", "xăng", "petrol", "fuel"]),
+    (7,  ["cgv", "galaxy", "cinema", "rap phim", "karaoke", "bowling", "vé xem phim"]),
+    (8,  ["vinmart", "winmart", "bách hóa xanh", "circle k", "circlek", "ministop", "siêu thị", "supermarket"]),
+    (9,  ["vpp", "văn phòng phẩm", "fahasa", "nhà sách", "book", "photo"]),
+    (10, ["pharmacy", "thuốc", "guardian", "clinic", "bệnh viện"]),
+    (11, ["tiền nhà", "nhà trọ", "internet", "wifi", "điện", "nước"]),
+])
+
+OCR_PAYMENT = KeywordTable([
+    (1, ["tiền mặt", "cash"]),
+    (2, ["credit", "visa", "master", "amex"]),
+    (3, ["debit", "atm", "napas"]),
+    (4, ["momo", "zalo", "zalopay", "vnpay", "airpay", "shopeepay"]),
+    (5, ["chuyển khoản", "transfer", "banking", "qr", "scan"]),
+])
+
+# dòng nào (trong vài dòng đầu) chứa tên cửa hàng
+OCR_STORE = KeywordTable([
+    ("store", [
+        "vinmart", "winmart", "bách hóa xanh", "cgv", "highland",
+        "circle k", "lotteria", "kfc", "ministop",
+    ]),
+])
+
+# ======================================================
+# Loại giao dịch (nlp_rules.detect_tx_type)
+# ======================================================
+# ưu tiên income > expense > "nhận" chung chung; không khớp -> expense
+TX_TYPE = KeywordTable([
+    ("income", [
+        "lương", "luong", "nhận lương", "nhan luong", "học bổng", "hoc bong",
+        "được chuyển", "duoc chuyen", "gửi tiền", "gui tien", "ba gửi", "bo gui",
+        "bố gửi", "mẹ gửi", "me gui", "nhận tiền", "nhan tien", "trợ cấp",
+        "tro cap", "tiền thưởng", "thuong", "bonus",
+    ]),
+    ("expense", [
+        "ăn", "uong", "uống", "mua", "trả", "tra ", "đóng", "dong", "tiền xăng",
+        "xăng", "xang", "cà phê", "cafe", "coffee", "nhậu", "karaoke", "đi chơi",
+        "vé xe", "grab", "taxi", "photo", "sách", "sach", "siêu thị",
+    ]),
+    ("income", ["nhận", "nhan"]),
+])
+
+# ======================================================
+# Chatbot (chat_pipeline) — khớp cả có dấu / không dấu
+# ======================================================
+# sửa nhãn classifier theo từ khoá chắc chắn
+CHAT_CATEGORY_FIX = KeywordTable([
+    ("Khác (income)", ["gửi", "nhận", "học bổng"]),
+    ("Lương", ["lương", "thưởng"]),
+    ("Mua sắm", ["siêu thị", "mua đồ", "shopee", "tiki"]),
+    ("Khác (expense)", ["tiền điện", "điện", "nước"]),
+    ("Nhà ở", ["tiền phòng", "phòng trọ", "tiền nhà"]),
+], fold=True)
+
+BUDGET_CATEGORY = KeywordTable([
+    ("Ăn uống", ["ăn uống"]),
+    ("Di chuyển", ["di chuyển"]),
+    ("Học tập", ["học tập", "sách vở"]),
+    ("Giải trí", ["xem phim", "giải trí"]),
+    ("Nhà ở", ["nhà ở", "phòng trọ", "tiền phòng", "thuê phòng"]),
+], fold=True)
+
+BUDGET_INCREMENT = KeywordTable([
+    (True, ["thêm", "tăng", "cộng"]),
+], fold=True)
+
+INCOME_CATEGORY = KeywordTable([
+    ("Lương", ["lương"]),
+    ("Học bổng", ["học bổng"]),
+], fold=True)
@@ -0,0 +1,187 @@
+# backend/app/ai/llm_cache.py
+"""
+Cache câu trả lời LLM + gộp các request giống nhau đang chạy.
+
+- Khoá: provider + model + system prompt + nội dung tin nhắn đã chuẩn hoá
+  (lower, gộp khoảng trắng, bỏ dấu câu cuối: "Mở trang chi tiêu?" ==
+  "mở  trang chi tiêu"). shared=True: câu hỏi không phụ thuộc user (điều
+  hướng, hỏi đáp chung) -> dùng chung giữa mọi user; shared=False thì khoá
+  gồm cả user_id.
+- LRU + TTL trong tiến trình (LLM_CACHE_SIZE, LLM_CACHE_TTL; câu trả lời
+  riêng của user dùng LLM_CACHE_TTL_PRIVATE).
+- Single-flight: nhiều request cùng khoá đến khi chưa có kết quả thì chỉ
+  request đầu gọi upstream, các request sau chờ và dùng chung kết quả
+  (lỗi cũng được chia sẻ, nhưng không bị cache).
+- stats(): hits / misses / coalesced (miss nhưng chờ request trùng) /
+  upstream (số lần thật sự gọi LLM), hit_rate và saved_rate
+  (tỉ lệ request không phải gọi upstream).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from . import llm_gateway
+
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))
+LLM_CACHE_TTL_PRIVATE = int(os.getenv("LLM_CACHE_TTL_PRIVATE", "300"))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+
+_WS_RE = re.compile(r"\s+")
+_TRAIL_RE = re.compile(r"[\s?!.,;:~…]+$")
+
+_lock = threading.Lock()
+_entries: "OrderedDict[str, tuple[float, str]]" = OrderedDict()  # key -> (hết hạn, text)
+_inflight: dict[str, Future] = {}
+_counters = {"hits": 0, "misses": 0, "coalesced": 0, "upstream": 0, "stores": 0, "evictions": 0}
+
+
+def normalize(text: str) -> str:
+    return _TRAIL_RE.sub("", _WS_RE.sub(" ", (text or "").lower()).strip())
+
+
+def make_key(provider: str, messages: list[dict], user_id=None, shared: bool = True) -> str:
+    cfg = llm_gateway.PROVIDERS.get(provider, {})
+    parts = [
+        provider,
+        cfg.get("model", ""),
+        "*" if shared else f"u{user_id}",
+        *(
+            f"{m['role']}:{m['content'] if m['role'] == 'system' else normalize(m['content'])}"
+            for m in messages
+        ),
+    ]
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode()).hexdigest()
+
+
+def get(key: str) -> str | None:
+    now = time.time()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry[0] > now:
+            _entries.move_to_end(key)
+            _counters["hits"] += 1
+            return entry[1]
+        if entry is not None:
+            del _entries[key]
+        _counters["misses"] += 1
+    return None
+
+
+def put(key: str, text: str, ttl: int):
+    with _lock:
+        _entries[key] = (time.time() + ttl, text)
+        _entries.move_to_end(key)
+        _counters["stores"] += 1
+        while len(_entries) > LLM_CACHE_SIZE:
+            _entries.popitem(last=False)
+            _counters["evictions"] += 1
+
+
+def _join(key: str):
+    """(future, leader?) — request đầu tiên cho khoá là leader, phải gọi upstream."""
+    with _lock:
+        fut = _inflight.get(key)
+        entry = _entries.get(key)
+        if fut is None and entry is not None and entry[0] > time.time():
+            # request trùng vừa xong giữa lúc get() miss và lúc vào đây
+            fut = Future()
+            fut.set_result(entry[1])
+        elif fut is None:
+            fut = _inflight[key] = Future()
+            _counters["upstream"] += 1
+            return fut, True
+        _counters["coalesced"] += 1
+        return fut, False
+
+
+def _finish(key: str, fut: Future, text: str | None, error: BaseException | None, ttl: int):
+    if error is None:
+        put(key, text, ttl)
+        fut.set_result(text)
+    else:
+        fut.set_exception(error)
+    with _lock:
+        _inflight.pop(key, None)
+
+
+def chat(
+    provider: str,
+    messages: list[dict],
+    temperature: float | None = None,
+    user_id=None,
+    shared: bool = True,
+) -> str:
+    """llm_gateway.chat có cache + gộp request trùng. Lỗi -> LlmError như gateway."""
+    key = make_key(provider, messages, user_id, shared)
+    text = get(key)
+    if text is not None:
+        return text
+
+    fut, leader = _join(key)
+    if not leader:
+        return fut.result()
+
+    ttl = LLM_CACHE_TTL if shared else LLM_CACHE_TTL_PRIVATE
+    try:
+        text = llm_gateway.chat(provider, messages, temperature=temperature)
+    except BaseException as e:
+        _finish(key, fut, None, e, ttl)
+        raise
+    _finish(key, fut, text, None, ttl)
+    return text
+
+
+def stream(
+    provider: str,
+    messages: list[dict],
+    temperature: float | None = None,
+    user_id=None,
+    shared: bool = True,
+):
+    """
+    llm_gateway.stream có cache: hit (hoặc đang có request trùng chạy) thì
+    sinh nguyên câu trả lời 1 lần; miss thì stream từ upstream và lưu cache
+    khi xong. Client ngắt giữa chừng -> không lưu.
+    """
+    key = make_key(provider, messages, user_id, shared)
+    text = get(key)
+    if text is not None:
+        yield text
+        return
+
+    fut, leader = _join(key)
+    if not leader:
+        yield fut.result()
+        return
+
+    ttl = LLM_CACHE_TTL if shared else LLM_CACHE_TTL_PRIVATE
+    parts = []
+    try:
+        for delta in llm_gateway.stream(provider, messages, temperature=temperature):
+            parts.append(delta)
+            yield delta
+    except GeneratorExit:
+        _finish(key, fut, None, llm_gateway.LlmError("Request trùng đã bị huỷ"), ttl)
+        raise
+    except BaseException as e:
+        _finish(key, fut, None, e, ttl)
+        raise
+    _finish(key, fut, "".join(parts), None, ttl)
+
+
+def stats() -> dict:
+    with _lock:
+        out = dict(_counters)
+        out["size"] = len(_entries)
+        out["inflight"] = len(_inflight)
+    total = out["hits"] + out["misses"]
+    out["hit_rate"] = round(out["hits"] / total, 3) if total else None
+    out["saved_rate"] = round((out["hits"] + out["coalesced"]) / total, 3) if total else None
+    return out
@@ -0,0 +1,296 @@
+# backend/app/ai/llm_gateway.py
+"""
+Cổng gọi LLM dùng chung (Groq, Qwen qua Ollama).
+
+- Mỗi provider 1 requests.Session với pool kết nối keep-alive riêng.
+- Timeout cứng: connect + read (LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT_<PROVIDER>).
+- Retry lỗi kết nối / 429 / 5xx với backoff luỹ thừa + full jitter
+  (LLM_RETRIES lần). Read timeout không retry: upstream chậm thì trả lỗi ngay.
+- Giới hạn số request đồng thời mỗi provider (LLM_CONCURRENCY_<PROVIDER>);
+  chờ slot quá LLM_QUEUE_TIMEOUT giây thì ném LlmBusy thay vì giữ worker.
+- chat() trả nguyên text; stream() sinh từng đoạn text (cho SSE).
+
+URL / model đổi được qua env (GROQ_URL, OLLAMA_URL, ...) nên chạy được với
+server giả lập local khi test.
+"""
+from __future__ import annotations
+
+import json
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def _env(name: str, provider: str, default):
+    raw = os.getenv(f"{name}_{provider.upper()}", os.getenv(name))
+    return type(default)(raw) if raw is not None else default
+
+
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "3"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "2"))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.25"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "4"))
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+PROVIDERS = {
+    "groq": {
+        "url": os.getenv("GROQ_URL", "https://api.groq.com/openai/v1/chat/completions"),
+        "model": os.getenv("GROQ_MODEL", "llama-3.1-8b-instant"),
+        "api_key_env": "GROQ_API_KEY",
+        "format": "openai",
+        "read_timeout": 30.0,
+    },
+    "qwen": {
+        "url": os.getenv("OLLAMA_URL", "http://localhost:11434/api/chat"),
+        "model": os.getenv("QWEN_MODEL", "qwen2.5:3b"),
+        "format": "ollama",
+        "read_timeout": 120.0,
+    },
+}
+
+
+class LlmError(Exception):
+    """Gọi LLM thất bại (lỗi mạng, timeout, HTTP lỗi, response sai định dạng)."""
+
+
+class LlmBusy(LlmError):
+    """Đã đạt giới hạn request đồng thời tới provider."""
+
+    def __init__(self, provider: str, retry_after: int = 5):
+        super().__init__(f"AI ({provider}) đang bận, vui lòng thử lại sau")
+        self.retry_after = retry_after
+
+
+class _Provider:
+    def __init__(self, name: str, cfg: dict):
+        self.name = name
+        self.cfg = cfg
+        self.concurrency = _env("LLM_CONCURRENCY", name, 4)
+        self.read_timeout = _env("LLM_READ_TIMEOUT", name, cfg["read_timeout"])
+        self.slots = threading.BoundedSemaphore(self.concurrency)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "errors": 0, "retries": 0, "busy": 0, "in_flight": 0}
+        self.latency_ms = 0.0
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    # ---------- request / response theo định dạng API ----------
+    def headers(self) -> dict:
+        headers = {"Content-Type": "application/json"}
+        key_env = self.cfg.get("api_key_env")
+        if key_env:
+            key = os.getenv(key_env)
+            if not key:
+                raise LlmError(f"Thiếu {key_env} trong .env")
+            headers["Authorization"] = f"Bearer {key}"
+        return headers
+
+    def payload(self, messages: list[dict], temperature, stream: bool) -> dict:
+        body = {"model": self.cfg["model"], "messages": messages, "stream": stream}
+        if temperature is not None:
+            if self.cfg["format"] == "ollama":
+                body["options"] = {"temperature": temperature}
+            else:
+                body["temperature"] = temperature
+        return body
+
+    def parse(self, data) -> str:
+        if self.cfg["format"] == "openai":
+            if isinstance(data, dict) and "error" in data:
+                raise LlmError(f"AI lỗi: {data['error']}")
+            try:
+                return data["choices"][0]["message"]["content"]
+            except (KeyError, IndexError, TypeError):
+                raise LlmError(f"Kết quả không hợp lệ: {data}")
+
+        # Ollama: {"message": ...} | {"messages": [...]} | list chunk
+        if isinstance(data, dict) and "message" in data:
+            return data["message"].get("content", "")
+        if isinstance(data, dict) and "messages" in data:
+            for msg in reversed(data["messages"]):
+                if msg.get("role") == "assistant":
+                    return msg.get("content", "")
+            return ""
+        if isinstance(data, list):
+            return "".join(c.get("message", {}).get("content", "") for c in data)
+        raise LlmError("Kết quả không hợp lệ")
+
+    def parse_stream_line(self, line: str):
+        """(đoạn text, đã xong?) cho 1 dòng stream."""
+        if self.cfg["format"] == "openai":
+            # SSE: "data: {...}" ... "data: [DONE]"
+            if not line.startswith("data:"):
+                return "", False
+            body = line[5:].strip()
+            if body == "[DONE]":
+                return "", True
+            chunk = json.loads(body)
+            choice = (chunk.get("choices") or [{}])[0]
+            return choice.get("delta", {}).get("content") or "", choice.get("finish_reason") is not None
+
+        # Ollama: NDJSON, mỗi dòng {"message": {"content": ...}, "done": bool}
+        chunk = json.loads(line)
+        return chunk.get("message", {}).get("content", ""), bool(chunk.get("done"))
+
+
+_providers = {name: _Provider(name, cfg) for name, cfg in PROVIDERS.items()}
+
+
+def _provider(name: str) -> _Provider:
+    try:
+        return _providers[name]
+    except KeyError:
+        raise ValueError(f"Provider LLM không hợp lệ: {name} (hỗ trợ: {', '.join(_providers)})")
+
+
+def _backoff(attempt: int, resp=None) -> float:
+    """Full jitter: ngẫu nhiên trong [0, min(max, base * 2^attempt)]; ưu tiên Retry-After."""
+    if resp is not None:
+        try:
+            return min(float(resp.headers["Retry-After"]), LLM_BACKOFF_MAX)
+        except (KeyError, ValueError):
+            pass
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+
+def _acquire(p: _Provider):
+    if not p.slots.acquire(timeout=LLM_QUEUE_TIMEOUT):
+        p.count("busy")
+        raise LlmBusy(p.name)
+    p.count("in_flight")
+
+
+def _release(p: _Provider):
+    p.count("in_flight", -1)
+    p.slots.release()
+
+
+def _post(p: _Provider, body: dict, stream: bool):
+    """POST có retry; trả response status 2xx (chưa đọc body nếu stream)."""
+    headers = p.headers()
+    for attempt in range(LLM_RETRIES + 1):
+        resp = None
+        try:
+            resp = p.session.post(
+                p.cfg["url"],
+                json=body,
+                headers=headers,
+                timeout=(LLM_CONNECT_TIMEOUT, p.read_timeout),
+                stream=stream,
+            )
+            if resp.status_code not in RETRY_STATUS:
+                if resp.status_code >= 400:
+                    text = resp.text[:300]
+                    resp.close()
+                    raise LlmError(f"AI lỗi HTTP {resp.status_code}: {text}")
+                return resp
+            error = LlmError(f"AI lỗi HTTP {resp.status_code}")
+            resp.close()
+        except (requests.ConnectionError, requests.exceptions.ConnectTimeout) as e:
+            # ReadTimeout là lớp con của Timeout, không phải ConnectionError
+            # -> không retry khi upstream đã nhận request nhưng trả chậm
+            error = LlmError(f"Không kết nối được AI ({p.name}): {e}")
+        except requests.Timeout:
+            raise LlmError(f"AI ({p.name}) phản hồi quá {p.read_timeout:g}s")
+        except requests.RequestException as e:
+            raise LlmError(f"Lỗi gọi AI ({p.name}): {e}")
+
+        if attempt == LLM_RETRIES:
+            raise error
+        p.count("retries")
+        time.sleep(_backoff(attempt, resp))
+
+
+def chat(provider: str, messages: list[dict], temperature: float | None = None) -> str:
+    """Gọi LLM, trả nội dung text của câu trả lời. Lỗi -> LlmError / LlmBusy."""
+    p = _provider(provider)
+    _acquire(p)
+    t = time.perf_counter()
+    p.count("requests")
+    try:
+        resp = _post(p, p.payload(messages, temperature, stream=False), stream=False)
+        try:
+            data = resp.json()
+        except ValueError:
+            raise LlmError("Kết quả AI không phải JSON")
+        return p.parse(data)
+    except LlmError:
+        p.count("errors")
+        raise
+    finally:
+        _release(p)
+        with p._lock:
+            p.latency_ms += (time.perf_counter() - t) * 1000
+
+
+def stream(provider: str, messages: list[dict], temperature: float | None = None):
+    """
+    Generator sinh từng đoạn text khi LLM trả về. Slot được giữ tới khi
+    stream kết thúc (hoặc generator bị đóng khi client ngắt kết nối).
+    Chỉ retry trước khi nhận byte đầu tiên.
+    """
+    p = _provider(provider)
+    _acquire(p)
+    t = time.perf_counter()
+    p.count("requests")
+    resp = None
+    try:
+        resp = _post(p, p.payload(messages, temperature, stream=True), stream=True)
+        resp.encoding = "utf-8"  # SSE / NDJSON luôn là UTF-8; requests mặc định ISO-8859-1 khi thiếu charset
+        for line in resp.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            try:
+                text, done = p.parse_stream_line(line)
+            except ValueError:
+                raise LlmError("Stream AI sai định dạng")
+            if text:
+                yield text
+            if done:
+                break
+    except LlmError:
+        p.count("errors")
+        raise
+    except requests.RequestException as e:
+        p.count("errors")
+        raise LlmError(f"Stream AI ({p.name}) bị gián đoạn: {e}")
+    finally:
+        if resp is not None:
+            resp.close()
+        _release(p)
+        with p._lock:
+            p.latency_ms += (time.perf_counter() - t) * 1000
+
+
+def parse_json_reply(raw: str):
+    """Câu trả lời LLM: parse JSON được thì dùng, không thì bọc vào {"message": raw}."""
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return {"message": raw}
+
+
+def stats() -> dict:
+    out = {}
+    for name, p in _providers.items():
+        with p._lock:
+            c = dict(p.counters)
+            n = c["requests"]
+            c["avg_ms"] = round(p.latency_ms / n, 1) if n else None
+        c["concurrency"] = p.concurrency
+        out[name] = c
+    return out
@@ -2,6 +2,8 @@
 import re
 from datetime import datetime
 
+from .keyword_rules import TX_TYPE
+
 
 def extract_amount_vnd(text: str) -> int | None:
     if not text:
@@ -88,71 +90,8 @@ def detect_tx_type(text: str) -> str:
     """
     Xác định loại giao dịch: income hoặc expense
     """
-    s = (text or "").lower()
-
-    income_keywords = [
-        "lương",
-        "luong",
-        "nhận lương",
-        "nhan luong",
-        "học bổng",
-        "hoc bong",
-        "được chuyển",
-        "duoc chuyen",
-        "gửi tiền",
-        "gui tien",
-        "ba gửi",
-        "bo gui",
-        "bố gửi",
-        "mẹ gửi",
-        "me gui",
-        "nhận tiền",
-        "nhan tien",
-        "trợ cấp",
-        "tro cap",
-        "tiền thưởng",
-        "thuong",
-        "bonus",
-    ]
-
-    expense_keywords = [
-        "ăn",
-        "uong",
-        "uống",
-        "mua",
-        "trả",
-        "tra ",
-        "đóng",
-        "dong",
-        "tiền xăng",
-        "xăng",
-        "xang",
-        "cà phê",
-        "cafe",
-        "coffee",
-        "nhậu",
-        "karaoke",
-        "đi chơi",
-        "vé xe",
-        "grab",
-        "taxi",
-        "photo",
-        "sách",
-        "sach",
-        "siêu thị",
-    ]
-
-    # ƯU TIÊN income
-    if any(k in s for k in income_keywords):
-        return "income"
-
-    if any(k in s for k in expense_keywords):
-        return "expense"
-
-    if "nhận" in s or "nhan" in s:
-        return "income"
-
-    return "expense"
+    # bảng từ khoá + thứ tự ưu tiên: keyword_rules.TX_TYPE
+    return TX_TYPE.first(text, default="expense")
 
 
 def extract_saving_goal(text: str):
@@ -0,0 +1,83 @@
+# backend/app/ai/ocr/bench.py
+"""
+Đo tốc độ / độ chính xác OCR theo preset tiền xử lý trên bộ ảnh mẫu local
+(mặc định ai/ocr/test_images). Chưa có nhãn chuẩn nên kết quả preset "full"
+(ảnh gốc, hành vi cũ) được dùng làm tham chiếu:
+
+- text_similarity: độ giống chuỗi text (difflib, 0-1) so với "full"
+- amount_match / date_match: tỉ lệ ảnh trích xuất ra cùng số tiền / ngày
+- saved_pct: % thời gian (tiền xử lý + OCR) tiết kiệm so với "full"
+
+Chạy qua: flask ocr bench [--dir ...] [--limit N] [--preset ...]
+"""
+from __future__ import annotations
+
+import time
+from difflib import SequenceMatcher
+from pathlib import Path
+
+from .ocr_engine_easy import run_easy_ocr
+from .ocr_parser import parse_receipt
+from .preprocess import PRESETS
+
+SAMPLE_DIR = Path(__file__).resolve().parent / "test_images"
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".webp"}
+
+
+def sample_images(directory: str | Path | None = None, limit: int | None = None) -> list[Path]:
+    d = Path(directory) if directory else SAMPLE_DIR
+    paths = sorted(p for p in d.iterdir() if p.suffix.lower() in IMAGE_EXTS)
+    return paths[:limit] if limit else paths
+
+
+def _norm(lines: list[str]) -> str:
+    return " ".join(" ".join(lines).lower().split())
+
+
+def _run(img_bytes: bytes, preset: str) -> dict:
+    timings = {}
+    t = time.perf_counter()
+    lines = run_easy_ocr(img_bytes, timings=timings, preset=preset)
+    ms = (time.perf_counter() - t) * 1000
+    parsed = parse_receipt(lines)
+    size = timings["preprocess"]["size"]
+    return {
+        "text": _norm(lines),
+        "amount": parsed.get("amount"),
+        "date": parsed.get("date"),
+        "ms": ms,
+        "megapixels": size[0] * size[1] / 1e6,
+    }
+
+
+def benchmark(paths: list[Path], presets: list[str] | None = None) -> dict:
+    presets = [p for p in (presets or list(PRESETS)) if p != "full"]
+    acc = {name: {"ms": [], "mp": [], "sim": [], "amount": 0, "date": 0} for name in ["full", *presets]}
+
+    for path in paths:
+        img_bytes = path.read_bytes()
+        ref = _run(img_bytes, "full")
+        acc["full"]["ms"].append(ref["ms"])
+        acc["full"]["mp"].append(ref["megapixels"])
+        for name in presets:
+            r = _run(img_bytes, name)
+            a = acc[name]
+            a["ms"].append(r["ms"])
+            a["mp"].append(r["megapixels"])
+            a["sim"].append(SequenceMatcher(None, ref["text"], r["text"]).ratio())
+            a["amount"] += r["amount"] == ref["amount"]
+            a["date"] += r["date"] == ref["date"]
+
+    n = len(paths) or 1
+    full_ms = sum(acc["full"]["ms"]) or 1
+    out = {}
+    for name, a in acc.items():
+        out[name] = {
+            "avg_ms": round(sum(a["ms"]) / n, 1),
+            "avg_megapixels": round(sum(a["mp"]) / n, 2),
+            "saved_pct": round((1 - sum(a["ms"]) / full_ms) * 100, 1),
+            "text_similarity": round(sum(a["sim"]) / n, 3) if a["sim"] else 1.0,
+            "amount_match": round(a["amount"] / n, 3) if name != "full" else 1.0,
+            "date_match": round(a["date"] / n, 3) if name != "full" else 1.0,
+        }
+    return out
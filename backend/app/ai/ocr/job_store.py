@@ -0,0 +1,83 @@
+# backend/app/ai/ocr/job_store.py
+"""
+Trạng thái job OCR bất đồng bộ dùng chung giữa các tiến trình web.
+
+Job chạy trong pool của tiến trình web đã nhận upload, nhưng request poll
+GET /api/ocr/jobs/<id> có thể rơi vào worker gunicorn khác -> trạng thái
+(queued / done / error + kết quả) được ghi ra store chung:
+- Flask-Caching `cache` nếu CACHE_TYPE là backend dùng chung (Redis,
+  Memcached, FileSystem...);
+- ngược lại (không cấu hình, SimpleCache / NullCache chỉ nằm trong 1 tiến
+  trình) lưu file JSON trong instance/ocr_jobs/, xoá sau OCR_JOB_TTL giây.
+Cần app context khi gọi put / get.
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+
+from flask import current_app
+
+from ...extensions import cache
+
+OCR_JOB_TTL = int(os.getenv("OCR_JOB_TTL", "600"))
+
+# backend chỉ sống trong bộ nhớ 1 tiến trình -> không dùng để chia sẻ job
+_LOCAL_CACHE_TYPES = {"null", "nullcache", "simple", "simplecache"}
+
+
+def use_shared_cache() -> bool:
+    """Flask-Caching có backend dùng chung giữa các tiến trình không."""
+    if "cache" not in current_app.extensions:
+        return False
+    cache_type = str(current_app.config.get("CACHE_TYPE", "")).rsplit(".", 1)[-1]
+    return cache_type.lower() not in _LOCAL_CACHE_TYPES
+
+
+# ----------------- disk store -----------------
+def _disk_dir() -> Path:
+    d = Path(current_app.instance_path) / "ocr_jobs"
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+def _disk_path(job_id: str) -> Path:
+    return _disk_dir() / f"{job_id}.json"
+
+
+def _disk_prune(d: Path):
+    cutoff = time.time() - OCR_JOB_TTL
+    for e in os.scandir(d):
+        try:
+            if e.stat().st_mtime < cutoff:
+                os.remove(e.path)
+        except OSError:
+            pass
+
+
+# ----------------- public -----------------
+def put(job_id: str, state: dict):
+    if use_shared_cache():
+        cache.set(f"ocrjob:{job_id}", state, timeout=OCR_JOB_TTL)
+        return
+    path = _disk_path(job_id)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+    _disk_prune(path.parent)
+
+
+def get(job_id: str) -> dict | None:
+    if not job_id.isalnum():  # job_id là uuid hex, chặn path traversal
+        return None
+    if use_shared_cache():
+        return cache.get(f"ocrjob:{job_id}")
+    path = _disk_path(job_id)
+    try:
+        if time.time() - path.stat().st_mtime > OCR_JOB_TTL:
+            return None
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
@@ -1,25 +1,38 @@
-import easyocr
-import numpy as np
-from PIL import Image
-from io import BytesIO
-import cv2
+import time
 
-# EasyOCR hỗ trợ EN + VI
-reader = easyocr.Reader(['vi', 'en'])
+from .. import registry
+from .preprocess import preprocess
 
 
-def run_easy_ocr(img_bytes: bytes):
+def _load_reader():
+    import easyocr  # kéo theo torch -> chỉ import khi cần OCR
+
+    # EasyOCR hỗ trợ EN + VI
+    return easyocr.Reader(['vi', 'en'])
+
+
+registry.register("easyocr", _load_reader)
+
+
+def run_easy_ocr(img_bytes: bytes, timings: dict | None = None, preset: str | None = None):
     """
     Nhận dạng chữ trên hóa đơn bằng EasyOCR.
     Trả về list dòng text theo thứ tự từ trên xuống dưới.
+    preset: mức tiền xử lý ảnh (xem preprocess.PRESETS), mặc định OCR_PRESET.
+    Nếu truyền dict timings thì ghi thêm preprocess_ms / ocr_ms / preprocess vào đó.
     """
 
-    # Load ảnh
-    img = Image.open(BytesIO(img_bytes)).convert("RGB")
-    img_np = np.array(img)
+    # Decode + tiền xử lý (thu nhỏ, grayscale, crop, deskew)
+    img_np, info = preprocess(img_bytes, preset)
+    if timings is not None:
+        timings["preprocess_ms"] = info["preprocess_ms"]
+        timings["preprocess"] = info
 
     # Chạy OCR
-    result = reader.readtext(img_np, detail=1)
+    t = time.perf_counter()
+    result = registry.get("easyocr").readtext(img_np, detail=1)
+    if timings is not None:
+        timings["ocr_ms"] = round((time.perf_counter() - t) * 1000, 1)
 
     # result = [ [bbox, text, score], ... ]
 
@@ -2,33 +2,14 @@ import re
 from datetime import datetime
 from ...ai.nlp_rules import extract_amount_vnd
 from ...ai.classifier import predict_category
-
-CATEGORY_MAP = {
-    5:  ["ăn", "uống", "food", "drink", "coffee", "cafe", "quán", "restaurant", "kfc", "lotteria"],
-    6:  ["grab", "taxi", "bus", "vé xe", "gojek", "xăng", "petrol", "fuel"],
-    7:  ["cgv", "galaxy", "cinema", "rap phim", "karaoke", "bowling", "vé xem phim"],
-    8:  ["vinmart", "winmart", "bách hóa xanh", "circle k", "circlek", "ministop", "siêu thị", "supermarket"],
-    9:  ["vpp", "văn phòng phẩm", "fahasa", "nhà sách", "book", "photo"],
-    10: ["pharmacy", "thuốc", "guardian", "clinic", "bệnh viện"],
-    11: ["tiền nhà", "nhà trọ", "internet", "wifi", "điện", "nước"],
-}
-
-PAYMENT_MAP = {
-    1: ["tiền mặt", "cash"],
-    2: ["credit", "visa", "master", "amex"],
-    3: ["debit", "atm", "napas"],
-    4: ["momo", "zalo", "zalopay", "vnpay", "airpay", "shopeepay"],
-    5: ["chuyển khoản", "transfer", "banking", "qr", "scan"],
-}
+from ...ai.keyword_rules import OCR_CATEGORY, OCR_PAYMENT, OCR_STORE
 
 DATE_RE = re.compile(r"(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})")
 
 def map_category_id(text: str):
-    low = text.lower()
-    for cid, keywords in CATEGORY_MAP.items():
-        for kw in keywords:
-            if kw in low:
-                return cid
+    cid = OCR_CATEGORY.first(text)
+    if cid is not None:
+        return cid
     # fallback classifier
     cat, prob = predict_category(text)
     if prob >= 0.55:
@@ -39,12 +20,7 @@ def map_category_id(text: str):
     return 12   # Khác
 
 def map_payment_id(text: str):
-    low = text.lower()
-    for pid, keywords in PAYMENT_MAP.items():
-        for kw in keywords:
-            if kw in low:
-                return pid
-    return 6
+    return OCR_PAYMENT.first(text, default=6)
 
 def parse_receipt(lines: list[str]):
     text = "\n".join(lines)
@@ -64,10 +40,7 @@ def parse_receipt(lines: list[str]):
     # store
     store = None
     for line in lines[:6]:
-        if any(x in line.lower() for x in [
-            "vinmart","winmart","bách hóa xanh","cgv","highland",
-            "circle k","lotteria","kfc","ministop"
-        ]):
+        if OCR_STORE.any(line):
             store = line
             break
 
@@ -0,0 +1,104 @@
+# backend/app/ai/ocr/result_cache.py
+"""
+Cache kết quả OCR + parse_receipt theo hash nội dung ảnh.
+
+- Khoá: sha256(bytes ảnh) + preset tiền xử lý (preset khác -> kết quả khác).
+- Backend: Flask-Caching `cache` nếu CACHE_TYPE là backend dùng chung (chọn
+  như job_store.use_shared_cache), ngược lại lưu file JSON trong
+  instance/ocr_cache/ (tối đa OCR_CACHE_MAX_ENTRIES file, vượt thì xoá các
+  file ít được dùng nhất theo mtime).
+- Đếm hit / miss theo tiến trình, xem qua stats() hoặc /api/ocr/stats.
+Cần app context khi gọi get / put.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from flask import current_app
+
+from ...extensions import cache
+from .job_store import use_shared_cache
+
+OCR_CACHE_TTL = int(os.getenv("OCR_CACHE_TTL", str(7 * 24 * 3600)))
+OCR_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "2000"))
+
+_lock = threading.Lock()
+_counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+
+def make_key(img_bytes: bytes, preset: str) -> str:
+    return f"{hashlib.sha256(img_bytes).hexdigest()}:{preset}"
+
+
+def _count(name: str, n: int = 1):
+    with _lock:
+        _counters[name] += n
+
+
+# ----------------- disk store -----------------
+def _disk_dir() -> Path:
+    d = Path(current_app.instance_path) / "ocr_cache"
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+def _disk_path(key: str) -> Path:
+    return _disk_dir() / (key.replace(":", "_") + ".json")
+
+
+def _disk_evict(d: Path):
+    entries = [e for e in os.scandir(d) if e.name.endswith(".json")]
+    overflow = len(entries) - OCR_CACHE_MAX_ENTRIES
+    if overflow <= 0:
+        return
+    # xoá dư thêm 10% để các lần ghi kế tiếp không phải xoá lại ngay
+    overflow += OCR_CACHE_MAX_ENTRIES // 10
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    removed = 0
+    for e in entries[:overflow]:
+        try:
+            os.remove(e.path)
+            removed += 1
+        except OSError:
+            pass
+    _count("evictions", removed)
+
+
+# ----------------- public -----------------
+def get(key: str) -> dict | None:
+    value = None
+    if use_shared_cache():
+        value = cache.get(f"ocr:{key}")
+    else:
+        path = _disk_path(key)
+        try:
+            value = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path)  # đánh dấu vừa dùng (LRU theo mtime)
+        except (OSError, ValueError):
+            value = None
+    _count("hits" if value is not None else "misses")
+    return value
+
+
+def put(key: str, value: dict):
+    if use_shared_cache():
+        cache.set(f"ocr:{key}", value, timeout=OCR_CACHE_TTL)
+    else:
+        path = _disk_path(key)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(value, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+        _disk_evict(path.parent)
+    _count("stores")
+
+
+def stats() -> dict:
+    with _lock:
+        out = dict(_counters)
+    total = out["hits"] + out["misses"]
+    out["hit_rate"] = round(out["hits"] / total, 3) if total else None
+    return out
@@ -0,0 +1,267 @@
+# backend/app/ai/ocr/worker_pool.py
+"""
+Pool tiến trình riêng cho OCR hoá đơn.
+
+- Mỗi tiến trình con giữ 1 EasyOCR reader đã warm (load trong initializer),
+  nên request web không bao giờ chạy OCR trên thread của Flask.
+- Hàng đợi có giới hạn (OCR_QUEUE_SIZE job đang chờ + đang chạy); đầy thì
+  submit() ném OcrBusy để route trả 503 + Retry-After thay vì xếp hàng vô hạn.
+- API đồng bộ (submit + wait) và bất đồng bộ (submit, rồi get_job theo job_id).
+- Mỗi kết quả kèm timings theo stage: queue_wait / preprocess / ocr / parse / total;
+  stats() cộng dồn thời gian OCR + số pixel theo preset tiền xử lý.
+
+OCR_WORKERS: số tiến trình OCR của MỖI tiến trình web (mặc định 1). Mỗi
+tiến trình giữ 1 EasyOCR reader riêng nên bộ nhớ = số worker gunicorn x
+OCR_WORKERS x reader -> đặt theo deployment, không theo số core.
+OCR_WORKERS=0 chạy trong 1 thread của tiến trình hiện tại (dev / test).
+Future của job nằm trong tiến trình web đã nhận nó; trạng thái + kết quả
+được ghi thêm ra job_store để worker web nào cũng trả lời được khi poll.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app, has_app_context
+
+from . import job_store
+from .job_store import OCR_JOB_TTL
+
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "1"))
+OCR_QUEUE_SIZE = int(os.getenv("OCR_QUEUE_SIZE", str(max(OCR_WORKERS, 1) * 4)))
+
+
+class OcrBusy(Exception):
+    """Hàng đợi OCR đã đầy."""
+
+    def __init__(self, retry_after: int = 5):
+        super().__init__("Hệ thống OCR đang bận, vui lòng thử lại sau")
+        self.retry_after = retry_after
+
+
+# ----------------- phần chạy trong tiến trình con -----------------
+def _init_worker():
+    from .. import registry
+    from . import ocr_engine_easy  # noqa: F401  (đăng ký loader "easyocr")
+
+    registry.get("easyocr")
+
+
+def _process(img_bytes: bytes, submitted_at: float, preset: str | None = None) -> dict:
+    from .ocr_engine_easy import run_easy_ocr
+    from .ocr_parser import parse_receipt
+
+    started = time.time()
+    timings = {"queue_wait_ms": round((started - submitted_at) * 1000, 1)}
+
+    t = time.perf_counter()
+    lines = run_easy_ocr(img_bytes, timings=timings, preset=preset)
+    timings["ocr_total_ms"] = round((time.perf_counter() - t) * 1000, 1)
+
+    t = time.perf_counter()
+    parsed = parse_receipt(lines)
+    timings["parse_ms"] = round((time.perf_counter() - t) * 1000, 1)
+
+    return {"raw_lines": lines, **parsed, "timings": timings}
+
+
+# ----------------- phần chạy trong tiến trình web -----------------
+class _Job:
+    __slots__ = ("id", "user_id", "future", "submitted_at", "finished_at")
+
+    def __init__(self, user_id, future: Future, submitted_at: float):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.future = future
+        self.submitted_at = submitted_at
+        self.finished_at = None
+
+    def to_dict(self) -> dict:
+        out = {"job_id": self.id}
+        fut = self.future
+        if not fut.done():
+            out["status"] = "running" if fut.running() else "queued"
+            return out
+        err = fut.exception()
+        if err is not None:
+            out.update(status="error", message=str(err))
+            return out
+        result = dict(fut.result())
+        timings = dict(result.pop("timings", {}))
+        finished_at = self.finished_at or time.time()
+        timings["total_ms"] = round((finished_at - self.submitted_at) * 1000, 1)
+        out.update(status="done", result=result, timings=timings)
+        return out
+
+    def publish(self, app):
+        """Ghi trạng thái hiện tại ra job_store (kèm user_id để kiểm quyền)."""
+        if app is None:
+            return
+        try:
+            with app.app_context():
+                job_store.put(self.id, {**self.to_dict(), "user_id": self.user_id})
+        except Exception as e:
+            print(f"[OCR] Không ghi được trạng thái job {self.id}: {e}")
+
+
+_lock = threading.Lock()
+_executor = None
+_slots = threading.BoundedSemaphore(OCR_QUEUE_SIZE)
+_jobs: "OrderedDict[str, _Job]" = OrderedDict()
+_preset_stats: dict[str, dict] = {}
+
+
+def _get_executor(reset: bool = False):
+    global _executor
+    with _lock:
+        if reset and _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+        if _executor is None:
+            if OCR_WORKERS <= 0:
+                _executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="ocr", initializer=_init_worker
+                )
+            else:
+                # spawn: không fork tiến trình web đang có thread / kết nối DB
+                _executor = ProcessPoolExecutor(
+                    max_workers=OCR_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+        return _executor
+
+
+def _prune():
+    now = time.time()
+    with _lock:
+        for job_id in list(_jobs):
+            job = _jobs[job_id]
+            if job.finished_at is None or now - job.finished_at < OCR_JOB_TTL:
+                break
+            del _jobs[job_id]
+
+
+def _record(future: Future):
+    """Cộng dồn thời gian OCR / số pixel theo preset."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    timings = future.result().get("timings", {})
+    info = timings.get("preprocess") or {}
+    preset = info.get("preset")
+    if not preset:
+        return
+    w, h = info.get("size", (0, 0))
+    with _lock:
+        st = _preset_stats.setdefault(preset, {"count": 0, "ocr_ms": 0.0, "megapixels": 0.0})
+        st["count"] += 1
+        st["ocr_ms"] += timings.get("ocr_ms", 0.0)
+        st["megapixels"] += w * h / 1e6
+
+
+def submit(
+    img_bytes: bytes,
+    user_id=None,
+    preset: str | None = None,
+    on_result=None,
+    wait_slot: float = 0,
+) -> _Job:
+    """
+    Đưa ảnh vào hàng đợi OCR; ném OcrBusy nếu hàng đợi đầy
+    (sau khi chờ tối đa wait_slot giây để có chỗ trống).
+    on_result(result) được gọi (ở thread callback) khi job thành công.
+    """
+    acquired = _slots.acquire(timeout=wait_slot) if wait_slot > 0 else _slots.acquire(blocking=False)
+    if not acquired:
+        raise OcrBusy()
+    _prune()
+
+    submitted_at = time.time()
+    try:
+        try:
+            future = _get_executor().submit(_process, img_bytes, submitted_at, preset)
+        except BrokenProcessPool:
+            # tiến trình con chết (OOM, ...) -> dựng lại pool 1 lần
+            future = _get_executor(reset=True).submit(_process, img_bytes, submitted_at, preset)
+    except Exception:
+        _slots.release()
+        raise
+    job = _Job(user_id, future, submitted_at)
+    app = current_app._get_current_object() if has_app_context() else None
+    job.publish(app)
+
+    def _done(fut):
+        job.finished_at = time.time()
+        _slots.release()
+        _record(fut)
+        job.publish(app)
+        if on_result is not None and not fut.cancelled() and fut.exception() is None:
+            try:
+                on_result(fut.result())
+            except Exception:
+                pass
+
+    with _lock:
+        _jobs[job.id] = job
+    future.add_done_callback(_done)
+    return job
+
+
+def get_job(job_id: str, user_id=None) -> dict | None:
+    """
+    Trạng thái job theo id (chỉ trả job của đúng user). Job của tiến trình
+    này đọc thẳng từ Future, job của tiến trình web khác đọc từ job_store.
+    Cần app context.
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+    if job is not None:
+        owner, state = job.user_id, job.to_dict()
+    else:
+        state = job_store.get(job_id)
+        if state is None:
+            return None
+        owner = state.pop("user_id", None)
+    if user_id is not None and str(owner) != str(user_id):
+        return None
+    return state
+
+
+def wait(job: _Job, timeout: float | None = None) -> dict:
+    """Chờ job xong tối đa 'timeout' giây rồi trả trạng thái hiện tại."""
+    try:
+        job.future.exception(timeout=timeout)
+    except FutureTimeout:
+        pass
+    else:
+        if job.finished_at is None:
+            job.finished_at = time.time()
+    return job.to_dict()
+
+
+def stats() -> dict:
+    with _lock:
+        jobs = list(_jobs.values())
+        presets = {
+            name: {
+                "count": st["count"],
+                "avg_ocr_ms": round(st["ocr_ms"] / st["count"], 1),
+                "avg_megapixels": round(st["megapixels"] / st["count"], 2),
+            }
+            for name, st in _preset_stats.items()
+        }
+    pending = sum(1 for j in jobs if not j.future.done())
+    return {
+        "workers": OCR_WORKERS,
+        "queue_size": OCR_QUEUE_SIZE,
+        "pending": pending,
+        "tracked_jobs": len(jobs),
+        "presets": presets,
+    }
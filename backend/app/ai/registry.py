@@ -0,0 +1,68 @@
+# backend/app/ai/registry.py
+"""
+Registry cho các model / thư viện AI nặng (EasyOCR, classifier, ...).
+
+Module chỉ đăng ký hàm load; model được khởi tạo ở lần dùng đầu tiên
+(get), nên worker không phục vụ OCR sẽ không bao giờ import easyocr/torch.
+Muốn load sẵn (vd. worker OCR riêng) thì gọi preload() hoặc đặt env
+MODEL_PRELOAD="easyocr,classifier" / "all".
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Callable
+
+_loaders: dict[str, Callable[[], Any]] = {}
+_models: dict[str, Any] = {}
+_load_ms: dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def register(name: str, loader: Callable[[], Any]):
+    """Đăng ký hàm load (không gọi ngay)."""
+    _loaders[name] = loader
+
+
+def get(name: str):
+    """Trả model đã load; load lần đầu (thread-safe, chỉ 1 lần)."""
+    try:
+        return _models[name]
+    except KeyError:
+        pass
+    with _lock:
+        if name not in _models:
+            if name not in _loaders:
+                raise KeyError(f"Model chưa đăng ký: {name}")
+            t0 = time.perf_counter()
+            _models[name] = _loaders[name]()
+            _load_ms[name] = round((time.perf_counter() - t0) * 1000, 1)
+            print(f"[MODEL] Loaded {name} in {_load_ms[name]} ms")
+        return _models[name]
+
+
+def preload(names=None) -> dict[str, float]:
+    """Load trước các model (mặc định: tất cả đã đăng ký). Trả thời gian load (ms)."""
+    names = list(_loaders) if names is None else list(names)
+    for name in names:
+        get(name)
+    return {n: _load_ms.get(n, 0.0) for n in names}
+
+
+def preload_from_env():
+    """Đọc MODEL_PRELOAD (danh sách tên, phân cách dấu phẩy, hoặc "all")."""
+    raw = os.getenv("MODEL_PRELOAD", "").strip()
+    if not raw:
+        return {}
+    if raw.lower() == "all":
+        return preload()
+    return preload(n.strip() for n in raw.split(",") if n.strip())
+
+
+def status() -> dict:
+    """Trạng thái từng model: đã load chưa và mất bao lâu."""
+    return {
+        name: {"loaded": name in _models, "load_ms": _load_ms.get(name)}
+        for name in _loaders
+    }
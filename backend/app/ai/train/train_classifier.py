@@ -1,5 +1,8 @@
-import pandas as pd
 import pickle
+import sys
+from pathlib import Path
+
+import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LogisticRegression
 from sklearn.pipeline import Pipeline
@@ -43,3 +46,11 @@ with open("../classifier.pkl", "wb") as f:
     pickle.dump(pipeline, f)
 
 print("Đã lưu mô hình vào ../classifier.pkl")
+
+# Export bản gọn cho app (vocabulary + idf + trọng số) qua chính
+# ClassifierService -> app không cần unpickle sklearn khi chạy
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))  # backend/
+from app.ai.classifier import ClassifierService
+
+ClassifierService.from_pipeline(pipeline).export_npz("../classifier.npz")
+print("Đã export trọng số vào ../classifier.npz")
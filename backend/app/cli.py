@@ -0,0 +1,158 @@
+# backend/app/cli.py
+import click
+from flask import Flask
+from flask.cli import AppGroup
+
+rollup_cli = AppGroup("rollup", help="Bảo trì bảng rollup thu / chi.")
+
+
+@rollup_cli.command("rebuild")
+@click.option("--user-id", type=int, default=None, help="Chỉ dựng lại cho 1 user.")
+def rollup_rebuild(user_id):
+    """Dựng lại user_daily_totals & user_month_category_totals từ dữ liệu gốc."""
+    from .services.rollup_service import rebuild
+
+    counts = rebuild(user_id)
+    for table, n in counts.items():
+        click.echo(f"{table}: {n} dòng")
+
+
+@rollup_cli.command("check")
+@click.option("--user-id", type=int, default=None, help="Chỉ kiểm tra 1 user.")
+@click.option("--fix", is_flag=True, help="Tự dựng lại nếu phát hiện lệch.")
+def rollup_check(user_id, fix):
+    """So sánh rollup với dữ liệu gốc; exit code 1 nếu lệch (khi không --fix)."""
+    from .services.rollup_service import check_consistency, rebuild
+
+    issues = check_consistency(user_id)
+    if not issues:
+        click.echo("Rollup nhất quán.")
+        return
+
+    for it in issues[:50]:
+        click.echo(f"[{it['table']}] {it['key']}: expected={it['expected']} actual={it['actual']}")
+    if len(issues) > 50:
+        click.echo(f"... và {len(issues) - 50} dòng lệch khác")
+
+    if fix:
+        rebuild(user_id)
+        click.echo("Đã dựng lại rollup.")
+    else:
+        raise SystemExit(1)
+
+
+forecast_cli = AppGroup("forecast", help="Công cụ cho các backend dự báo chi tiêu.")
+
+
+@forecast_cli.command("bench")
+@click.option("--backend", "backends", multiple=True, help="Backend cần đo (mặc định: tất cả).")
+@click.option("--series", type=int, default=5, show_default=True, help="Số chuỗi giả lập.")
+@click.option("--days", type=int, default=365, show_default=True, help="Số ngày huấn luyện.")
+@click.option("--horizon", type=int, default=30, show_default=True, help="Số ngày dự báo.")
+def forecast_bench(backends, series, days, horizon):
+    """So sánh độ chính xác & thời gian fit của các backend trên chuỗi giả lập."""
+    from .services.forecasters import benchmark
+
+    results = benchmark(backends or None, series=series, days=days, horizon=horizon)
+    click.echo(f"{'backend':<10}{'sai số tổng %':>15}{'MAE/ngày':>14}{'fit ms':>12}")
+    for name, r in results.items():
+        click.echo(
+            f"{name:<10}{r['total_error_pct']:>15.2f}{r['daily_mae']:>14,.0f}{r['fit_ms']:>12.3f}"
+        )
+
+
+ocr_cli = AppGroup("ocr", help="Công cụ cho pipeline OCR hoá đơn.")
+
+
+@ocr_cli.command("bench")
+@click.option("--dir", "directory", default=None, help="Thư mục ảnh mẫu (mặc định ai/ocr/test_images).")
+@click.option("--limit", type=int, default=20, show_default=True, help="Số ảnh tối đa.")
+@click.option("--preset", "presets", multiple=True, help="Preset cần đo (mặc định: tất cả).")
+def ocr_bench(directory, limit, presets):
+    """So sánh thời gian & độ chính xác OCR giữa các preset tiền xử lý."""
+    from .ai.ocr.bench import benchmark, sample_images
+
+    paths = sample_images(directory, limit)
+    click.echo(f"{len(paths)} ảnh mẫu")
+    results = benchmark(paths, list(presets) or None)
+    click.echo(
+        f"{'preset':<10}{'ms/ảnh':>10}{'MP':>7}{'tiết kiệm %':>13}{'giống text':>12}{'số tiền':>9}{'ngày':>7}"
+    )
+    for name, r in results.items():
+        click.echo(
+            f"{name:<10}{r['avg_ms']:>10.1f}{r['avg_megapixels']:>7.2f}{r['saved_pct']:>13.1f}"
+            f"{r['text_similarity']:>12.3f}{r['amount_match']:>9.3f}{r['date_match']:>7.3f}"
+        )
+
+
+chat_cli = AppGroup("chat", help="Công cụ cho chatbot.")
+
+
+@chat_cli.command("bench")
+@click.option("--file", "path", default=None, help="Corpus tin nhắn: .csv (cột input), .jsonl (title/body) hoặc .txt (mặc định chatbot_test_full.csv).")
+@click.option("--repeat", type=int, default=20, show_default=True, help="Số lần lặp corpus.")
+def chat_bench(path, repeat):
+    """Đo số tin nhắn/giây của bộ nhận diện intent (regex từng pattern vs engine đã compile)."""
+    from .ai.chatbot_intent import benchmark, load_messages
+
+    r = benchmark(load_messages(path), repeat=repeat)
+    click.echo(f"{r['messages']} tin nhắn, {r['patterns']} pattern")
+    click.echo(f"{'từng pattern':<16}{r['naive_msgs_per_s']:>12,} msg/s")
+    click.echo(f"{'đã compile':<16}{r['compiled_msgs_per_s']:>12,} msg/s  (x{r['speedup']})")
+    if r["mismatches"]:
+        click.echo(f"{r['mismatches']} tin nhắn cho intent khác nhau!")
+        raise SystemExit(1)
+
+
+precompute_cli = AppGroup("precompute", help="Tính sẵn dự báo + điểm sức khoẻ tài chính (chạy ban đêm).")
+
+
+@precompute_cli.command("run")
+@click.option("--chunk-size", type=int, default=None, help="Số user mỗi lô (mặc định PRECOMPUTE_CHUNK_SIZE).")
+@click.option("--workers", type=int, default=None, help="Số tiến trình (mặc định PRECOMPUTE_WORKERS; <=1: không dùng pool).")
+@click.option("--fresh", is_flag=True, help="Bỏ qua lần chạy dở, chạy lại từ đầu.")
+@click.option("--limit", type=int, default=None, help="Dừng sau khoảng N user (chạy tiếp bằng lần gọi sau).")
+def precompute_run(chunk_size, workers, fresh, limit):
+    """Duyệt mọi user theo lô, lưu kết quả vào precomputed_results (có checkpoint)."""
+    from .services import precompute_service as ps
+
+    def progress(run, processed, elapsed):
+        done = run.done_users + run.failed_users
+        pct = done * 100 / run.total_users if run.total_users else 100
+        rate = processed / elapsed if elapsed else 0
+        click.echo(
+            f"[run {run.id}] {done}/{run.total_users} user ({pct:.1f}%), "
+            f"{run.failed_users} lỗi, {rate:.1f} user/s, checkpoint user_id={run.last_user_id}"
+        )
+
+    run = ps.run(
+        chunk_size=chunk_size or ps.PRECOMPUTE_CHUNK_SIZE,
+        workers=workers if workers is not None else ps.PRECOMPUTE_WORKERS,
+        resume=not fresh,
+        limit=limit,
+        progress=progress,
+    )
+    click.echo(f"[run {run.id}] {run.status}")
+    if run.last_error:
+        click.echo(f"lỗi gần nhất: {run.last_error}")
+
+
+@precompute_cli.command("status")
+def precompute_status():
+    """Các lần chạy gần nhất."""
+    from .services.precompute_service import latest_runs
+
+    for r in latest_runs():
+        click.echo(
+            f"[run {r.id}] {r.status:<8} {r.done_users}/{r.total_users} user, {r.failed_users} lỗi, "
+            f"checkpoint={r.last_user_id}, bắt đầu {r.started_at:%Y-%m-%d %H:%M}"
+            + (f", xong {r.finished_at:%H:%M}" if r.finished_at else "")
+        )
+
+
+def register_commands(app: Flask):
+    app.cli.add_command(rollup_cli)
+    app.cli.add_command(forecast_cli)
+    app.cli.add_command(ocr_cli)
+    app.cli.add_command(chat_cli)
+    app.cli.add_command(precompute_cli)
@@ -38,6 +38,8 @@ from .income import Income
 from .budget import Budget
 from .saving import SavingsGoal
 from .money_source import MoneySource
+from .rollup import UserDailyTotal, UserMonthCategoryTotal
+from .precompute import PrecomputedResult, PrecomputeRun
 
 
 def register_models():
@@ -53,6 +55,10 @@ __all__ = [
     "Budget",
     "SavingsGoal",
     "MoneySource",
+    "UserDailyTotal",
+    "UserMonthCategoryTotal",
+    "PrecomputedResult",
+    "PrecomputeRun",
     "register_models",
     "BaseModel",
     "TimestampMixin",
@@ -0,0 +1,47 @@
+# backend/app/models/precompute.py
+from __future__ import annotations
+from sqlalchemy import ForeignKey, UniqueConstraint, CheckConstraint
+from . import BaseModel, db
+
+
+class PrecomputedResult(BaseModel):
+    """
+    Kết quả tính sẵn theo user (job `flask precompute run`).
+    kind: 'forecast' (period_key = "<periods>:<backend>")
+        | 'health'   (period_key = "YYYY-MM")
+    data_version: phiên bản dữ liệu lúc tính -> request chỉ dùng khi còn khớp.
+    """
+    __tablename__ = "precomputed_results"
+    __table_args__ = (
+        UniqueConstraint("user_id", "kind", "period_key", name="uq_precomputed_user_kind_key"),
+        CheckConstraint("kind IN ('forecast','health')", name="ck_precomputed_kind"),
+    )
+
+    user_id = db.Column(
+        db.Integer,
+        ForeignKey("users.id", onupdate="CASCADE", ondelete="CASCADE"),
+        nullable=False,
+    )
+    kind = db.Column(db.String(20), nullable=False)
+    period_key = db.Column(db.String(32), nullable=False)
+    data_version = db.Column(db.String(32), nullable=False)
+    result = db.Column(db.JSON, nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+
+class PrecomputeRun(BaseModel):
+    """
+    1 lần chạy job tính sẵn. last_user_id là checkpoint: user được duyệt
+    theo id tăng dần, chạy lại với --resume tiếp tục từ sau user này.
+    status: 'running' | 'done' | 'failed'
+    """
+    __tablename__ = "precompute_runs"
+
+    status = db.Column(db.String(16), nullable=False, default="running")
+    last_user_id = db.Column(db.Integer, nullable=False, default=0)
+    total_users = db.Column(db.Integer, nullable=False, default=0)
+    done_users = db.Column(db.Integer, nullable=False, default=0)
+    failed_users = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    started_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime)
@@ -0,0 +1,63 @@
+# backend/app/models/rollup.py
+from __future__ import annotations
+from sqlalchemy import ForeignKey, UniqueConstraint, CheckConstraint, Index
+from . import BaseModel, db
+
+
+class UserDailyTotal(BaseModel):
+    """
+    Tổng thu / chi theo ngày của từng user (bảng rollup).
+    Được cập nhật tăng dần mỗi khi tạo / sửa / xoá Expense hoặc Income,
+    để các trang thống kê đọc O(số ngày) thay vì O(số giao dịch).
+    """
+    __tablename__ = "user_daily_totals"
+    __table_args__ = (
+        UniqueConstraint("user_id", "day", name="uq_udt_user_day"),
+        Index("idx_udt_user_day", "user_id", "day"),
+    )
+
+    user_id = db.Column(
+        db.Integer,
+        ForeignKey("users.id", onupdate="CASCADE", ondelete="CASCADE"),
+        nullable=False,
+    )
+    day = db.Column(db.Date, nullable=False)
+
+    expense_total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    expense_count = db.Column(db.Integer, nullable=False, default=0)
+    income_total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    income_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class UserMonthCategoryTotal(BaseModel):
+    """
+    Tổng thu / chi theo (tháng, danh mục) của từng user (bảng rollup).
+    kind: 'expense' | 'income'
+    """
+    __tablename__ = "user_month_category_totals"
+    __table_args__ = (
+        UniqueConstraint(
+            "user_id", "period_year", "period_month", "category_id", "kind",
+            name="uq_umct_user_period_cat_kind",
+        ),
+        CheckConstraint("period_month BETWEEN 1 AND 12", name="ck_umct_month_1_12"),
+        CheckConstraint("kind IN ('expense','income')", name="ck_umct_kind"),
+        Index("idx_umct_user_period", "user_id", "period_year", "period_month"),
+    )
+
+    user_id = db.Column(
+        db.Integer,
+        ForeignKey("users.id", onupdate="CASCADE", ondelete="CASCADE"),
+        nullable=False,
+    )
+    category_id = db.Column(
+        db.Integer,
+        ForeignKey("categories.id", onupdate="CASCADE", ondelete="CASCADE"),
+        nullable=False,
+    )
+    period_year = db.Column(db.Integer, nullable=False)
+    period_month = db.Column(db.Integer, nullable=False)
+    kind = db.Column(db.String(10), nullable=False)
+
+    total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    tx_count = db.Column(db.Integer, nullable=False, default=0)
@@ -58,6 +58,14 @@ class SavingsGoal(BaseModel):
             return 0.0
         return float(self.current_amount or 0) / float(self.target_amount)
 
+    def months_left(self, today) -> int:
+        """Số tháng còn lại tới deadline (âm nếu đã quá hạn, 0 nếu không có)."""
+        if not self.deadline:
+            return 0
+        return (self.deadline.year - today.year) * 12 + (
+            self.deadline.month - today.month
+        )
+
 
 class SavingsHistory(BaseModel):
     """
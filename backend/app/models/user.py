@@ -15,6 +15,8 @@ class User(BaseModel):
     password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(16), nullable=False, default="user")
     is_verified = db.Column(db.Boolean, nullable=False, default=False)
+    # tăng mỗi khi dữ liệu tài chính của user đổi (data_version_service)
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     # Relations (giữ nguyên)
     categories = relationship(
@@ -5,6 +5,8 @@ from .web import bp as web_bp
 from .auth import bp as auth_bp
 from .expenses_api import bp as expenses_bp
 from .incomes_api import bp as incomes_bp
+from .imports_api import bp as imports_bp
+from .exports_api import bp as exports_bp
 from .categories import bp as categories_bp
 from .budgets import bp as budgets_bp
 from .savings import bp as savings_bp
@@ -26,6 +28,8 @@ def register_blueprints(app: Flask):
     app.register_blueprint(auth_bp)
     app.register_blueprint(expenses_bp)
     app.register_blueprint(incomes_bp)
+    app.register_blueprint(imports_bp)
+    app.register_blueprint(exports_bp)
     app.register_blueprint(categories_bp)
     app.register_blueprint(budgets_bp)
     app.register_blueprint(dashboard_api_bp)
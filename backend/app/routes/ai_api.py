@@ -1,5 +1,7 @@
 # backend/app/routes/ai_api.py
-from flask import Blueprint, request, jsonify
+import json
+
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required
 from datetime import datetime
 
@@ -9,6 +11,7 @@ from ..models.income import Income
 from ..models.category import Category
 
 from ..ai.chat_pipeline import process_chat_message
+from ..services import rollup_service
 from ..ai.nlp_rules import extract_amount_vnd, detect_tx_type
 
 
@@ -89,6 +92,10 @@ def create_transaction():
         )
 
     db.session.add(tx)
+    if tx_type == "expense":
+        rollup_service.add_expense(tx)
+    else:
+        rollup_service.add_income(tx)
     db.session.commit()
 
     money_str = f"{amount:,.0f} đ".replace(",", ".")
@@ -149,6 +156,10 @@ def ai_chat():
     if not user_id:
         return jsonify({"error": "Unauthorized"}), 401
 
+    # SSE: ?stream=1, {"stream": true} hoặc Accept: text/event-stream
+    if _wants_stream(data):
+        return _chat_stream(user_id, text)
+
     # Gọi pipeline
     try:
         result = process_chat_message(user_id, text)
@@ -160,3 +171,55 @@ def ai_chat():
 
     return jsonify(result), 200
 
+
+def _wants_stream(data: dict) -> bool:
+    flag = request.args.get("stream") or data.get("stream")
+    return str(flag).lower() in ("1", "true") or request.accept_mimetypes.best == "text/event-stream"
+
+
+def _chat_stream(user_id, text):
+    """
+    Trả Server-Sent Events:
+      event: token  data: {"text": "..."}   (từng đoạn câu trả lời của LLM)
+      event: result data: {...}             (kết quả cuối như /chat thường)
+      event: error  data: {"error": ...}
+    """
+    from ..ai.chat_pipeline import stream_chat_message
+
+    def _sse(event: str, payload) -> str:
+        return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    def generate():
+        try:
+            for event, payload in stream_chat_message(user_id, text):
+                yield _sse(event, payload)
+        except Exception as e:
+            yield _sse("error", {"error": "Pipeline failed", "detail": str(e)})
+
+    resp = Response(stream_with_context(generate()), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"  # nginx: không buffer stream
+    return resp
+
+
+@bp.get("/llm/stats")
+@jwt_required()
+def llm_stats():
+    from ..ai import conversation_state, llm_cache, llm_gateway
+    from ..services import month_snapshot_service
+
+    return jsonify({
+        **llm_gateway.stats(),
+        "cache": llm_cache.stats(),
+        "conversation_state": conversation_state.stats(),
+        "month_snapshot": month_snapshot_service.stats(),
+    })
+
+
+@bp.get("/month_snapshot")
+@jwt_required()
+def month_snapshot():
+    """Snapshot tháng hiện tại chatbot dùng để trả lời (kèm meta độ cũ)."""
+    from ..services import month_snapshot_service
+
+    return jsonify(month_snapshot_service.get(_uid()))
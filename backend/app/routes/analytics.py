@@ -2,7 +2,7 @@
 from datetime import datetime, date, timedelta
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import func
+from sqlalchemy import func, select
 from ..extensions import db
 from ..models.expense import Expense
 from ..models.income import Income
@@ -10,8 +10,12 @@ from ..models.category import Category
 from ..models.payment_method import PaymentMethod
 from ..models.budget import Budget
 from ..models.saving import SavingsGoal, SavingsHistory 
+from ..models.rollup import UserDailyTotal
+from ..services import listing_service
+from ..services.rollup_service import category_totals
 from ..services.forecast_service import build_expense_forecast 
 from ..services.financial_health_service import compute_financial_health
+from ..utils.http_cache import versioned_json
 
 
 bp = Blueprint("analytics_api", __name__, url_prefix="/api/analytics")
@@ -60,6 +64,7 @@ def _range_from_preset(preset: str):
 # ========== 1. CHI TIÊU ==========
 @bp.get("/expenses")
 @jwt_required()
+@versioned_json
 def expenses():
     uid = _uid()
     if not uid:
@@ -111,6 +116,7 @@ def expenses():
 # ========== 2. THU NHẬP ==========
 @bp.get("/incomes")
 @jwt_required()
+@versioned_json
 def incomes():
     uid = _uid()
     if not uid:
@@ -159,6 +165,7 @@ def incomes():
 # ========== 3. GIAO DỊCH (THU + CHI) ==========
 @bp.get("/transactions")
 @jwt_required()
+@versioned_json
 def transactions():
     uid = _uid()
     if not uid:
@@ -171,81 +178,26 @@ def transactions():
     cat_id = request.args.get("category_id", type=int)
     cat_name = request.args.get("category", type=str)
 
-    # ----- chi tiêu -----
-    q_exp = (
-        db.session.query(
-            Expense.spent_at,
-            Expense.amount,
-            Expense.note,
-            Category.name.label("category_name"),
-            PaymentMethod.name.label("method_name"),
-        )
-        .join(Category, Category.id == Expense.category_id)
-        .outerjoin(PaymentMethod, PaymentMethod.id == Expense.payment_method_id)
-        .filter(
-            Expense.user_id == uid,
-            Expense.spent_at >= d_from,
-            Expense.spent_at <= d_to,
+    # ?limit=&cursor= -> {items, next_cursor, has_more}; không có -> mảng như cũ
+    try:
+        limit = listing_service.clamp_limit(request.args.get("limit"))
+        cursor = request.args.get("cursor") or None
+        page = listing_service.list_transactions(
+            uid, d_from, d_to, category_id=cat_id, category=cat_name,
+            limit=limit, cursor=cursor,
         )
-    )
-    if cat_id:
-        q_exp = q_exp.filter(Expense.category_id == cat_id)
-    elif cat_name:
-        q_exp = q_exp.filter(Category.name == cat_name)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    exp_rows = [
-        {
-            "date": spent_at.isoformat(),
-            "desc": note or "",
-            "category": cat or "Khác",
-            "method": method or "",
-            "amount": float(amount or 0),
-            "kind": "expense",
-        }
-        for spent_at, amount, note, cat, method in q_exp.all()
-    ]
-
-    # ----- thu nhập -----
-    q_inc = (
-        db.session.query(
-            Income.received_at,
-            Income.amount,
-            Income.note,
-            Category.name.label("category_name"),
-        )
-        .join(Category, Category.id == Income.category_id)
-        .filter(
-            Income.user_id == uid,
-            Income.received_at >= d_from,
-            Income.received_at <= d_to,
-        )
-    )
-    if cat_id:
-        q_inc = q_inc.filter(Income.category_id == cat_id)
-    elif cat_name:
-        q_inc = q_inc.filter(Category.name == cat_name)
-
-    inc_rows = [
-        {
-            "date": received_at.isoformat(),
-            "desc": note or "",
-            "category": cat or "Thu nhập",
-            "method": "",
-            "amount": float(amount or 0),
-            "kind": "income",
-        }
-        for received_at, amount, note, cat in q_inc.all()
-    ]
-
-    rows = exp_rows + inc_rows
-    rows.sort(key=lambda x: x["date"], reverse=True)
-
-    return jsonify(rows), 200
+    if limit is None and cursor is None:
+        return jsonify(page["items"]), 200
+    return jsonify(page), 200
 
 
 # ========== 4. SUMMARY (KPI + PIE) ==========
 @bp.get("/summary")
 @jwt_required()
+@versioned_json
 def summary():
     uid = _uid()
     if not uid:
@@ -263,61 +215,52 @@ def summary():
     else:
         d_from, d_to = _range_from_preset(q_range)
 
-    # ====== tổng chi trong khoảng ======
-    total_expense = (
-        db.session.query(func.coalesce(func.sum(Expense.amount), 0.0))
-        .filter(
-            Expense.user_id == uid,
-            Expense.spent_at >= d_from,
-            Expense.spent_at <= d_to,
+    # ====== tổng chi / thu trong khoảng (rollup theo ngày) ======
+    total_expense, total_income = (
+        db.session.query(
+            func.coalesce(func.sum(UserDailyTotal.expense_total), 0.0),
+            func.coalesce(func.sum(UserDailyTotal.income_total), 0.0),
         )
-        .scalar()
-        or 0.0
-    )
-
-    # ====== tổng thu trong khoảng ======
-    total_income = (
-        db.session.query(func.coalesce(func.sum(Income.amount), 0.0))
         .filter(
-            Income.user_id == uid,
-            Income.received_at >= d_from,
-            Income.received_at <= d_to,
+            UserDailyTotal.user_id == uid,
+            UserDailyTotal.day >= d_from,
+            UserDailyTotal.day <= d_to,
         )
-        .scalar()
-        or 0.0
+        .one()
     )
+    total_expense = total_expense or 0.0
+    total_income = total_income or 0.0
 
-    # ====== lấy chi để dựng daily / monthly ======
+    # ====== daily / monthly từ rollup theo ngày ======
+    # Stream từng dòng (day, total, count) đã GROUP BY sẵn, bộ nhớ chỉ phụ
+    # thuộc số ngày trong cửa sổ chứ không phụ thuộc số giao dịch.
     start_5 = d_from - timedelta(days=150)
-    all_exp = (
-        Expense.query.filter(
-            Expense.user_id == uid,
-            Expense.spent_at >= start_5,
-            Expense.spent_at <= d_to,
-        ).all()
+    rows = db.session.execute(
+        select(
+            UserDailyTotal.day,
+            UserDailyTotal.expense_total,
+            UserDailyTotal.expense_count,
+        )
+        .where(
+            UserDailyTotal.user_id == uid,
+            UserDailyTotal.day >= start_5,
+            UserDailyTotal.day <= d_to,
+            UserDailyTotal.expense_count > 0,
+        )
+        .order_by(UserDailyTotal.day)
+        .execution_options(yield_per=500)
     )
 
-    # --- daily_expense (cho chart “Xu hướng chi theo ngày”) ---
-    daily_map = {}
-    for e in all_exp:
-      if not e.spent_at:
-        continue
-      key = e.spent_at.isoformat()
-      daily_map[key] = daily_map.get(key, 0.0) + float(e.amount or 0)
-
-    daily_expense = [
-        {"date": day, "total": total}
-        for day, total in sorted(daily_map.items())
-        if d_from.isoformat() <= day <= d_to.isoformat()
-    ]
-
-    # --- monthly_expense (cho chart tháng) ---
-    monthly_map = {}
-    for e in all_exp:
-        if not e.spent_at:
-            continue
-        ym = e.spent_at.strftime("%Y-%m")
-        monthly_map[ym] = monthly_map.get(ym, 0.0) + float(e.amount or 0)
+    daily_expense = []  # cho chart “Xu hướng chi theo ngày”
+    monthly_map = {}  # cho chart tháng
+    tx_count = 0
+    for day, total, count in rows:
+        amount = float(total or 0)
+        tx_count += int(count or 0)
+        if d_from <= day <= d_to:
+            daily_expense.append({"date": day.isoformat(), "total": amount})
+        ym = day.strftime("%Y-%m")
+        monthly_map[ym] = monthly_map.get(ym, 0.0) + amount
 
     monthly_expense = [
         {"month": ym, "total": amt}
@@ -327,20 +270,16 @@ def summary():
     # ====== chi theo danh mục ======
     expense_by_category = []
     if q_type in ("all", "expense"):
+        exp_sub = category_totals(uid, d_from, d_to, kind="expense")
         exp_cat_rows = (
             db.session.query(
                 Category.name.label("category"),
-                func.coalesce(func.sum(Expense.amount), 0.0).label("total"),
-            )
-            .join(Category, Category.id == Expense.category_id)
-            .filter(
-                Expense.user_id == uid,
-                Expense.spent_at >= d_from,
-                Expense.spent_at <= d_to,
-                Category.type == "expense",
+                func.coalesce(func.sum(exp_sub.c.total), 0.0).label("total"),
             )
+            .join(exp_sub, Category.id == exp_sub.c.category_id)
+            .filter(Category.type == "expense")
             .group_by(Category.name)
-            .order_by(func.sum(Expense.amount).desc())
+            .order_by(func.sum(exp_sub.c.total).desc())
             .all()
         )
         expense_by_category = [
@@ -351,20 +290,16 @@ def summary():
     # ====== thu theo danh mục ======
     income_by_category = []
     if q_type in ("all", "income"):
+        inc_sub = category_totals(uid, d_from, d_to, kind="income")
         inc_cat_rows = (
             db.session.query(
                 Category.name.label("category"),
-                func.coalesce(func.sum(Income.amount), 0.0).label("total"),
-            )
-            .join(Category, Category.id == Income.category_id)
-            .filter(
-                Income.user_id == uid,
-                Income.received_at >= d_from,
-                Income.received_at <= d_to,
-                Category.type == "income",
+                func.coalesce(func.sum(inc_sub.c.total), 0.0).label("total"),
             )
+            .join(inc_sub, Category.id == inc_sub.c.category_id)
+            .filter(Category.type == "income")
             .group_by(Category.name)
-            .order_by(func.sum(Income.amount).desc())
+            .order_by(func.sum(inc_sub.c.total).desc())
             .all()
         )
         income_by_category = [
@@ -380,11 +315,11 @@ def summary():
     last_month_end = d_from.replace(day=1) - timedelta(days=1)
     last_month_start = last_month_end.replace(day=1)
     prev_expense = (
-        db.session.query(func.coalesce(func.sum(Expense.amount), 0.0))
+        db.session.query(func.coalesce(func.sum(UserDailyTotal.expense_total), 0.0))
         .filter(
-            Expense.user_id == uid,
-            Expense.spent_at >= last_month_start,
-            Expense.spent_at <= last_month_end,
+            UserDailyTotal.user_id == uid,
+            UserDailyTotal.day >= last_month_start,
+            UserDailyTotal.day <= last_month_end,
         )
         .scalar()
         or 0.0
@@ -422,7 +357,7 @@ def summary():
         "total_expense": float(total_expense),
         "total_income": float(total_income),
         "avg_per_day": avg_per_day,
-        "tx_count": len(all_exp),
+        "tx_count": tx_count,
         "month_trend_pct": month_trend_pct,
         "budget_efficiency": budget_efficiency,
         "saving_rate": saving_rate,
@@ -446,6 +381,7 @@ def summary():
 # ========== 5. BUDGET COMPARISON (SỬA THEO MODEL THỰC TẾ) ==========
 @bp.get("/budget_comparison")
 @jwt_required()
+@versioned_json
 def budget_comparison():
     """
     So sánh chi tiêu thực tế vs ngân sách theo danh mục
@@ -469,20 +405,8 @@ def budget_comparison():
         d_from = today.replace(day=1)
         d_to = today
 
-    # --- chi tiêu thật theo danh mục trong khoảng ngày ---
-    exp_sub = (
-        db.session.query(
-            Expense.category_id.label("category_id"),
-            func.coalesce(func.sum(Expense.amount), 0.0).label("expense"),
-        )
-        .filter(
-            Expense.user_id == uid,
-            Expense.spent_at >= d_from,
-            Expense.spent_at <= d_to,
-        )
-        .group_by(Expense.category_id)
-        .subquery()
-    )
+    # --- chi tiêu thật theo danh mục trong khoảng ngày (rollup) ---
+    exp_sub = category_totals(uid, d_from, d_to, kind="expense")
 
     # --- ngân sách của tháng này ---
     # model bạn: limit_amount, period_year, period_month
@@ -506,7 +430,7 @@ def budget_comparison():
             Category.id.label("category_id"),
             Category.name.label("category"),
             func.coalesce(bud_sub.c.budget, 0.0).label("budget"),
-            func.coalesce(exp_sub.c.expense, 0.0).label("expense"),
+            func.coalesce(exp_sub.c.total, 0.0).label("expense"),
         )
         .filter(
             Category.type == "expense",
@@ -538,6 +462,7 @@ def budget_comparison():
 
 @bp.get("/savings_progress")
 @jwt_required()
+@versioned_json
 def savings_progress():
     """
     Trả danh sách mục tiêu tiết kiệm để trang analytics vẽ chart.
@@ -610,7 +535,12 @@ def savings_progress():
 @jwt_required()
 def forecast_expenses():
     user_id = get_jwt_identity()
-    result = build_expense_forecast(user_id, periods=30)
+    try:
+        result = build_expense_forecast(
+            user_id, periods=30, backend=request.args.get("backend")
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     if "error" in result:
         return jsonify(result), 400
@@ -619,6 +549,7 @@ def forecast_expenses():
 
 @bp.get("/health_score")
 @jwt_required()
+@versioned_json
 def analytics_health_score():
     user_id = get_jwt_identity()
 
@@ -631,5 +562,8 @@ def analytics_health_score():
         month = today.month
 
     data = compute_financial_health(user_id, year, month)
-    return jsonify(data), 200
+    resp = jsonify(data)
+    # điểm tạm (dự báo đang fit ở background) -> không cache / gắn ETag
+    resp.cache_control.no_store = data.get("forecast_pending", False)
+    return resp, 200
 
@@ -9,8 +9,6 @@ import random
 import re, time
 import json
 from datetime import datetime, timedelta
-from google.oauth2 import id_token as google_id_token
-from google.auth.transport import requests as google_requests
 from werkzeug.security import generate_password_hash
 
 bp = Blueprint("auth", __name__, url_prefix="/api/auth")
@@ -360,6 +358,10 @@ def login_with_google():
     if not GOOGLE_CLIENT_ID:
         return fail("Server chưa cấu hình GOOGLE_CLIENT_ID", 500)
 
+    # google-auth kéo theo requests/cryptography -> chỉ import khi dùng
+    from google.oauth2 import id_token as google_id_token
+    from google.auth.transport import requests as google_requests
+
     try:
         idinfo = google_id_token.verify_oauth2_token(
             credential, google_requests.Request(), GOOGLE_CLIENT_ID
@@ -2,13 +2,16 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy import func
+from sqlalchemy.orm import joinedload
 from ..extensions import db
 from ..models.budget import Budget
 from ..models.category import Category
 from decimal import Decimal
 
-from ..services.budget_service import spend_used
-from ..services.budget_ai_service import projected_overshoot
+from ..services.budget_service import month_budgets, spend_used, spent_by_category
+from ..services.budget_ai_service import month_overshoots
+from ..services import month_snapshot_service
+from ..utils.http_cache import versioned_json
 from datetime import date
 
 bp = Blueprint("budgets_api", __name__, url_prefix="/api/budgets")
@@ -34,13 +37,22 @@ def current_user_id():
 def _yyyy_mm(y: int, m: int) -> str:
     return f"{int(y):04d}-{int(m):02d}"
 
-def budget_to_dict(b: Budget, yyyy_mm: str | None = None, force_user_id: int | None = None):
+def budget_to_dict(
+    b: Budget,
+    yyyy_mm: str | None = None,
+    force_user_id: int | None = None,
+    spent: float | None = None,
+):
     """
     Nếu truyền yyyy_mm -> tự tính 'spent' từ bảng Expense đúng theo tháng.
+    Danh sách nhiều ngân sách: truyền sẵn spent (spent_by_category) để khỏi
+    query từng dòng.
     """
     limit = float(b.limit_amount or 0.0)
     spent_val = 0.0
-    if yyyy_mm:
+    if spent is not None:
+        spent_val = spent
+    elif yyyy_mm:
         uid = force_user_id if force_user_id is not None else b.user_id
         spent_val = spend_used(uid, b.category_id, yyyy_mm)
 
@@ -61,8 +73,9 @@ def budget_to_dict(b: Budget, yyyy_mm: str | None = None, force_user_id: int | N
 # ---- GET /api/budgets?month=YYYY-MM hoặc ?year=YYYY&month=MM ----
 @bp.get("/")
 @jwt_required(optional=True)  # cho phép xem khi chưa login nếu muốn
+@versioned_json
 def list_budgets():
-    q = Budget.query
+    q = Budget.query.options(joinedload(Budget.category))
     # lọc theo user nếu cần
     uid = current_user_id()
     if uid is not None:
@@ -91,10 +104,15 @@ def list_budgets():
     rows = q.order_by(Budget.period_year.desc(), Budget.period_month.desc()).all()
 
     # Nếu lọc cụ thể một tháng -> tính spent đúng tháng đó; nếu không, trả về 0 để tránh hiểu sai
-    items = [
-        budget_to_dict(b, yyyy_mm=yyyy_mm if yyyy_mm else None, force_user_id=uid)
-        for b in rows
-    ]
+    if yyyy_mm and uid is not None:
+        # 1 query chi theo danh mục cho cả tháng thay vì mỗi dòng 1 query
+        spent = spent_by_category(uid, yyyy_mm) if rows else {}
+        items = [budget_to_dict(b, spent=spent.get(int(b.category_id), 0.0)) for b in rows]
+    else:
+        items = [
+            budget_to_dict(b, yyyy_mm=yyyy_mm if yyyy_mm else None, force_user_id=uid)
+            for b in rows
+        ]
 
     # KPI
     total = sum(it["limit"] for it in items)
@@ -111,6 +129,7 @@ def list_budgets():
 # ---- GET /api/budgets/summary?month=YYYY-MM ----
 @bp.get("/summary")
 @jwt_required()
+@versioned_json
 def get_summary():
     month_str = request.args.get("month", "")
     if not month_str or "-" not in month_str:
@@ -119,20 +138,15 @@ def get_summary():
     y, m = parse_month_str(month_str)
     uid = current_user_id()
 
-    q = Budget.query.filter(
-        Budget.user_id == uid,
-        Budget.period_year == y,
-        Budget.period_month == m,
-    )
-    rows = q.order_by(Budget.id.asc()).all()
+    rows = month_budgets(uid, y, m)
 
-    # dùng service đã sửa spend_used(...)
-    from ..services.budget_service import spend_used
+    # chi theo danh mục của cả tháng: 1 query cho mọi ngân sách
+    spent_map = spent_by_category(uid, month_str) if rows else {}
     items = []
     total_budget = total_spent = 0.0
     for b in rows:
       limit = float(b.limit_amount or 0)
-      spent = spend_used(uid, b.category_id, month_str)
+      spent = spent_map.get(int(b.category_id), 0.0)
       total_budget += limit; total_spent += spent
       items.append({
         "id": b.id,
@@ -201,6 +215,7 @@ def create_budget():
         # Upsert: cập nhật hạn mức nếu đã tồn tại
         existed.limit_amount = amount
         db.session.commit()
+        month_snapshot_service.invalidate(uid)
         return jsonify({
             "item": budget_to_dict(existed, yyyy_mm=month_str, force_user_id=uid),
             "upsert": True,
@@ -216,6 +231,7 @@ def create_budget():
     )
     db.session.add(b)
     db.session.commit()
+    month_snapshot_service.invalidate(uid)
     return jsonify({"item": budget_to_dict(b, yyyy_mm=month_str, force_user_id=uid), "upsert": False}), 201
 
 
@@ -243,6 +259,7 @@ def update_budget(bid):
     b.category_id = new_cid
 
     db.session.commit()
+    month_snapshot_service.invalidate(b.user_id)
     # tự suy ra yyyy-mm của budget để trả về spent/remaining chính xác
     return jsonify({"item": budget_to_dict(b, yyyy_mm=_yyyy_mm(b.period_year, b.period_month), force_user_id=uid)})
 
@@ -257,25 +274,22 @@ def delete_budget(bid):
         return jsonify({"msg": "Forbidden"}), 403
     db.session.delete(b)
     db.session.commit()
+    month_snapshot_service.invalidate(b.user_id)
     return jsonify({"success": True})
 
 # ai cảnh báo vượt ngân sách
 @bp.route("/ai/warnings", methods=["GET"])
 @jwt_required()
+@versioned_json
 def budget_ai_warnings():
     user_id = get_jwt_identity()
 
     today = date.today()
 
-    budgets = Budget.query.filter_by(
-        user_id=user_id,
-        period_year=today.year,
-        period_month=today.month
-    ).all()
+    budgets = month_budgets(user_id, today.year, today.month)
 
     results = []
-    for b in budgets:
-        info = projected_overshoot(user_id, b)  # dùng tháng hiện tại
+    for b, info in zip(budgets, month_overshoots(user_id, budgets, today)):
         info["category_id"] = b.category_id
         info["category_name"] = b.category.name
         results.append(info)
@@ -313,6 +327,7 @@ def apply_budget():
             existing.limit_amount = amount
 
         db.session.commit()
+        month_snapshot_service.invalidate(user_id)
 
         return jsonify({
             "message": f"Ngân sách đã được cập nhật! Tổng mới = {float(existing.limit_amount):,.0f}đ"
@@ -330,6 +345,7 @@ def apply_budget():
 
     db.session.add(new_budget)
     db.session.commit()
+    month_snapshot_service.invalidate(user_id)
 
     return jsonify({
         "message": f"Đã tạo ngân sách mới = {float(amount):,.0f}đ"
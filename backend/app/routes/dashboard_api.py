@@ -4,11 +4,11 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..services.dashboard_service import get_month_summary
 from ..services.financial_health_service import compute_financial_health
 from ..services.money_source_service import MoneySourceService
-from datetime import date, datetime
+from ..utils.http_cache import versioned_json
+from datetime import date, datetime, timedelta
 from .. import db
-from ..models.expense import Expense
-from ..models.income import Income
-from sqlalchemy import func
+from ..models.rollup import UserDailyTotal
+from sqlalchemy import func, case
 
 import pytz
 
@@ -17,6 +17,7 @@ bp = Blueprint("dashboard_api", __name__, url_prefix="/api/dashboard")
 
 @bp.get("/summary")
 @jwt_required()
+@versioned_json
 def get_summary():
     uid_raw = get_jwt_identity()
     try:
@@ -34,16 +35,21 @@ def get_summary():
 
 @bp.get("/health_score")
 @jwt_required()
+@versioned_json
 def dashboard_health_score():
     user_id = get_jwt_identity()
     today = date.today()
 
     data = compute_financial_health(user_id=user_id, year=today.year, month=today.month)
-    return jsonify(data), 200
+    resp = jsonify(data)
+    # điểm tạm (dự báo đang fit ở background) -> không cache / gắn ETag
+    resp.cache_control.no_store = data.get("forecast_pending", False)
+    return resp, 200
 
 
 @bp.get("/balance")
 @jwt_required()
+@versioned_json
 def get_total_balance():
     """Tính tổng số dư = tổng thu nhập - tổng chi tiêu."""
     try:
@@ -51,18 +57,14 @@ def get_total_balance():
     except (TypeError, ValueError):
         return jsonify({"success": False, "message": "Invalid token identity"}), 401
 
-    # Tổng thu nhập
-    total_income = (
-        db.session.query(func.coalesce(func.sum(Income.amount), 0))
-        .filter(Income.user_id == user_id)
-        .scalar()
-    )
-
-    # Tổng chi tiêu
-    total_expense = (
-        db.session.query(func.coalesce(func.sum(Expense.amount), 0))
-        .filter(Expense.user_id == user_id)
-        .scalar()
+    # Tổng thu nhập / chi tiêu (rollup theo ngày, 1 query)
+    total_income, total_expense = (
+        db.session.query(
+            func.coalesce(func.sum(UserDailyTotal.income_total), 0),
+            func.coalesce(func.sum(UserDailyTotal.expense_total), 0),
+        )
+        .filter(UserDailyTotal.user_id == user_id)
+        .one()
     )
 
     balance = total_income - total_expense
@@ -72,6 +74,7 @@ def get_total_balance():
 
 @bp.get("/balance_change")
 @jwt_required()
+@versioned_json
 def get_balance_change():
     user_id = int(get_jwt_identity())
 
@@ -91,48 +94,27 @@ def get_balance_change():
     this_month_date = date(year, month, 1)
     prev_month_date = date(prev_year, prev_month, 1)
 
-    # =============== TỔNG THU NHẬP THÁNG NÀY ===============
-    income_this = (
-        db.session.query(func.coalesce(func.sum(Income.amount), 0))
-        .filter(
-            Income.user_id == user_id,
-            func.date_trunc("month", Income.received_at)
-            == func.date_trunc("month", func.cast(this_month_date, db.Date)),
-        )
-        .scalar()
-    )
+    # Thu / chi tháng này & tháng trước từ rollup theo ngày (1 query)
+    D = UserDailyTotal
+    next_month_date = (this_month_date + timedelta(days=32)).replace(day=1)
+    is_this = D.day >= this_month_date
 
-    # =============== TỔNG CHI TIÊU THÁNG NÀY ===============
-    expense_this = (
-        db.session.query(func.coalesce(func.sum(Expense.amount), 0))
-        .filter(
-            Expense.user_id == user_id,
-            func.date_trunc("month", Expense.spent_at)
-            == func.date_trunc("month", func.cast(this_month_date, db.Date)),
-        )
-        .scalar()
-    )
+    def _sum_if(col, cond):
+        return func.coalesce(func.sum(case((cond, col), else_=0)), 0)
 
-    # =============== TỔNG THU NHẬP THÁNG TRƯỚC ===============
-    income_prev = (
-        db.session.query(func.coalesce(func.sum(Income.amount), 0))
-        .filter(
-            Income.user_id == user_id,
-            func.date_trunc("month", Income.received_at)
-            == func.date_trunc("month", func.cast(prev_month_date, db.Date)),
+    income_this, expense_this, income_prev, expense_prev = (
+        db.session.query(
+            _sum_if(D.income_total, is_this),
+            _sum_if(D.expense_total, is_this),
+            _sum_if(D.income_total, ~is_this),
+            _sum_if(D.expense_total, ~is_this),
         )
-        .scalar()
-    )
-
-    # =============== TỔNG CHI TIÊU THÁNG TRƯỚC ===============
-    expense_prev = (
-        db.session.query(func.coalesce(func.sum(Expense.amount), 0))
         .filter(
-            Expense.user_id == user_id,
-            func.date_trunc("month", Expense.spent_at)
-            == func.date_trunc("month", func.cast(prev_month_date, db.Date)),
+            D.user_id == user_id,
+            D.day >= prev_month_date,
+            D.day < next_month_date,
         )
-        .scalar()
+        .one()
     )
 
     balance_this = income_this - expense_this
@@ -149,6 +131,7 @@ def get_balance_change():
 
 @bp.get("/money-sources-balance")
 @jwt_required()
+@versioned_json
 def get_money_sources_balance():
     """Get total balance from all money sources (replaces calculated balance)"""
     user_id = get_jwt_identity()
@@ -7,9 +7,10 @@ from ..models.category import Category
 from ..models.payment_method import PaymentMethod
 from ..models.money_source import MoneySource
 from ..services.money_source_service import MoneySourceService
+from ..services import listing_service, rollup_service
 from datetime import date, datetime
 from decimal import Decimal
-from ..ai.classifier import predict_category_all
+from ..ai.classifier import predict_category_all, predict_many
 
 bp = Blueprint("expenses_api", __name__, url_prefix="/api/expenses")
 
@@ -77,45 +78,28 @@ def list_expenses():
     if not user_id:
         return jsonify({"success": False, "message": "Invalid token"}), 401
 
-    q = Expense.query.filter_by(user_id=user_id)
-
     # filter ?category= (name) hoặc ?category_id= & from=YYYY-MM-DD & to=YYYY-MM-DD
-    category_name = (request.args.get("category") or "").strip()
-    if category_name:
-        q = q.join(Category).filter(Category.name == category_name)
-
-    category_id = request.args.get("category_id")
-    if category_id:
-        try:
-            q = q.filter(Expense.category_id == int(category_id))
-        except Exception:
-            pass
-
-    d_from = _parse_date(request.args.get("from"))
-    d_to = _parse_date(request.args.get("to"))
-    if d_from:
-        q = q.filter(Expense.spent_at >= d_from)
-    if d_to:
-        q = q.filter(Expense.spent_at <= d_to)
-
-    q = q.order_by(Expense.spent_at.desc(), Expense.id.desc())
-    items = [_exp_to_dict(x) for x in q.all()]
+    category_name = (request.args.get("category") or "").strip() or None
+    try:
+        category_id = int(request.args.get("category_id") or 0) or None
+    except ValueError:
+        category_id = None
 
-    # KPI nhanh
-    total = sum(x["amount"] for x in items)
-    count = len(items)
-    avg = int(total / count) if count else 0
+    # phân trang keyset: ?limit=&cursor= (không truyền -> trả toàn bộ như cũ)
+    try:
+        page = listing_service.list_expenses(
+            user_id,
+            d_from=_parse_date(request.args.get("from")),
+            d_to=_parse_date(request.args.get("to")),
+            category_id=category_id,
+            category=category_name,
+            limit=listing_service.clamp_limit(request.args.get("limit")),
+            cursor=request.args.get("cursor") or None,
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
 
-    return (
-        jsonify(
-            {
-                "success": True,
-                "items": items,
-                "kpi": {"total": total, "count": count, "avg": avg},
-            }
-        ),
-        200,
-    )
+    return jsonify({"success": True, **page}), 200
 
 
 @bp.post("")
@@ -199,6 +183,7 @@ def create_expense():
         note=desc,
     )
     db.session.add(e)
+    rollup_service.add_expense(e)
     db.session.commit()
 
     # Sync to money source: deduct amount
@@ -225,6 +210,8 @@ def update_expense(expense_id: int):
     data = request.get_json(force=True) or {}
     old_amount = float(e.amount) if e.amount else 0
     old_money_source_id = e.money_source_id
+    # trừ giá trị cũ khỏi rollup, cộng lại giá trị mới trước khi commit
+    rollup_service.remove_expense(e)
 
     if "desc" in data:
         e.note = (data["desc"] or "").strip()
@@ -287,6 +274,7 @@ def update_expense(expense_id: int):
     if "money_source_id" in data:
         e.money_source_id = data.get("money_source_id")
 
+    rollup_service.add_expense(e)
     db.session.commit()
     
     # Sync money source if amount or source changed
@@ -318,6 +306,7 @@ def delete_expense(expense_id: int):
     amount = float(e.amount) if e.amount else 0
     money_source_id = e.money_source_id
 
+    rollup_service.remove_expense(e)
     db.session.delete(e)
     db.session.commit()
     
@@ -356,25 +345,48 @@ def get_meta():
 @jwt_required()
 def predict_category():
     data = request.get_json()
-    text = data.get("text", "")
 
+    # batch: {"texts": [...]} -> chấm điểm cả list trong 1 lượt
+    texts = data.get("texts")
+    if isinstance(texts, list):
+        preds = predict_many([str(t or "") for t in texts])
+        cat_ids = _category_ids([label for label, _ in preds])
+        return jsonify({
+            "success": True,
+            "predictions": [
+                {"label": label, "prob": prob, "category_id": cat_ids.get(label)}
+                for label, prob in preds
+            ],
+        })
+
+    text = data.get("text", "")
     preds = predict_category_all(text)
 
-    # khớp danh mục qua database
-    enriched = []
-    for item in preds:
-        cat = Category.query.filter_by(name=item["label"]).first()
-        enriched.append(
-            {
-                "label": item["label"],
-                "prob": item["prob"],
-                "category_id": cat.id if cat else None,
-            }
-        )
+    # khớp danh mục qua database (1 query cho mọi label)
+    cat_ids = _category_ids([item["label"] for item in preds])
+    enriched = [
+        {
+            "label": item["label"],
+            "prob": item["prob"],
+            "category_id": cat_ids.get(item["label"]),
+        }
+        for item in preds
+    ]
 
     return jsonify({"success": True, "predictions": enriched})
 
 
+def _category_ids(labels) -> dict:
+    """name -> id (lấy id nhỏ nhất nếu trùng tên, giống .first() trước đây)."""
+    rows = (
+        db.session.query(Category.name, Category.id)
+        .filter(Category.name.in_(set(labels)))
+        .order_by(Category.id.desc())
+        .all()
+    )
+    return {name: cid for name, cid in rows}
+
+
 @bp.post("/ai_feedback")
 @jwt_required()
 def ai_feedback():
@@ -0,0 +1,86 @@
+# backend/app/routes/exports_api.py
+from datetime import date, datetime
+
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from ..services import export_service
+
+bp = Blueprint("exports_api", __name__, url_prefix="/api/export")
+
+_XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _uid():
+    uid = get_jwt_identity()
+    if isinstance(uid, dict):
+        uid = uid.get("id")
+    try:
+        return int(uid)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_date(s: str | None):
+    if not s:
+        return None
+    return datetime.strptime(s, "%Y-%m-%d").date()
+
+
+@bp.get("/<kind>")
+@jwt_required()
+def export(kind: str):
+    """
+    GET /api/export/<expenses|incomes|transactions|daily>?format=csv|xlsx
+    Bộ lọc giống API danh sách tương ứng: from, to (yyyy-mm-dd),
+    category_id, category (daily bỏ qua danh mục). transactions / daily mặc
+    định từ đầu tháng tới hôm nay như /api/analytics.
+    """
+    user_id = _uid()
+    if not user_id:
+        return jsonify({"success": False, "message": "Invalid token"}), 401
+    if kind not in export_service.KINDS:
+        return jsonify({"success": False, "message": f"Không hỗ trợ xuất '{kind}'"}), 404
+
+    fmt = (request.args.get("format") or "csv").lower()
+    if fmt not in ("csv", "xlsx"):
+        return jsonify({"success": False, "message": "format phải là csv hoặc xlsx"}), 400
+
+    try:
+        d_from = _parse_date(request.args.get("from"))
+        d_to = _parse_date(request.args.get("to"))
+    except ValueError:
+        return jsonify({"success": False, "message": "Ngày không hợp lệ (yyyy-mm-dd)"}), 400
+    if kind in ("transactions", "daily"):
+        today = date.today()
+        d_from = d_from or today.replace(day=1)
+        d_to = d_to or today
+
+    data = export_service.rows(
+        kind,
+        user_id,
+        d_from,
+        d_to,
+        category_id=request.args.get("category_id", type=int),
+        category=(request.args.get("category") or "").strip() or None,
+    )
+    header = export_service.COLUMNS[kind]
+    span = f"_{d_from or 'all'}_{d_to or date.today()}"
+    filename = f"{kind}{span}.{fmt}"
+
+    if fmt == "xlsx":
+        body = export_service.stream_file(export_service.build_xlsx(header, data, kind))
+        mimetype = _XLSX_MIME
+    else:
+        body = export_service.stream_csv(header, data)
+        mimetype = "text/csv"  # Flask tự thêm charset=utf-8
+
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Cache-Control": "no-store",
+            "X-Accel-Buffering": "no",  # nginx: gửi từng khúc, không gom cả file
+        },
+    )
@@ -0,0 +1,90 @@
+# backend/app/routes/imports_api.py
+import json
+
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from ..services import import_service
+
+bp = Blueprint("imports_api", __name__, url_prefix="/api/import")
+
+
+def _uid():
+    uid = get_jwt_identity()
+    if isinstance(uid, dict):
+        uid = uid.get("id")
+    try:
+        return int(uid)
+    except (TypeError, ValueError):
+        return None
+
+
+def _flag(name: str, default: bool = False) -> bool:
+    v = request.form.get(name)
+    if v is None:
+        return default
+    return v.strip().lower() in ("1", "true", "yes", "on")
+
+
+@bp.get("/fields")
+@jwt_required()
+def import_fields():
+    """Các trường map được + tên cột tự nhận (FE dựng form chọn cột)."""
+    return jsonify(
+        {
+            "success": True,
+            "fields": list(import_service.FIELDS),
+            "required": list(import_service.REQUIRED_FIELDS),
+            "aliases": {k: list(v) for k, v in import_service.FIELD_ALIASES.items()},
+            "max_rows": import_service.IMPORT_MAX_ROWS,
+        }
+    )
+
+
+@bp.post("")
+@jwt_required()
+def import_transactions():
+    """
+    Import file giao dịch (multipart/form-data):
+      file           : .csv / .xlsx
+      mapping        : JSON {"date": "Ngày GD", "amount": 3, ...} (tuỳ chọn)
+      has_header     : 1|0 (mặc định 1)
+      kind           : expense|income — loại mặc định khi không có cột type
+      signed         : 1 -> số âm là chi, số dương là thu (sao kê)
+      money_source_id: nguồn tiền mặc định
+      date_format    : vd "%d/%m/%Y" (mặc định tự nhận)
+      dry_run        : 1 -> chỉ kiểm tra + preview, không ghi
+    """
+    user_id = _uid()
+    if not user_id:
+        return jsonify({"success": False, "message": "Invalid token"}), 401
+
+    f = request.files.get("file")
+    if f is None or not f.filename:
+        return jsonify({"success": False, "message": "Thiếu file"}), 400
+
+    try:
+        mapping = json.loads(request.form.get("mapping") or "null")
+        if mapping is not None and not isinstance(mapping, dict):
+            raise ValueError
+    except ValueError:
+        return jsonify({"success": False, "message": "mapping phải là JSON object"}), 400
+
+    try:
+        result = import_service.import_transactions(
+            user_id,
+            import_service.iter_rows(f.stream, f.filename, request.form.get("format")),
+            mapping=mapping,
+            has_header=_flag("has_header", True),
+            kind=(request.form.get("kind") or "expense").strip().lower(),
+            signed=_flag("signed"),
+            money_source_id=request.form.get("money_source_id", type=int),
+            date_format=request.form.get("date_format") or None,
+            dry_run=_flag("dry_run"),
+        )
+    except import_service.ImportFormatError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except UnicodeDecodeError:
+        return jsonify({"success": False, "message": "File CSV phải mã hoá UTF-8"}), 400
+
+    return jsonify(result), 200
@@ -6,6 +6,7 @@ from ..extensions import db
 from ..models.income import Income
 from ..models.category import Category
 from ..services.money_source_service import MoneySourceService
+from ..services import listing_service, rollup_service
 
 
 bp = Blueprint("incomes_api", __name__, url_prefix="/api/incomes")
@@ -37,6 +38,10 @@ def income_to_dict(m: Income):
     }
 
 
+def _parse_date(s: str | None):
+    return date.fromisoformat(s) if s else None
+
+
 # === Routes ===
 
 
@@ -64,15 +69,23 @@ def get_meta():
 @jwt_required()
 def list_incomes():
     """
-    Lấy toàn bộ danh sách thu nhập của user hiện tại
+    Danh sách thu nhập của user hiện tại, mới nhất trước.
+    Query: from, to (yyyy-mm-dd), category_id, limit + cursor (phân trang
+    keyset; không truyền limit/cursor -> trả toàn bộ).
     """
     user_id = current_user_id()
-    items = (
-        Income.query.filter_by(user_id=user_id)
-        .order_by(Income.received_at.desc().nullslast(), Income.id.desc())
-        .all()
-    )
-    return jsonify({"success": True, "items": [income_to_dict(i) for i in items]}), 200
+    try:
+        page = listing_service.list_incomes(
+            user_id,
+            d_from=_parse_date(request.args.get("from")),
+            d_to=_parse_date(request.args.get("to")),
+            category_id=request.args.get("category_id", type=int),
+            limit=listing_service.clamp_limit(request.args.get("limit")),
+            cursor=request.args.get("cursor") or None,
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    return jsonify({"success": True, **page}), 200
 
 
 @bp.post("")
@@ -131,6 +144,7 @@ def create_income():
         note=note,
     )
     db.session.add(model)
+    rollup_service.add_income(model)
     db.session.commit()
 
     # Sync to money source: add amount
@@ -155,6 +169,7 @@ def delete_income(income_id):
     amount = float(item.amount) if item.amount else 0
     money_source_id = item.money_source_id
 
+    rollup_service.remove_income(item)
     db.session.delete(item)
     db.session.commit()
 
@@ -181,6 +196,8 @@ def update_income(income_id):
     data = request.get_json(silent=True) or {}
     old_amount = float(item.amount) if item.amount else 0
     old_money_source_id = item.money_source_id
+    # trừ giá trị cũ khỏi rollup, cộng lại giá trị mới trước khi commit
+    rollup_service.remove_income(item)
 
     if "amount" in data:
         try:
@@ -202,6 +219,7 @@ def update_income(income_id):
         except Exception:
             pass
 
+    rollup_service.add_income(item)
     db.session.commit()
 
     # Sync money source if amount or source changed
@@ -216,3 +234,5 @@ def update_income(income_id):
         MoneySourceService.sync_income_to_source(
             item.money_source_id, user_id, 0, new_amount  # Add new addition
         )
+
+    return jsonify({"success": True, "item": income_to_dict(item)}), 200
@@ -1,26 +1,223 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required
-from ..ai.ocr.ocr_engine_easy import run_easy_ocr
-from ..ai.ocr.ocr_parser import parse_receipt
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait as wait_futures
+
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from ..ai.ocr import ocr_engine_easy  # noqa: F401  (đăng ký loader "easyocr", chưa import easyocr)
+from ..ai.ocr import worker_pool
+from ..ai.ocr.worker_pool import OcrBusy
+from ..ai.ocr.preprocess import resolve_preset
+from ..ai.ocr import result_cache
 
 bp = Blueprint("ocr_api", __name__, url_prefix="/api/ocr")
 
+# Thời gian tối đa request đồng bộ chờ kết quả; quá thì trả job_id để poll
+OCR_SYNC_TIMEOUT = float(os.getenv("OCR_SYNC_TIMEOUT", "60"))
+# Số ảnh tối đa trong 1 request batch
+OCR_BATCH_MAX = int(os.getenv("OCR_BATCH_MAX", "20"))
+
+
+def _read_file():
+    if "file" not in request.files:
+        return None
+    return request.files["file"].read()
+
+
+def _request_preset():
+    return resolve_preset(request.args.get("preset") or request.form.get("preset"))
+
+
+def _lookup_or_submit(img_bytes: bytes, preset: str, user_id, wait_slot: float = 0):
+    """
+    Tra cache theo hash ảnh, miss thì submit vào OCR pool.
+    Trả ("cached", payload) hoặc ("job", job); pool đầy thì ném OcrBusy.
+    """
+    t = time.perf_counter()
+    key = result_cache.make_key(img_bytes, preset)
+    cached = result_cache.get(key)
+    if cached is not None:
+        return "cached", {
+            "success": True,
+            "status": "done",
+            "cached": True,
+            **cached,
+            "timings": {"total_ms": round((time.perf_counter() - t) * 1000, 1)},
+        }
+
+    app = current_app._get_current_object()
+
+    def _store(result):
+        value = {k: v for k, v in result.items() if k != "timings"}
+        with app.app_context():
+            result_cache.put(key, value)
+
+    job = worker_pool.submit(
+        img_bytes, user_id=user_id, preset=preset, on_result=_store, wait_slot=wait_slot
+    )
+    return "job", job
+
+
+def _submit(img_bytes: bytes):
+    """(job, None) hoặc (None, response) khi cache hit / lỗi."""
+    try:
+        preset = _request_preset()
+    except ValueError as e:
+        return None, (jsonify({"success": False, "message": str(e)}), 400)
+
+    try:
+        kind, value = _lookup_or_submit(img_bytes, preset, get_jwt_identity())
+    except OcrBusy as e:
+        return None, _busy(e)
+    if kind == "cached":
+        return None, jsonify(value)
+    return value, None
+
+
+def _busy(e: OcrBusy):
+    resp = jsonify({"success": False, "message": str(e)})
+    resp.headers["Retry-After"] = str(e.retry_after)
+    return resp, 503
+
+
+def _job_payload(state: dict) -> dict:
+    if state["status"] == "done":
+        return {
+            "success": True,
+            "job_id": state["job_id"],
+            "status": "done",
+            **state["result"],
+            "timings": state["timings"],
+        }
+    if state["status"] == "error":
+        return {"success": False, **state}
+    return {"success": True, **state}
+
+
+def _job_response(state: dict):
+    payload = _job_payload(state)
+    if state["status"] == "done":
+        return jsonify(payload)
+    if state["status"] == "error":
+        return jsonify(payload), 500
+    return jsonify(payload), 202
+
+
 @bp.post("/receipt")
 @jwt_required()
 def ocr_receipt():
-    if "file" not in request.files:
+    img_bytes = _read_file()
+    if img_bytes is None:
         return jsonify({"success": False, "message": "Missing file"}), 400
 
-    img_bytes = request.files["file"].read()
+    # OCR bằng EasyOCR + NLP trích xuất thông tin, chạy trong OCR worker pool
+    job, resp = _submit(img_bytes)
+    if resp:
+        return resp
+
+    return _job_response(worker_pool.wait(job, timeout=OCR_SYNC_TIMEOUT))
+
+
+@bp.post("/receipts")
+@jwt_required()
+def ocr_receipts_batch():
+    """
+    OCR nhiều ảnh trong 1 request (field "files", lặp lại cho mỗi ảnh).
+    Trả NDJSON: mỗi dòng là kết quả 1 ảnh (kèm index, filename) theo thứ tự
+    xong trước trả trước; dòng cuối {"done": true, ...} tổng kết.
+    """
+    files = request.files.getlist("files") or request.files.getlist("file")
+    if not files:
+        return jsonify({"success": False, "message": "Missing files"}), 400
+    if len(files) > OCR_BATCH_MAX:
+        return jsonify({
+            "success": False,
+            "message": f"Tối đa {OCR_BATCH_MAX} ảnh mỗi lần",
+        }), 400
+    try:
+        preset = _request_preset()
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    user_id = get_jwt_identity()
+    items = [(i, f.filename, f.read()) for i, f in enumerate(files)]
+
+    def _line(payload: dict) -> str:
+        return json.dumps(payload, ensure_ascii=False) + "\n"
+
+    def generate():
+        t0 = time.perf_counter()
+        todo = deque(items)
+        pending = {}
+        ok = 0
+
+        while todo or pending:
+            # submit tới khi pool đầy; nếu chưa có job nào đang chạy thì chờ slot
+            while todo:
+                i, name, data = todo[0]
+                try:
+                    kind, value = _lookup_or_submit(
+                        data, preset, user_id, wait_slot=0 if pending else OCR_SYNC_TIMEOUT
+                    )
+                except OcrBusy as e:
+                    if pending:
+                        break
+                    todo.popleft()
+                    yield _line({"index": i, "filename": name, "success": False, "message": str(e)})
+                    continue
+                todo.popleft()
+                if kind == "cached":
+                    ok += 1
+                    yield _line({"index": i, "filename": name, **value})
+                else:
+                    pending[value.future] = (i, name, value)
+
+            if pending:
+                done, _ = wait_futures(list(pending), return_when=FIRST_COMPLETED)
+                for fut in done:
+                    i, name, job = pending.pop(fut)
+                    payload = _job_payload(worker_pool.wait(job, timeout=0))
+                    ok += payload["success"]
+                    yield _line({"index": i, "filename": name, **payload})
+
+        yield _line({
+            "done": True,
+            "count": len(items),
+            "succeeded": ok,
+            "total_ms": round((time.perf_counter() - t0) * 1000, 1),
+        })
 
-    # OCR bằng EasyOCR
-    lines = run_easy_ocr(img_bytes)
+    resp = Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+    resp.headers["X-Accel-Buffering"] = "no"  # nginx: không buffer stream
+    return resp
 
-    # NLP trích xuất thông tin
-    parsed = parse_receipt(lines)
 
-    return jsonify({
-        "success": True,
-        "raw_lines": lines,
-        **parsed
-    })
+@bp.post("/jobs")
+@jwt_required()
+def ocr_submit_job():
+    img_bytes = _read_file()
+    if img_bytes is None:
+        return jsonify({"success": False, "message": "Missing file"}), 400
+
+    job, resp = _submit(img_bytes)
+    if resp:
+        return resp
+
+    return jsonify({"success": True, **job.to_dict()}), 202
+
+
+@bp.get("/jobs/<job_id>")
+@jwt_required()
+def ocr_get_job(job_id):
+    state = worker_pool.get_job(job_id, user_id=get_jwt_identity())
+    if state is None:
+        return jsonify({"success": False, "message": "Job không tồn tại"}), 404
+    return _job_response(state)
+
+
+@bp.get("/stats")
+@jwt_required()
+def ocr_stats():
+    return jsonify({**worker_pool.stats(), "cache": result_cache.stats()})
@@ -4,6 +4,9 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from decimal import Decimal, InvalidOperation
 from datetime import date, datetime
 
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+
 from ..models.saving import SavingsGoal, SavingsHistory, db
 
 bp = Blueprint("savings", __name__, url_prefix="/api/savings")
@@ -64,38 +67,46 @@ def _apply_auto_contributions(user_id: int):
     """
     now = datetime.utcnow()
     goals = SavingsGoal.query.filter_by(user_id=user_id, auto_contribute=True).all()
+    if not goals:
+        return
     changed = False
 
+    # lần góp AUTO gần nhất theo (goal, interval): 1 query cho mọi goal
+    last_auto_at = {
+        (goal_id, interval): created_at
+        for goal_id, interval, created_at in db.session.query(
+            SavingsHistory.goal_id,
+            SavingsHistory.interval,
+            func.max(SavingsHistory.created_at),
+        )
+        .filter(
+            SavingsHistory.user_id == user_id,
+            SavingsHistory.goal_id.in_([g.id for g in goals]),
+            SavingsHistory.method == "auto",
+        )
+        .group_by(SavingsHistory.goal_id, SavingsHistory.interval)
+    }
+
     for g in goals:
         interval = g.contribute_interval or "monthly"
         amount = Decimal(str(g.monthly_contribution or 0))
         if amount <= 0:
             continue
 
-        # lấy history AUTO gần nhất
-        last_auto: SavingsHistory | None = (
-            SavingsHistory.query.filter_by(
-                user_id=user_id,
-                goal_id=g.id,
-                method="auto",
-                interval=interval,
-            )
-            .order_by(SavingsHistory.created_at.desc())
-            .first()
-        )
+        last_auto = last_auto_at.get((g.id, interval))
 
         need_create = False
         if interval == "monthly":
             if not last_auto:
                 need_create = True
             else:
-                if not _is_same_month(last_auto.created_at, now):
+                if not _is_same_month(last_auto, now):
                     need_create = True
         else:  # weekly
             if not last_auto:
                 need_create = True
             else:
-                if not _is_same_isoweek(last_auto.created_at, now):
+                if not _is_same_isoweek(last_auto, now):
                     need_create = True
 
         if need_create:
@@ -229,7 +240,8 @@ def goal_detail(goal_id):
 def goal_history(goal_id):
     user_id = _uid()
     hist = (
-        SavingsHistory.query.filter_by(goal_id=goal_id, user_id=user_id)
+        SavingsHistory.query.options(joinedload(SavingsHistory.goal))
+        .filter_by(goal_id=goal_id, user_id=user_id)
         .order_by(SavingsHistory.created_at.desc())
         .limit(50)
         .all()
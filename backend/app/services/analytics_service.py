@@ -1,12 +1,12 @@
 # backend/app/services/analytics_service.py
 from datetime import date, timedelta
-from sqlalchemy import func
+from sqlalchemy import func, literal, null, select, union_all
 from flask import current_app  # ⬅️ thêm dòng này
 from ..extensions import db
-from ..models.expense import Expense
-from ..models.income import Income
 from ..models.budget import Budget
 from ..models.category import Category
+from ..models.rollup import UserDailyTotal
+from .rollup_service import category_totals
 
 # ----------------- helper chung cho tháng -----------------
 def _month_expr(col):
@@ -66,162 +66,124 @@ def get_range_dates(range_key: str):
     return start, end
 
 
-def _sum_expense(user_id, start_date, end_date):
-    return (
-        db.session.query(func.coalesce(func.sum(Expense.amount), 0))
-        .filter(
-            Expense.user_id == user_id,
-            Expense.spent_at >= start_date,
-            Expense.spent_at <= end_date,
-        )
-        .scalar()
-        or 0
-    )
-
-
-def _sum_income(user_id, start_date, end_date):
-    return (
-        db.session.query(func.coalesce(func.sum(Income.amount), 0))
-        .filter(
-            Income.user_id == user_id,
-            Income.received_at >= start_date,
-            Income.received_at <= end_date,
-        )
-        .scalar()
-        or 0
-    )
+def _budget_month_key(d: date) -> int:
+    """Khoá tháng dạng số YYYYMM để so sánh khoảng (period_year, period_month)."""
+    return d.year * 100 + d.month
 
 
-def _count_expense(user_id, start_date, end_date):
-    return (
-        db.session.query(func.count(Expense.id))
-        .filter(
-            Expense.user_id == user_id,
-            Expense.spent_at >= start_date,
-            Expense.spent_at <= end_date,
+def _expense_rollup(user_id, start_date, end_date, prev_start, prev_end,
+                    top_n=5, month_limit=6):
+    """
+    Gom mọi số liệu chi tiêu trong MỘT câu lệnh (UNION ALL các nhánh GROUP BY),
+    đọc từ bảng rollup (user_daily_totals / user_month_category_totals):
+      - 't': tổng chi + số giao dịch chi trong [start_date, end_date]
+      - 'd': tổng chi theo ngày trong khoảng
+      - 'p': tổng chi giai đoạn liền trước [prev_start, prev_end]
+      - 'c': top danh mục chi trong khoảng
+      - 'm': xu hướng theo tháng (month_limit tháng gần nhất tính tới end_date)
+    Trả về list row (kind, day, month, category, total, n).
+    """
+    D = UserDailyTotal
+    day_expr = func.date(D.day)
+    m_expr = _month_expr(D.day)
+    in_range = (D.user_id == user_id, D.day >= start_date, D.day <= end_date)
+
+    daily = (
+        select(
+            literal("d").label("kind"),
+            day_expr.label("day"),
+            null().label("month"),
+            null().label("category"),
+            func.sum(D.expense_total).label("total"),
+            func.sum(D.expense_count).label("n"),
         )
-        .scalar()
-        or 0
+        .where(*in_range, D.expense_count > 0)
+        .group_by(day_expr)
     )
 
-
-def _count_income(user_id, start_date, end_date):
-    return (
-        db.session.query(func.count(Income.id))
-        .filter(
-            Income.user_id == user_id,
-            Income.received_at >= start_date,
-            Income.received_at <= end_date,
+    totals = select(
+        literal("t"),
+        null(),
+        null(),
+        null(),
+        func.coalesce(func.sum(D.expense_total), 0),
+        func.coalesce(func.sum(D.expense_count), 0),
+    ).where(*in_range)
+
+    prev = select(
+        literal("p"),
+        null(),
+        null(),
+        null(),
+        func.coalesce(func.sum(D.expense_total), 0),
+        func.coalesce(func.sum(D.expense_count), 0),
+    ).where(D.user_id == user_id, D.day >= prev_start, D.day <= prev_end)
+
+    cat_sub = category_totals(user_id, start_date, end_date, kind="expense")
+    top = (
+        select(
+            Category.name.label("category"),
+            func.sum(cat_sub.c.total).label("total"),
         )
-        .scalar()
-        or 0
+        .join(Category, Category.id == cat_sub.c.category_id)
+        .where(Category.type == "expense")
+        .group_by(Category.name)
+        .order_by(func.sum(cat_sub.c.total).desc())
+        .limit(top_n)
+        .subquery()
     )
-
-
-def _collect_daily_expense(user_id, start_date, end_date):
-    rows = (
-        db.session.query(
-            func.date(Expense.spent_at).label("d"),
-            func.sum(Expense.amount).label("total"),
-        )
-        .filter(
-            Expense.user_id == user_id,
-            Expense.spent_at >= start_date,
-            Expense.spent_at <= end_date,
-        )
-        .group_by(func.date(Expense.spent_at))
-        .order_by(func.date(Expense.spent_at))
-        .all()
+    top_sel = select(
+        literal("c"), null(), null(), top.c.category, top.c.total, null()
     )
-    return [{"date": d, "total": float(t)} for d, t in rows]
-
 
-def _collect_monthly_expense(user_id, end_date, limit_n=6):
-    """
-    Lấy xu hướng chi tiêu theo tháng (tối đa limit_n tháng gần nhất tính tới end_date)
-    dạng: [{month: "2025-10", total: ...}, ...]
-    """
-    m_expr = _month_expr(Expense.spent_at)
-
-    q = (
-        db.session.query(
-            m_expr.label("m"),
-            func.coalesce(func.sum(Expense.amount), 0).label("total"),
-        )
-        .filter(
-            Expense.user_id == user_id,
-            Expense.spent_at <= end_date,
+    monthly = (
+        select(
+            m_expr.label("month"),
+            func.coalesce(func.sum(D.expense_total), 0).label("total"),
         )
+        .where(D.user_id == user_id, D.day <= end_date, D.expense_count > 0)
         .group_by(m_expr)
         .order_by(m_expr.desc())  # lấy tháng mới nhất trước
     )
+    if month_limit:
+        monthly = monthly.limit(month_limit)
+    monthly = monthly.subquery()
+    monthly_sel = select(
+        literal("m"), null(), monthly.c.month, null(), monthly.c.total, null()
+    )
 
-    if limit_n:
-        q = q.limit(limit_n)
-
-    rows = q.all()
-
-    # rows hiện tại: [(m, total), ...] theo DESC → đảo lại cho FE
-    rows = list(reversed(rows))
-
-    data = [{"month": m, "total": float(t)} for m, t in rows]
-    return data
+    stmt = union_all(daily, totals, prev, top_sel, monthly_sel)
+    return db.session.execute(stmt).all()
 
 
-def _collect_top_categories(user_id, start_date, end_date, top_n=5):
+def _income_budget_rollup(user_id, start_date, end_date):
     """
-    Top danh mục chi tiêu (expense) trong khoảng: [{category, total}, ...]
+    Tổng thu, số giao dịch thu (từ rollup theo ngày) và tổng hạn mức ngân sách
+    của mọi tháng nằm trong [start_date, end_date] — một round trip.
     """
-    rows = (
-        db.session.query(
-            Category.name.label("cat_name"),
-            func.sum(Expense.amount).label("total"),
-        )
-        .join(Category, Category.id == Expense.category_id)
-        .filter(
-            Expense.user_id == user_id,
-            Expense.spent_at >= start_date,
-            Expense.spent_at <= end_date,
-            Category.type == "expense",
+    D = UserDailyTotal
+    inc_filter = (D.user_id == user_id, D.day >= start_date, D.day <= end_date)
+    month_key = Budget.period_year * 100 + Budget.period_month
+
+    stmt = select(
+        select(func.coalesce(func.sum(D.income_total), 0))
+        .where(*inc_filter)
+        .scalar_subquery()
+        .label("income_total"),
+        select(func.coalesce(func.sum(D.income_count), 0))
+        .where(*inc_filter)
+        .scalar_subquery()
+        .label("income_count"),
+        select(func.coalesce(func.sum(Budget.limit_amount), 0))
+        .where(
+            Budget.user_id == user_id,
+            month_key >= _budget_month_key(start_date),
+            month_key <= _budget_month_key(end_date),
         )
-        .group_by(Category.name)
-        .order_by(func.sum(Expense.amount).desc())
-        .limit(top_n)
-        .all()
+        .scalar_subquery()
+        .label("budget_total"),
     )
-    return [{"category": n, "total": float(t)} for n, t in rows]
-
-
-def _calc_budget_sum_for_range(user_id, start_date, end_date):
-    """
-    Lấy tổng hạn mức ngân sách của tất cả các tháng nằm trong [start_date, end_date].
-    Ý tưởng: duyệt qua từng tháng trong khoảng, cộng SUM(limit_amount) của tháng đó.
-    """
-    total_budget = 0
-    cur = start_date.replace(day=1)
-
-    while cur <= end_date:
-        y = cur.year
-        m = cur.month
-        month_budget = (
-            db.session.query(func.coalesce(func.sum(Budget.limit_amount), 0))
-            .filter(
-                Budget.user_id == user_id,
-                Budget.period_year == y,
-                Budget.period_month == m,
-            )
-            .scalar()
-            or 0
-        )
-        total_budget += month_budget
-
-        # tăng 1 tháng
-        if m == 12:
-            cur = cur.replace(year=y + 1, month=1)
-        else:
-            cur = cur.replace(month=m + 1)
-
-    return total_budget
+    return db.session.execute(stmt).one()
 
 
 def build_analytics_summary(user_id: int, range_key: str = "current_month"):
@@ -229,14 +191,28 @@ def build_analytics_summary(user_id: int, range_key: str = "current_month"):
     start_date, end_date = get_range_dates(range_key)
     num_days = (end_date - start_date).days + 1
 
-    # 2. tổng thu / chi hiện tại
-    total_income = _sum_income(user_id, start_date, end_date)
-    total_expense = _sum_expense(user_id, start_date, end_date)
-
-    # 3. xu hướng chi tiêu (so với giai đoạn liền trước có cùng độ dài)
     prev_end = start_date - timedelta(days=1)
     prev_start = prev_end - timedelta(days=num_days - 1)
-    prev_expense = _sum_expense(user_id, prev_start, prev_end)
+
+    # 2. hai round trip: chi tiêu (mọi series) + thu nhập/ngân sách
+    exp_rows = _expense_rollup(
+        user_id, start_date, end_date, prev_start, prev_end, top_n=5, month_limit=6
+    )
+    inc = _income_budget_rollup(user_id, start_date, end_date)
+
+    daily_rows = sorted((r for r in exp_rows if r.kind == "d"), key=lambda r: r.day)
+    top_rows = sorted(
+        (r for r in exp_rows if r.kind == "c"), key=lambda r: r.total, reverse=True
+    )
+    month_rows = sorted((r for r in exp_rows if r.kind == "m"), key=lambda r: r.month)
+    total_row = next(r for r in exp_rows if r.kind == "t")
+    prev_row = next(r for r in exp_rows if r.kind == "p")
+
+    total_income = inc.income_total or 0
+    total_expense = total_row.total or 0
+
+    # 3. xu hướng chi tiêu (so với giai đoạn liền trước có cùng độ dài)
+    prev_expense = prev_row.total or 0
 
     if prev_expense == 0:
         month_trend_pct = 0
@@ -244,7 +220,7 @@ def build_analytics_summary(user_id: int, range_key: str = "current_month"):
         month_trend_pct = (total_expense - prev_expense) / prev_expense  # âm nếu giảm
 
     # 4. hiệu quả ngân sách
-    total_budget_in_range = _calc_budget_sum_for_range(user_id, start_date, end_date)
+    total_budget_in_range = inc.budget_total or 0
     if total_budget_in_range == 0:
         budget_eff = 0
     else:
@@ -259,14 +235,14 @@ def build_analytics_summary(user_id: int, range_key: str = "current_month"):
 
     # 6. chi trung bình/ngày + số giao dịch
     avg_per_day = (total_expense / num_days) if num_days > 0 else 0
-    tx_count = _count_expense(user_id, start_date, end_date) + _count_income(
-        user_id, start_date, end_date
-    )
+    tx_count = (total_row.n or 0) + (inc.income_count or 0)
 
     # 7. datasets cho chart
-    daily_expense = _collect_daily_expense(user_id, start_date, end_date)
-    monthly_expense = _collect_monthly_expense(user_id, end_date, limit_n=6)
-    top_categories = _collect_top_categories(user_id, start_date, end_date, top_n=5)
+    daily_expense = [{"date": r.day, "total": float(r.total)} for r in daily_rows]
+    monthly_expense = [{"month": r.month, "total": float(r.total)} for r in month_rows]
+    top_categories = [
+        {"category": r.category, "total": float(r.total)} for r in top_rows
+    ]
 
     # 8. đóng gói JSON cho FE
     return {
@@ -4,6 +4,7 @@ from sqlalchemy import func
 from ..extensions import db
 from ..models.expense import Expense
 from ..models.budget import Budget
+from .budget_service import month_to_date_by_category
 
 
 def calculate_spending_velocity(user_id, category_id=None):
@@ -26,17 +27,12 @@ def calculate_spending_velocity(user_id, category_id=None):
 
     return float(velocity), float(spent)
 
-def projected_overshoot(user_id, budget: Budget):
-    today = date.today()
-
-    velocity, spent = calculate_spending_velocity(user_id, budget.category_id)
-
+def _project(limit: float, spent: float, today: date) -> dict:
+    """Ngoại suy chi cả tháng từ tốc độ chi tới hôm nay, so với hạn mức."""
+    velocity = spent / max(1, today.day)
     days_in_month = monthrange(today.year, today.month)[1]
 
-    projected_total = velocity * days_in_month
-
-    limit = float(budget.limit_amount)
-    projected_total = float(projected_total)
+    projected_total = float(velocity * days_in_month)
 
     overshoot = projected_total - limit
 
@@ -54,3 +50,23 @@ def projected_overshoot(user_id, budget: Budget):
         "overshoot": round(overshoot, 2),
         "status": status,
     }
+
+
+def projected_overshoot(user_id, budget: Budget):
+    velocity, spent = calculate_spending_velocity(user_id, budget.category_id)
+    return _project(float(budget.limit_amount), spent, date.today())
+
+
+def month_overshoots(user_id, budgets: list[Budget], today: date | None = None) -> list[dict]:
+    """
+    projected_overshoot cho cả danh sách ngân sách tháng hiện tại: chi tới
+    hôm nay của mọi danh mục lấy bằng 1 query GROUP BY.
+    """
+    if not budgets:
+        return []
+    today = today or date.today()
+    spent = month_to_date_by_category(user_id, today)
+    return [
+        _project(float(b.limit_amount), spent.get(int(b.category_id), 0.0), today)
+        for b in budgets
+    ]
@@ -1,30 +1,79 @@
 # backend/app/services/budget_service.py
 from datetime import date
-from calendar import monthrange
 from sqlalchemy import func
+from sqlalchemy.orm import joinedload
 from decimal import Decimal
 from ..extensions import db
-from ..models.expense import Expense
 from ..models.budget import Budget
+from ..models.expense import Expense
+from ..models.rollup import UserMonthCategoryTotal
+
+
+def month_budgets(user_id: int, year: int, month: int) -> list[Budget]:
+    """Ngân sách của tháng (kèm Category, 1 query)."""
+    return (
+        Budget.query.options(joinedload(Budget.category))
+        .filter(
+            Budget.user_id == int(user_id),
+            Budget.period_year == int(year),
+            Budget.period_month == int(month),
+        )
+        .order_by(Budget.id.asc())
+        .all()
+    )
+
 
-def _month_bounds(yyyy_mm: str):
+def spent_by_category(user_id: int, yyyy_mm: str) -> dict[int, float]:
+    """
+    Tổng chi cả tháng theo danh mục: 1 query GROUP BY trên rollup thay cho
+    mỗi ngân sách 1 lần spend_used(). Danh mục không có chi -> không có khoá.
+    """
     y, m = map(int, yyyy_mm.split("-"))
-    start = date(y, m, 1)
-    end = date(y, m, monthrange(y, m)[1])
-    return start, end
+    R = UserMonthCategoryTotal
+    rows = (
+        db.session.query(R.category_id, func.coalesce(func.sum(R.total), 0))
+        .filter(
+            R.user_id == int(user_id),
+            R.kind == "expense",
+            R.period_year == y,
+            R.period_month == m,
+        )
+        .group_by(R.category_id)
+    )
+    return {int(cid or 0): float(total or 0) for cid, total in rows}
+
+
+def month_to_date_by_category(user_id: int, today: date | None = None) -> dict[int, float]:
+    """
+    Chi từ đầu tháng tới hết hôm nay theo danh mục (bỏ khoản chi ghi ngày
+    tương lai) -> tính tốc độ chi; 1 query GROUP BY theo idx_expenses_user_spent.
+    """
+    today = today or date.today()
+    rows = (
+        db.session.query(Expense.category_id, func.coalesce(func.sum(Expense.amount), 0))
+        .filter(
+            Expense.user_id == int(user_id),
+            Expense.spent_at >= today.replace(day=1),
+            Expense.spent_at <= today,
+        )
+        .group_by(Expense.category_id)
+    )
+    return {int(cid or 0): float(total or 0) for cid, total in rows}
+
 
 def spend_used(user_id: int, category_id: int, yyyy_mm: str) -> float:
     """
-    Tổng chi theo danh mục trong tháng (Expense.amount > 0; cột ngày: spent_at DATE)
+    Tổng chi theo danh mục trong tháng (đọc từ rollup user_month_category_totals)
     Trả về float để FE hiển thị/ tính %
     """
-    start, end = _month_bounds(yyyy_mm)
+    y, m = map(int, yyyy_mm.split("-"))
+    R = UserMonthCategoryTotal
     q = (
-        db.session.query(func.coalesce(func.sum(Expense.amount), 0))
-        .filter(Expense.user_id == int(user_id))
-        .filter(Expense.category_id == int(category_id))
-        .filter(Expense.spent_at >= start)
-        .filter(Expense.spent_at <= end)
+        db.session.query(func.coalesce(func.sum(R.total), 0))
+        .filter(R.user_id == int(user_id))
+        .filter(R.category_id == int(category_id))
+        .filter(R.kind == "expense")
+        .filter(R.period_year == y, R.period_month == m)
     )
     val = q.scalar() or 0
     # val có thể là Decimal -> ép float
@@ -33,9 +82,10 @@ def spend_used(user_id: int, category_id: int, yyyy_mm: str) -> float:
     except Exception:
         return float(Decimal(val))
 
-def budget_stats_row(b: Budget) -> dict:
+def budget_stats_row(b: Budget, used: float | None = None) -> dict:
     yyyy_mm = f"{int(b.period_year):04d}-{int(b.period_month):02d}"
-    used = spend_used(b.user_id, b.category_id, yyyy_mm)
+    if used is None:
+        used = spend_used(b.user_id, b.category_id, yyyy_mm)
     limit = float(b.limit_amount or 0)
     remaining = limit - used
     percent = 0.0 if limit <= 0 else min(100.0, max(0.0, used / limit * 100.0))
@@ -69,9 +119,8 @@ def month_summary(user_id: int, yyyy_mm: str) -> dict:
                        Budget.period_month == int(yyyy_mm[5:7]))
                .all())
     total_budget = float(sum(float(b.limit_amount or 0) for b in budgets))
-    total_used = 0.0
-    for b in budgets:
-        total_used += spend_used(user_id, b.category_id, yyyy_mm)
+    spent = spent_by_category(user_id, yyyy_mm) if budgets else {}
+    total_used = sum(spent.get(int(b.category_id), 0.0) for b in budgets)
 
     total_remaining = total_budget - total_used
     percent = 0.0 if total_budget <= 0 else min(100.0, max(0.0, total_used / total_budget * 100.0))
@@ -1,45 +1,39 @@
 # app/services/dashboard_service.py
 from __future__ import annotations
 from datetime import datetime
-from dateutil.relativedelta import relativedelta
 import math
 import pytz
 from sqlalchemy import func
 from ..extensions import db
-from ..models import Expense, Budget, Category, SavingsGoal
+from ..models import Category, SavingsGoal, UserMonthCategoryTotal
+from .budget_service import month_budgets
 
 TZ = pytz.timezone("Asia/Bangkok")
 
-def _month_range(month_ym: str):
-    """
-    Trả về [start_local, end_local) theo Asia/Bangkok (naive DB cũng OK).
-    Vì bạn đang dùng SQLite và cột Expense.date là DateTime(timezone=True) nhưng
-    thường lưu naive theo local, ta sẽ query theo mốc local cho chắc.
-    """
-    start_local = TZ.localize(datetime.strptime(month_ym, "%Y-%m"))
-    end_local = start_local + relativedelta(months=1)
-    return start_local, end_local
-
 def get_month_summary(user_id: int, month_ym: str):
-    start, end = _month_range(month_ym)
+    year, month = int(month_ym[:4]), int(month_ym[5:7])
 
-    # --- EXPENSES + TOP CATEGORIES ---
+    # --- EXPENSES + INCOMES theo danh mục (rollup tháng) ---
     # Join luôn Category để lấy tên, tránh N+1
-    exp_rows = (
+    R = UserMonthCategoryTotal
+    rows = (
         db.session.query(
-            Expense.category_id,
-            func.coalesce(func.sum(Expense.amount), 0).label("amt"),
+            R.kind,
+            R.category_id,
+            func.coalesce(func.sum(R.total), 0).label("amt"),
             Category.name.label("cat_name")
         )
-        .join(Category, Category.id == Expense.category_id, isouter=True)
+        .join(Category, Category.id == R.category_id, isouter=True)
         .filter(
-            Expense.user_id == user_id,
-            Expense.date >= start,
-            Expense.date < end
+            R.user_id == user_id,
+            R.period_year == year,
+            R.period_month == month,
+            R.tx_count > 0
         )
-        .group_by(Expense.category_id, Category.name)
+        .group_by(R.kind, R.category_id, Category.name)
         .all()
     )
+    exp_rows = [r for r in rows if r.kind == "expense"]
     total_expense = int(sum(int(r.amt or 0) for r in exp_rows))
 
     # top-3 theo số tiền
@@ -53,17 +47,17 @@ def get_month_summary(user_id: int, month_ym: str):
         } for r in top
     ]
 
-    # --- INCOME (chưa có bảng income) ---
-    total_income = 0  # khi có Income model sẽ cộng thật
+    # --- INCOME ---
+    total_income = int(sum(int(r.amt or 0) for r in rows if r.kind == "income"))
 
     # --- BUDGETS ---
-    budgets = Budget.query.filter_by(user_id=user_id, month=month_ym).all()
+    budgets = month_budgets(user_id, year, month)
     spent_by_cat = {int(r.category_id or 0): int(r.amt or 0) for r in exp_rows}
     by_category = []
     total_budget = 0
     total_spent_in_budgeted = 0
     for b in budgets:
-        limit_amt = int(b.amount or 0)  # NOTE: field của bạn là amount
+        limit_amt = int(b.limit_amount or 0)
         spent = int(spent_by_cat.get(int(b.category_id), 0))
         total_budget += limit_amt
         total_spent_in_budgeted += spent
@@ -0,0 +1,120 @@
+# backend/app/services/data_version_service.py
+"""
+Phiên bản dữ liệu theo user: bộ đếm users.data_version tăng mỗi khi user
+ghi khoản chi / thu, ngân sách, tiết kiệm, nguồn tiền hoặc danh mục riêng.
+Dùng làm ETag + khoá cache JSON cho các API đọc (utils/http_cache.py).
+
+- Ghi: listener after_flush của Session thấy object thuộc TRACKED_MODELS
+  mới / sửa / xoá -> UPDATE users SET data_version = data_version + 1 cho
+  các user liên quan, trong cùng transaction (rollback thì bộ đếm cũng lùi).
+  Không cần gọi tay ở từng route (trừ khi ghi bằng Core: bump()).
+- Đọc: current(user_id). Có Flask-Caching (CACHE_TYPE) thì đọc từ cache
+  ("data_version:<uid>", sau commit được ghi đè bằng giá trị mới); không
+  có thì đọc thẳng DB (1 query theo khoá chính) để đúng khi chạy nhiều
+  worker.
+"""
+from __future__ import annotations
+
+import os
+
+from flask import current_app
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from ..extensions import cache, db
+from ..models.budget import Budget
+from ..models.category import Category
+from ..models.expense import Expense
+from ..models.income import Income
+from ..models.money_source import MoneySource
+from ..models.saving import SavingsGoal, SavingsHistory
+from ..models.user import User
+
+DATA_VERSION_TTL = int(os.getenv("DATA_VERSION_TTL", "3600"))
+
+TRACKED_MODELS = (Expense, Income, Budget, SavingsGoal, SavingsHistory, MoneySource, Category)
+
+_PENDING = "data_version_pending"  # khoá trong session.info
+
+
+def _shared() -> bool:
+    return "cache" in current_app.extensions
+
+
+def _key(uid: int) -> str:
+    return f"data_version:{uid}"
+
+
+def _changed_users(session) -> set[int]:
+    uids = set()
+    for obj in (*session.new, *session.deleted):
+        if isinstance(obj, TRACKED_MODELS) and obj.user_id is not None:
+            uids.add(int(obj.user_id))
+    for obj in session.dirty:
+        if (
+            isinstance(obj, TRACKED_MODELS)
+            and obj.user_id is not None
+            and session.is_modified(obj, include_collections=False)
+        ):
+            uids.add(int(obj.user_id))
+    return uids
+
+
+def bump(session, user_ids) -> None:
+    """
+    Tăng data_version trong transaction hiện tại của session. Tự gọi sau mỗi
+    flush ORM; ghi bằng Core (insert().values(...) hàng loạt) thì gọi tay.
+    """
+    uids = {int(u) for u in user_ids}
+    if not uids:
+        return
+    # Core UPDATE qua connection của session: không kích hoạt autoflush / ORM
+    session.connection().execute(
+        update(User.__table__)
+        .where(User.__table__.c.id.in_(uids))
+        .values(data_version=User.__table__.c.data_version + 1)
+    )
+    session.info.setdefault(_PENDING, set()).update(uids)
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_on_flush(session, flush_context):
+    bump(session, _changed_users(session))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish(session):
+    uids = session.info.pop(_PENDING, None)
+    if not uids or not _shared():
+        return
+    # session không query được trong after_commit -> dùng kết nối riêng
+    with db.engine.connect() as conn:
+        rows = conn.execute(
+            select(User.__table__.c.id, User.__table__.c.data_version).where(
+                User.__table__.c.id.in_(uids)
+            )
+        ).all()
+    for uid, version in rows:
+        # set (không phải add): giá trị sau commit luôn thắng giá trị cũ
+        # mà request đọc song song vừa nạp vào cache
+        cache.set(_key(uid), version, timeout=DATA_VERSION_TTL)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session):
+    session.info.pop(_PENDING, None)
+
+
+def current(user_id) -> int | None:
+    """Phiên bản dữ liệu hiện tại của user (None nếu không có user)."""
+    uid = int(user_id)
+    if _shared():
+        version = cache.get(_key(uid))
+        if version is not None:
+            return version
+    version = db.session.execute(
+        select(User.__table__.c.data_version).where(User.__table__.c.id == uid)
+    ).scalar()
+    if version is not None and _shared():
+        cache.add(_key(uid), version, timeout=DATA_VERSION_TTL)
+    return version
@@ -0,0 +1,177 @@
+# backend/app/services/export_service.py
+"""
+Xuất giao dịch / số liệu ngày ra CSV hoặc XLSX dạng stream.
+
+- Dòng đọc bằng yield_per(EXPORT_BATCH_SIZE) (PostgreSQL: server-side
+  cursor) -> bộ nhớ không phụ thuộc số năm dữ liệu.
+- CSV: header (kèm BOM cho Excel) gửi ngay, sau đó cứ mỗi lô dòng gửi 1
+  khúc -> byte đầu tiên về ngay cả khi file rất lớn.
+- XLSX: openpyxl write_only ghi ra file tạm (bộ nhớ cố định), xong mới
+  stream file (định dạng zip không ghi nối tiếp được).
+- Bộ lọc dùng chung query với /api/expenses, /api/incomes,
+  /api/analytics/transactions (services/listing_service); tên cột trùng
+  tên cột mà import (services/import_service) tự nhận -> xuất ra nhập lại được.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+
+from ..extensions import db
+from ..models.expense import Expense
+from ..models.income import Income
+from ..models.rollup import UserDailyTotal
+from . import listing_service
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+_FILE_CHUNK = 64 * 1024
+
+KINDS = ("expenses", "incomes", "transactions", "daily")
+
+COLUMNS = {
+    "expenses": ["Ngày", "Loại", "Danh mục", "Mô tả", "Phương thức", "Số tiền"],
+    "incomes": ["Ngày", "Loại", "Danh mục", "Mô tả", "Số tiền"],
+    "transactions": ["Ngày", "Loại", "Danh mục", "Mô tả", "Phương thức", "Số tiền"],
+    "daily": ["Ngày", "Tổng chi", "Số khoản chi", "Tổng thu", "Số khoản thu"],
+}
+
+
+def _day(d) -> date:
+    return date.fromisoformat(d) if isinstance(d, str) else d
+
+
+def _amount(v) -> Decimal:
+    return Decimal(v or 0)
+
+
+# ----------------- nguồn dòng -----------------
+def _expense_rows(user_id, d_from, d_to, category_id, category):
+    q = (
+        listing_service.expenses_query(user_id, d_from, d_to, category_id, category)
+        .order_by(Expense.spent_at.desc(), Expense.id.desc())
+        .yield_per(EXPORT_BATCH_SIZE)
+    )
+    for r in q:
+        yield (r.spent_at, "expense", r.category or "", r.note or "", r.method or "", _amount(r.amount))
+
+
+def _income_rows(user_id, d_from, d_to, category_id, category):
+    q = (
+        listing_service.incomes_query(user_id, d_from, d_to, category_id)
+        .order_by(Income.received_at.desc(), Income.id.desc())
+        .yield_per(EXPORT_BATCH_SIZE)
+    )
+    for r in q:
+        yield (r.received_at, "income", r.category or "", r.note or "", _amount(r.amount))
+
+
+def _transaction_rows(user_id, d_from, d_to, category_id, category):
+    stmt = listing_service.transactions_stmt(user_id, d_from, d_to, category_id, category)
+    result = db.session.execute(stmt, execution_options={"yield_per": EXPORT_BATCH_SIZE})
+    for r in result:
+        yield (
+            _day(r.day),
+            "expense" if r.rank else "income",
+            r.category or "",
+            r.note or "",
+            r.method or "",
+            _amount(r.amount),
+        )
+
+
+def _daily_rows(user_id, d_from, d_to, category_id, category):
+    q = db.session.query(
+        UserDailyTotal.day,
+        UserDailyTotal.expense_total,
+        UserDailyTotal.expense_count,
+        UserDailyTotal.income_total,
+        UserDailyTotal.income_count,
+    ).filter(UserDailyTotal.user_id == user_id)
+    if d_from:
+        q = q.filter(UserDailyTotal.day >= d_from)
+    if d_to:
+        q = q.filter(UserDailyTotal.day <= d_to)
+    q = q.order_by(UserDailyTotal.day.desc()).yield_per(EXPORT_BATCH_SIZE)
+    for r in q:
+        if r.expense_count or r.income_count:
+            yield (
+                r.day,
+                _amount(r.expense_total),
+                r.expense_count,
+                _amount(r.income_total),
+                r.income_count,
+            )
+
+
+_SOURCES = {
+    "expenses": _expense_rows,
+    "incomes": _income_rows,
+    "transactions": _transaction_rows,
+    "daily": _daily_rows,
+}
+
+
+def rows(kind: str, user_id: int, d_from=None, d_to=None, category_id=None, category=None):
+    """Iterator các dòng (tuple theo COLUMNS[kind]), mới nhất trước."""
+    return _SOURCES[kind](user_id, d_from, d_to, category_id, category)
+
+
+# ----------------- ghi file -----------------
+def _csv_value(v):
+    if isinstance(v, Decimal):
+        return f"{v.normalize():f}"  # 120000.00 -> 120000 (VND không lẻ)
+    if isinstance(v, date):
+        return v.isoformat()
+    return v
+
+
+def stream_csv(header: list[str], data) -> "iter[str]":
+    """Sinh CSV theo khúc: header ngay lập tức, sau đó mỗi EXPORT_BATCH_SIZE dòng."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    yield "\ufeff" + buf.getvalue()  # BOM: Excel mở đúng UTF-8
+    buf.seek(0)
+    buf.truncate()
+
+    n = 0
+    for row in data:
+        writer.writerow([_csv_value(v) for v in row])
+        n += 1
+        if n % EXPORT_BATCH_SIZE == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def build_xlsx(header: list[str], data, title: str = "Export"):
+    """Ghi XLSX (write_only, bộ nhớ cố định) ra file tạm; trả file đã seek(0)."""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=title[:31])
+    ws.append(header)
+    for row in data:
+        ws.append([float(v) if isinstance(v, Decimal) else v for v in row])
+    tmp = tempfile.TemporaryFile()
+    wb.save(tmp)
+    tmp.seek(0)
+    return tmp
+
+
+def stream_file(f):
+    """Đọc file theo khúc rồi đóng (xoá file tạm)."""
+    try:
+        while True:
+            chunk = f.read(_FILE_CHUNK)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        f.close()
@@ -1,135 +1,214 @@
-from datetime import date
+# backend/app/services/financial_health_service.py
+"""
+Điểm sức khoẻ tài chính theo tháng (dashboard + analytics dùng chung).
+
+4 tiêu chí, mỗi tiêu chí 0-10 điểm, trọng số 0.4 / 0.3 / 0.2 / 0.1:
+  - ngân sách: tổng chi tháng các danh mục có ngân sách so với tổng hạn mức
+    (1 query: Budget LEFT JOIN rollup tháng theo danh mục)
+  - tiết kiệm: tỉ lệ current / target trung bình các mục tiêu (AVG trong SQL)
+  - xu hướng: % thay đổi chi dự báo 30 ngày, lấy từ cache của
+    forecast_service (không fit trong request; chưa có cache -> fit ở
+    background, tạm tính 0 và không memo kết quả)
+  - thu nhập: độ biến động 3 khoản thu gần nhất
+
+Kết quả được memo theo (user, năm, tháng, data_version): data_version gồm
+dấu vân tay rollup chi của tháng, ngân sách, mục tiêu tiết kiệm, thu nhập
+và data_version của dự báo -> dữ liệu đổi thì tự tính lại. Memo trống thì
+dùng kết quả job `flask precompute` (bảng precomputed_results) nếu khớp
+data_version.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
 from statistics import mean, stdev
-from calendar import monthrange
 
-from ..models.budget import Budget
-from ..models.saving import SavingsGoal
-from ..models.expense import Expense
-from ..models.income import Income
+from sqlalchemy import and_, func, select
 
 from ..extensions import db
+from ..models.budget import Budget
+from ..models.income import Income
+from ..models.rollup import UserMonthCategoryTotal
+from ..models.saving import SavingsGoal
+from . import forecast_service
+
+HEALTH_CACHE_SIZE = int(os.getenv("HEALTH_CACHE_SIZE", "1024"))
+
+_lock = threading.Lock()
+_entries: "OrderedDict[tuple[int, int, int], tuple[str, dict]]" = OrderedDict()
+
+
+# ----------------- data version -----------------
+def data_version(user_id: int, year: int, month: int, forecast_version: str | None = None) -> str:
+    """Dấu vân tay mọi dữ liệu điểm tháng phụ thuộc (1 SELECT gồm các scalar subquery)."""
+    R = UserMonthCategoryTotal
+    parts = [
+        (
+            (func.count(R.id), func.sum(R.total), func.sum(R.tx_count), func.max(R.updated_at)),
+            (R.user_id == user_id, R.kind == "expense",
+             R.period_year == year, R.period_month == month),
+        ),
+        (
+            (func.count(Budget.id), func.sum(Budget.limit_amount), func.max(Budget.updated_at)),
+            (Budget.user_id == user_id,
+             Budget.period_year == year, Budget.period_month == month),
+        ),
+        (
+            (func.count(SavingsGoal.id), func.sum(SavingsGoal.current_amount),
+             func.sum(SavingsGoal.target_amount), func.max(SavingsGoal.updated_at)),
+            (SavingsGoal.user_id == user_id,),
+        ),
+        (
+            (func.count(Income.id), func.max(Income.id), func.max(Income.updated_at)),
+            (Income.user_id == user_id,),
+        ),
+    ]
+    cols = [
+        select(agg).where(*where).scalar_subquery()
+        for aggs, where in parts
+        for agg in aggs
+    ]
+    row = db.session.execute(select(*cols)).one()
+    forecast_version = forecast_version or forecast_service.data_version(user_id)
+    raw = "|".join([forecast_version, *(str(v) for v in row)])
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+# ----------------- inputs -----------------
+def _budget_items(user_id: int, year: int, month: int) -> list[dict]:
+    """Hạn mức + chi thực tế tháng của từng ngân sách (1 query)."""
+    R = UserMonthCategoryTotal
+    rows = (
+        db.session.query(
+            Budget.category_id,
+            Budget.limit_amount,
+            func.coalesce(R.total, 0).label("spent"),
+        )
+        .outerjoin(
+            R,
+            and_(
+                R.user_id == Budget.user_id,
+                R.category_id == Budget.category_id,
+                R.period_year == Budget.period_year,
+                R.period_month == Budget.period_month,
+                R.kind == "expense",
+            ),
+        )
+        .filter(
+            Budget.user_id == user_id,
+            Budget.period_year == year,
+            Budget.period_month == month,
+        )
+        .all()
+    )
+    return [
+        {"category_id": r.category_id, "limit": float(r.limit_amount), "spent": float(r.spent)}
+        for r in rows
+    ]
 
-from ..services.forecast_service import build_expense_forecast
-
-
-def compute_financial_health(user_id: int, year: int, month: int):
-    """Tính điểm AI theo tháng cụ thể"""
 
-    # ==== 1) NGÂN SÁCH ====
-    budgets = Budget.query.filter_by(
-        user_id=user_id,
-        period_year=year,
-        period_month=month
-    ).all()
-
-    total_limit = sum(float(b.limit_amount) for b in budgets)
-    total_spent = 0
-    for b in budgets:
-        spent_amount = (
-            Expense.query.filter_by(
-            user_id=user_id,
-            category_id=b.category_id
+def _saving_ratio(user_id: int) -> float:
+    ratio = (
+        db.session.query(
+            func.avg(SavingsGoal.current_amount * 1.0 / SavingsGoal.target_amount)
         )
-        .with_entities(db.func.sum(Expense.amount))
+        .filter(SavingsGoal.user_id == user_id, SavingsGoal.target_amount > 0)
         .scalar()
-    ) or 0
+    )
+    return float(ratio or 0)
 
-    total_spent += float(spent_amount)
 
+def _recent_incomes(user_id: int, n: int = 3) -> list[float]:
+    rows = (
+        db.session.query(Income.amount)
+        .filter(Income.user_id == user_id)
+        .order_by(Income.created_at.desc())
+        .limit(n)
+        .all()
+    )
+    return [float(r.amount) for r in rows]
 
-    if total_limit > 0:
-        percent_over = (total_spent - total_limit) / total_limit * 100
-    else:
-        percent_over = 0
 
-    # Score ngân sách
+# ----------------- scoring -----------------
+def _score_budget(percent_over: float) -> int:
     if percent_over <= 0:
-        score_budget = 10
-    elif percent_over <= 10:
-        score_budget = 8
-    elif percent_over <= 20:
-        score_budget = 6
-    elif percent_over <= 40:
-        score_budget = 4
-    else:
-        score_budget = 0
+        return 10
+    if percent_over <= 10:
+        return 8
+    if percent_over <= 20:
+        return 6
+    if percent_over <= 40:
+        return 4
+    return 0
 
-    # ==== 2) TIẾT KIỆM ====
-    # ==== 2) TIẾT KIỆM ====
-    goals = SavingsGoal.query.filter_by(user_id=user_id).all()
 
-    if goals:
-        ratios = []
-        for g in goals:
-            if g.target_amount and g.target_amount > 0:
-                ratio = float(g.current_amount) / float(g.target_amount)
-                ratios.append(ratio)
+def _score_saving(saving_ratio: float) -> int:
+    if saving_ratio >= 0.8:
+        return 10
+    if saving_ratio >= 0.5:
+        return 7
+    if saving_ratio >= 0.2:
+        return 4
+    return 0
 
-        saving_ratio = sum(ratios) / len(ratios) if ratios else 0
-    else:
-        saving_ratio = 0
 
-    # chấm điểm tiết kiệm
-    if saving_ratio >= 0.8:
-        score_saving = 10
-    elif saving_ratio >= 0.5:
-        score_saving = 7
-    elif saving_ratio >= 0.2:
-        score_saving = 4
-    else:
-        score_saving = 0
+def _score_trend(change_ratio: float) -> int:
+    if change_ratio < -0.15:
+        return 10
+    if change_ratio < 0:
+        return 7
+    if change_ratio <= 0.2:
+        return 4
+    return 0
 
 
-    # ==== 3) XU HƯỚNG PROPHET ====
-    forecast_data = build_expense_forecast(user_id)
+def _score_income(ratio_income: float) -> int:
+    if ratio_income <= 0.1:
+        return 10
+    if ratio_income <= 0.3:
+        return 7
+    if ratio_income <= 0.5:
+        return 4
+    return 0
 
-    # Nếu không đủ dữ liệu
-    if isinstance(forecast_data, dict) and forecast_data.get("error"):
+
+def _compute(user_id: int, year: int, month: int, forecast_version: str) -> dict:
+    # ==== 1) NGÂN SÁCH ====
+    items = _budget_items(user_id, year, month)
+    total_limit = sum(i["limit"] for i in items)
+    total_spent = sum(i["spent"] for i in items)
+    percent_over = (total_spent - total_limit) / total_limit * 100 if total_limit > 0 else 0
+    score_budget = _score_budget(percent_over)
+
+    # ==== 2) TIẾT KIỆM ====
+    saving_ratio = _saving_ratio(user_id)
+    score_saving = _score_saving(saving_ratio)
+
+    # ==== 3) XU HƯỚNG (dự báo trong cache) ====
+    forecast_data = forecast_service.cached_expense_forecast(user_id, version=forecast_version)
+    forecast_pending = forecast_data is None
+    if forecast_pending or forecast_data.get("error"):
         change_ratio = 0
         predicted_month_amount = 0
     else:
         predicted_month_amount = forecast_data["total_forecast"]
-    # convert % về dạng ratio 0.xx
-    change_ratio = (forecast_data["change_pct"] / 100.0) if forecast_data["change_pct"] is not None else 0
-
-
-    if change_ratio < -0.15:
-        score_trend = 10
-    elif change_ratio < 0:
-        score_trend = 7
-    elif change_ratio <= 0.2:
-        score_trend = 4
-    else:
-        score_trend = 0
+        # convert % về dạng ratio 0.xx
+        change_pct = forecast_data["change_pct"]
+        change_ratio = change_pct / 100.0 if change_pct is not None else 0
+    score_trend = _score_trend(change_ratio)
 
     # ==== 4) ỔN ĐỊNH THU NHẬP ====
-    incomes = Income.query.filter_by(user_id=user_id).order_by(Income.created_at.desc()).limit(3).all()
-
-    if len(incomes) >= 2:
-        amounts = [float(i.amount) for i in incomes]
-        ratio_income = stdev(amounts) / mean(amounts)
-    else:
-        ratio_income = 0
-
-    if ratio_income <= 0.1:
-        score_income = 10
-    elif ratio_income <= 0.3:
-        score_income = 7
-    elif ratio_income <= 0.5:
-        score_income = 4
-    else:
-        score_income = 0
+    amounts = _recent_incomes(user_id)
+    ratio_income = stdev(amounts) / mean(amounts) if len(amounts) >= 2 and mean(amounts) else 0
+    score_income = _score_income(ratio_income)
 
     # ==== 5) TÍNH ĐIỂM TỔNG ====
-    score = (
-        score_budget * 0.4 +
-        score_saving * 0.3 +
-        score_trend * 0.2 +
-        score_income * 0.1
+    score = round(
+        score_budget * 0.4 + score_saving * 0.3 + score_trend * 0.2 + score_income * 0.1, 1
     )
 
-    score = round(score, 1)
-
     # ==== 6) PHÂN LOẠI ====
     if score >= 8:
         level = "good"
@@ -140,19 +219,14 @@ def compute_financial_health(user_id: int, year: int, month: int):
 
     # ==== 7) GỢI Ý AI ====
     tips = []
-
     if percent_over > 10:
         tips.append("Bạn đang chi vượt ngân sách, cần xem lại các khoản chi.")
-
     if saving_ratio < 0.5:
         tips.append("Tỷ lệ tiết kiệm thấp, nên đặt auto-saving để cải thiện.")
-
     if change_ratio > 0.1:
         tips.append("Dự báo chi tiêu tháng tới tăng, nên cắt giảm chi cố định.")
-
     if ratio_income > 0.3:
         tips.append("Thu nhập biến động lớn, hãy duy trì quỹ dự phòng ít nhất 3 tháng.")
-
     if not tips:
         tips.append("Tình hình tài chính ổn định, hãy tiếp tục duy trì thói quen tốt.")
 
@@ -164,9 +238,57 @@ def compute_financial_health(user_id: int, year: int, month: int):
         "trend_score": score_trend,
         "income_score": score_income,
         "percent_over": percent_over,
+        "total_limit": total_limit,
+        "total_spent": total_spent,
+        "budgets": items,
         "saving_ratio": saving_ratio,
         "trend_change": change_ratio,
         "predicted_next_month": predicted_month_amount,
+        "forecast_pending": forecast_pending,
         "income_volatility": ratio_income,
-        "tips": tips
+        "tips": tips,
     }
+
+
+# ----------------- public -----------------
+def _load_stored(user_id: int, year: int, month: int, version: str) -> dict | None:
+    """Kết quả job `flask precompute` nếu còn đúng data_version."""
+    from ..models.precompute import PrecomputedResult
+
+    row = PrecomputedResult.query.filter_by(
+        user_id=user_id, kind="health", period_key=f"{year:04d}-{month:02d}"
+    ).first()
+    if row is None or row.data_version != version:
+        return None
+    return row.result
+
+
+def evaluate(user_id: int, year: int, month: int) -> tuple[str, dict]:
+    """(data_version, kết quả) — memo trong tiến trình -> bảng tính sẵn -> tính mới."""
+    uid, year, month = int(user_id), int(year), int(month)
+    key = (uid, year, month)
+    forecast_version = forecast_service.data_version(uid)
+    version = data_version(uid, year, month, forecast_version)
+
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry[0] == version:
+            _entries.move_to_end(key)
+            return entry
+
+    result = _load_stored(uid, year, month, version)
+    if result is None:
+        result = _compute(uid, year, month, forecast_version)
+    if not result["forecast_pending"]:
+        # dự báo đang fit ở background -> lần sau tính lại để có điểm xu hướng
+        with _lock:
+            _entries[key] = (version, result)
+            _entries.move_to_end(key)
+            while len(_entries) > HEALTH_CACHE_SIZE:
+                _entries.popitem(last=False)
+    return version, result
+
+
+def compute_financial_health(user_id: int, year: int, month: int):
+    """Tính điểm AI theo tháng cụ thể (memo theo data_version)."""
+    return evaluate(user_id, year, month)[1]
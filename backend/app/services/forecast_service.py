@@ -1,51 +1,197 @@
-from prophet import Prophet
-import pandas as pd
-from datetime import timedelta
+# backend/app/services/forecast_service.py
+"""
+Dự báo chi tiêu (backend Prophet / NumPy, xem forecasters.py), có cache
+theo (user, phiên bản dữ liệu).
+
+- Phiên bản dữ liệu (data_version) lấy từ rollup theo ngày: đổi khi user
+  thêm / sửa / xoá khoản chi, hoặc khi sang ngày mới (cửa sổ dữ liệu dịch).
+- Cache 2 tầng: LRU + TTL trong tiến trình, và file JSON trong
+  instance/forecast/ (kết quả + tham số model) để sống qua restart.
+  Khoá cache gồm cả backend. Không có cả 2 thì đọc kết quả job
+  `flask precompute` (bảng precomputed_results).
+- Kết quả cũ (lệch version / hết TTL) vẫn được trả ngay, đồng thời refit ở
+  background; refit dùng tham số model cũ làm điểm khởi tạo (warm start).
+  Chỉ khi chưa có gì trong cache mới fit trực tiếp trong request
+  (cached_expense_forecast: không fit trong request, trả None).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from flask import current_app
+from sqlalchemy import func
+
+from ..extensions import db
+from ..models.rollup import UserDailyTotal
 from .expense_service import get_daily_expense_series
 
+CACHE_TTL = int(os.getenv("FORECAST_CACHE_TTL", str(6 * 3600)))
+CACHE_SIZE = int(os.getenv("FORECAST_CACHE_SIZE", "256"))
+REFIT_WORKERS = int(os.getenv("FORECAST_REFIT_WORKERS", "1"))
+SERIES_MONTHS = 12
 
-def build_expense_forecast(user_id: int, periods: int = 30):
+_lock = threading.Lock()
+_entries: "OrderedDict[tuple[int, int, str], dict]" = OrderedDict()
+_refitting: set[tuple[int, int, str]] = set()
+_executor = ThreadPoolExecutor(max_workers=REFIT_WORKERS, thread_name_prefix="forecast")
+
+
+# ----------------- data version -----------------
+def data_version(user_id: int) -> str:
     """
-    Huấn luyện mô hình Prophet từ dữ liệu chi tiêu theo ngày.
-    Dự báo 'periods' ngày tiếp theo (mặc định 30).
+    Dấu vân tay dữ liệu chi của user trong cửa sổ dự báo (1 query trên rollup).
     """
+    start = date.today() - timedelta(days=30 * SERIES_MONTHS)
+    row = (
+        db.session.query(
+            func.count(UserDailyTotal.id),
+            func.coalesce(func.sum(UserDailyTotal.expense_count), 0),
+            func.coalesce(func.sum(UserDailyTotal.expense_total), 0),
+            func.max(UserDailyTotal.updated_at),
+        )
+        .filter(UserDailyTotal.user_id == user_id, UserDailyTotal.day >= start)
+        .one()
+    )
+    raw = "|".join([date.today().isoformat(), *(str(v) for v in row)])
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def invalidate(user_id: int):
+    """Đánh dấu cache của user là cũ (gọi khi khoản chi thay đổi)."""
+    uid = int(user_id)
+    with _lock:
+        for key, entry in _entries.items():
+            if key[0] == uid:
+                entry["version"] = None
+
+
+# ----------------- disk -----------------
+def _cache_dir() -> Path:
+    d = Path(current_app.instance_path) / "forecast"
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+def _cache_file(key) -> Path:
+    return _cache_dir() / f"{key[0]}_{key[1]}_{key[2]}.json"
+
+
+def entry_to_json(entry: dict) -> dict:
+    """Entry cache -> dict JSON được (ngày dạng ISO)."""
+    result = dict(entry["result"])
+    for part in ("history", "forecast"):
+        if part in result:
+            result[part] = [
+                {"ds": r["ds"].isoformat(), "value": r["value"]} for r in result[part]
+            ]
+    return {**entry, "result": result}
+
+
+def entry_from_json(data: dict) -> dict:
+    """Ngược lại entry_to_json; trả dict mới, không sửa data (có thể là
+    thuộc tính JSON của row ORM trong identity map)."""
+    result = dict(data["result"])
+    for part in ("history", "forecast"):
+        if part in result:
+            result[part] = [
+                {**r, "ds": datetime.fromisoformat(r["ds"])} for r in result[part]
+            ]
+    return {**data, "result": result}
+
+
+def _load_disk(key) -> dict | None:
+    path = _cache_file(key)
+    if not path.exists():
+        return None
+    try:
+        return entry_from_json(json.loads(path.read_text(encoding="utf-8")))
+    except (OSError, ValueError):
+        return None
+
+
+def _save_disk(key, entry: dict):
+    path = _cache_file(key)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(entry_to_json(entry)), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+# ----------------- bảng precomputed_results (job `flask precompute`) -----------------
+def period_key(key) -> str:
+    return f"{key[1]}:{key[2]}"
+
+
+def _load_stored(key) -> dict | None:
+    from ..models.precompute import PrecomputedResult
+
+    row = PrecomputedResult.query.filter_by(
+        user_id=key[0], kind="forecast", period_key=period_key(key)
+    ).first()
+    return entry_from_json(row.result) if row is not None else None
+
+
+# ----------------- memory LRU -----------------
+def _get(key) -> dict | None:
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+            return entry
+    entry = _load_disk(key) or _load_stored(key)
+    if entry is not None:
+        _put(key, entry)
+    return entry
+
+
+def _put(key, entry: dict):
+    with _lock:
+        _entries[key] = entry
+        _entries.move_to_end(key)
+        while len(_entries) > CACHE_SIZE:
+            _entries.popitem(last=False)
+
+
+def _is_fresh(entry: dict, version: str) -> bool:
+    return entry["version"] == version and time.time() - entry["fitted_at"] < CACHE_TTL
+
+
+# ----------------- fit -----------------
+def _fit(user_id: int, periods: int, backend: str, prev_state: str | None = None):
+    """Fit backend dự báo và trả về (result, state)."""
 
     # 1. Lấy dữ liệu time series
-    series = get_daily_expense_series(user_id)
+    series = get_daily_expense_series(user_id, months=SERIES_MONTHS)
 
     if len(series) < 60:
         return {
             "error": "not_enough_data",
             "days": len(series)
-        }
+        }, None
 
-    df = pd.DataFrame(series)
-    df["ds"] = pd.to_datetime(df["ds"])  # Prophet yêu cầu datetime
+    # 2. Fit + dự báo (SQLite trả ngày dạng chuỗi)
+    from .forecasters import get_forecaster  # numpy / prophet: import khi cần
 
-    # 2. Khởi tạo và train model Prophet
-    model = Prophet(
-        yearly_seasonality=True,
-        weekly_seasonality=True,
-        daily_seasonality=False,
-        changepoint_prior_scale=0.3
+    ds = [date.fromisoformat(r["ds"]) if isinstance(r["ds"], str) else r["ds"] for r in series]
+    fit = get_forecaster(backend).fit_predict(
+        ds, [r["y"] for r in series], periods, prev_state
     )
-    model.fit(df)
-
-    # 3. Tạo dataframe tương lai
-    future = model.make_future_dataframe(periods=periods)
-    forecast = model.predict(future)
-
-    # Tách phần history và forecast
-    history = forecast.iloc[:-periods].copy()
-    future_part = forecast.iloc[-periods:].copy()
+    history_ds, history_yhat = fit["history_ds"], fit["history_yhat"]
+    future_yhat = fit["future_yhat"]
 
     # Tổng chi dự báo 30 ngày tới
-    total_forecast = float(future_part["yhat"].sum())
+    total_forecast = float(future_yhat.sum())
 
     # Tổng chi 30 ngày trước đó để so sánh
-    last_start = history["ds"].max() - timedelta(days=periods - 1)
-    last_period = history[history["ds"] >= last_start]
-    total_last = float(last_period["yhat"].sum()) if len(last_period) else 0
+    last_start = history_ds[-1] - timedelta(days=periods - 1)
+    total_last = float(sum(v for d, v in zip(history_ds, history_yhat) if d >= last_start))
 
     # % tăng/giảm
     if total_last > 0:
@@ -53,10 +199,103 @@ def build_expense_forecast(user_id: int, periods: int = 30):
     else:
         change_pct = None
 
-    return {
-        "history": history[["ds", "yhat"]].rename(columns={"yhat": "value"}).to_dict(orient="records"),
-        "forecast": future_part[["ds", "yhat"]].rename(columns={"yhat": "value"}).to_dict(orient="records"),
+    def _records(ds, values):
+        return [{"ds": d, "value": float(v)} for d, v in zip(ds, values)]
+
+    result = {
+        "history": _records(history_ds, history_yhat),
+        "forecast": _records(fit["future_ds"], future_yhat),
         "total_forecast": round(total_forecast, 2),
         "total_last": round(total_last, 2),
         "change_pct": round(change_pct, 2) if change_pct is not None else None,
     }
+    return result, fit["state"]
+
+
+def _refit(key, version: str, prev: dict | None) -> dict:
+    result, state = _fit(key[0], key[1], key[2], prev.get("model") if prev else None)
+    entry = {
+        "version": version,
+        "fitted_at": time.time(),
+        "result": result,
+        "model": state,
+    }
+    _put(key, entry)
+    try:
+        _save_disk(key, entry)
+    except OSError as e:
+        current_app.logger.warning("forecast cache: không ghi được file: %s", e)
+    return entry
+
+
+def _refit_in_background(key, version: str, prev: dict | None):
+    with _lock:
+        if key in _refitting:
+            return
+        _refitting.add(key)
+    app = current_app._get_current_object()
+
+    def job():
+        try:
+            with app.app_context():
+                _refit(key, version, prev)
+        except Exception:
+            app.logger.exception("forecast refit lỗi (user=%s)", key[0])
+        finally:
+            with _lock:
+                _refitting.discard(key)
+
+    _executor.submit(job)
+
+
+# ----------------- public -----------------
+def build_expense_forecast(user_id: int, periods: int = 30, backend: str | None = None):
+    """
+    Dự báo 'periods' ngày tiếp theo (mặc định 30) từ chi tiêu theo ngày.
+    backend: "prophet" | "numpy" (mặc định theo FORECAST_BACKEND).
+    Trả kết quả trong cache nếu có; kết quả cũ được refit ở background.
+    """
+    from .forecasters import get_forecaster
+
+    key = (int(user_id), int(periods), get_forecaster(backend).name)
+    version = data_version(key[0])
+
+    entry = _get(key)
+    if entry is None:
+        return _refit(key, version, None)["result"]
+
+    if not _is_fresh(entry, version):
+        _refit_in_background(key, version, entry)
+    return entry["result"]
+
+
+def cached_expense_forecast(user_id: int, periods: int = 30, version: str | None = None):
+    """
+    Như build_expense_forecast (backend mặc định) nhưng không bao giờ fit
+    trong request: chưa có cache -> fit ở background và trả None.
+    Truyền sẵn `version` (data_version) nếu đã tính để khỏi query lại.
+    """
+    from .forecasters import get_forecaster
+
+    key = (int(user_id), int(periods), get_forecaster(None).name)
+    version = version or data_version(key[0])
+
+    entry = _get(key)
+    if entry is None or not _is_fresh(entry, version):
+        _refit_in_background(key, version, entry)
+    return entry["result"] if entry is not None else None
+
+
+def refresh_expense_forecast(user_id: int, periods: int = 30, backend: str | None = None):
+    """
+    Fit ngay trong tiến trình hiện tại (bỏ qua nếu cache còn mới) — cho job
+    tính sẵn. Trả (period_key, entry).
+    """
+    from .forecasters import get_forecaster
+
+    key = (int(user_id), int(periods), get_forecaster(backend).name)
+    version = data_version(key[0])
+    entry = _get(key)
+    if entry is None or not _is_fresh(entry, version):
+        entry = _refit(key, version, entry)
+    return period_key(key), entry
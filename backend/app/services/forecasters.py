@@ -0,0 +1,239 @@
+# backend/app/services/forecasters.py
+"""
+Các backend dự báo chuỗi chi tiêu theo ngày, dùng chung 1 interface.
+
+- "prophet": Prophet (cmdstan), chính xác nhưng fit mất vài giây và import nặng.
+- "numpy":   làm trơn hàm mũ + profile theo thứ trong tuần, thuần NumPy,
+             fit < 1 ms cho chuỗi 1 năm.
+
+Chọn backend theo deployment (env FORECAST_BACKEND) hoặc theo request
+(tham số backend=... của build_expense_forecast / ?backend=...).
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+DEFAULT_BACKEND = os.getenv("FORECAST_BACKEND", "prophet")
+
+
+class Forecaster:
+    """
+    Interface: fit_predict nhận chuỗi (ngày, tổng chi) đã sắp xếp tăng dần,
+    trả về dict:
+      history_ds / history_yhat: giá trị khớp trên phần lịch sử
+      future_ds / future_yhat:   'periods' ngày tiếp theo
+      state: chuỗi JSON tham số model (lưu đĩa, dùng warm start lần sau)
+    """
+
+    name = ""
+
+    def fit_predict(self, ds: list[date], y: list[float], periods: int, state: str | None = None) -> dict:
+        raise NotImplementedError
+
+
+class ProphetForecaster(Forecaster):
+    name = "prophet"
+
+    @staticmethod
+    def _new_model():
+        from prophet import Prophet
+
+        return Prophet(
+            yearly_seasonality=True,
+            weekly_seasonality=True,
+            daily_seasonality=False,
+            changepoint_prior_scale=0.3
+        )
+
+    @staticmethod
+    def _warm_start_params(state: str) -> dict:
+        """Tham số model cũ làm điểm khởi tạo cho lần fit kế tiếp."""
+        from prophet.serialize import model_from_json
+
+        model = model_from_json(state)
+        res = {}
+        for pname in ("k", "m", "sigma_obs"):
+            res[pname] = model.params[pname][0][0]
+        for pname in ("delta", "beta"):
+            res[pname] = model.params[pname][0]
+        return res
+
+    def fit_predict(self, ds, y, periods, state=None):
+        import pandas as pd
+        from prophet.serialize import model_to_json
+
+        df = pd.DataFrame({"ds": pd.to_datetime(ds), "y": y})  # Prophet yêu cầu datetime
+
+        model = self._new_model()
+        init = None
+        if state:
+            try:
+                init = self._warm_start_params(state)
+            except Exception:
+                init = None
+        try:
+            model.fit(df, init=init) if init else model.fit(df)
+        except Exception:
+            if init is None:
+                raise
+            # số changepoint / seasonality đổi -> fit lại từ đầu
+            model = self._new_model()
+            model.fit(df)
+
+        future = model.make_future_dataframe(periods=periods)
+        forecast = model.predict(future)
+        history = forecast.iloc[:-periods]
+        future_part = forecast.iloc[-periods:]
+        return {
+            "history_ds": [d.to_pydatetime() for d in history["ds"]],
+            "history_yhat": history["yhat"].to_numpy(dtype=float),
+            "future_ds": [d.to_pydatetime() for d in future_part["ds"]],
+            "future_yhat": future_part["yhat"].to_numpy(dtype=float),
+            "state": model_to_json(model),
+        }
+
+
+class NumpyForecaster(Forecaster):
+    """
+    Làm trơn hàm mũ (SES) trên chuỗi đã trừ mùa vụ tuần + xu hướng tắt dần.
+
+    - Ngày không có chi được coi là 0 (chuỗi liên tục).
+    - Profile theo thứ (cộng tính) = trung bình theo thứ - trung bình chung.
+    - Level của SES tính dạng đóng cho cả lưới alpha cùng lúc (ma trận
+      alpha x ngày), chọn alpha có SSE dự báo 1 bước nhỏ nhất.
+    """
+
+    name = "numpy"
+    ALPHAS = np.array([0.02, 0.05, 0.1, 0.2, 0.3, 0.5])
+    PHI = 0.9  # hệ số tắt dần của xu hướng
+    TREND_WINDOW = 56
+    MAX_DAYS = 730  # (1 - alpha)^-n phải nằm trong float64
+
+    @staticmethod
+    def _ses_levels(z: np.ndarray, alphas: np.ndarray) -> np.ndarray:
+        """L_t = (1-a) L_{t-1} + a z_t, L_{-1} = z_0, cho mọi alpha: shape (k, n)."""
+        a = alphas[:, None]
+        r = 1.0 - a
+        t = np.arange(z.size)
+        inv = r ** (-t)
+        return r ** t * (r * z[0] + a * np.cumsum(z * inv, axis=1))
+
+    def fit_predict(self, ds, y, periods, state=None):
+        start = ds[0]
+        if isinstance(start, datetime):
+            start = start.date()
+        offsets = np.array([((d.date() if isinstance(d, datetime) else d) - start).days for d in ds])
+        n = int(offsets[-1]) + 1
+        x = np.zeros(n)
+        np.add.at(x, offsets, np.asarray(y, dtype=float))
+
+        # cắt chuỗi quá dài để dạng đóng không tràn số
+        if n > self.MAX_DAYS:
+            start = start + timedelta(days=n - self.MAX_DAYS)
+            x = x[-self.MAX_DAYS:]
+            n = self.MAX_DAYS
+
+        dow = (start.weekday() + np.arange(n)) % 7
+        per_dow = np.bincount(dow, weights=x, minlength=7) / np.maximum(
+            np.bincount(dow, minlength=7), 1
+        )
+        season = per_dow - x.mean()
+        z = x - season[dow]
+
+        levels = self._ses_levels(z, self.ALPHAS)
+        pred = np.concatenate([np.full((len(self.ALPHAS), 1), z[0]), levels[:, :-1]], axis=1)
+        best = int(np.argmin(((z - pred) ** 2).sum(axis=1)))
+        level = levels[best]
+
+        tail = level[-self.TREND_WINDOW:]
+        slope = float(np.polyfit(np.arange(tail.size), tail, 1)[0]) if tail.size >= 14 else 0.0
+
+        h = np.arange(1, periods + 1)
+        damp = self.PHI * (1 - self.PHI ** h) / (1 - self.PHI)
+        future = np.clip(level[-1] + slope * damp + season[(dow[-1] + h) % 7], 0, None)
+        fitted = pred[best] + season[dow]
+
+        base = datetime(start.year, start.month, start.day)
+        return {
+            "history_ds": [base + timedelta(days=i) for i in range(n)],
+            "history_yhat": fitted,
+            "future_ds": [base + timedelta(days=n - 1 + int(i)) for i in h],
+            "future_yhat": future,
+            "state": json.dumps({"alpha": float(self.ALPHAS[best]), "slope": slope}),
+        }
+
+
+FORECASTERS: dict[str, type[Forecaster]] = {
+    ProphetForecaster.name: ProphetForecaster,
+    NumpyForecaster.name: NumpyForecaster,
+}
+
+
+def get_forecaster(name: str | None = None) -> Forecaster:
+    name = (name or DEFAULT_BACKEND).strip().lower()
+    if name not in FORECASTERS:
+        raise ValueError(f"Backend dự báo không hợp lệ: {name} (hỗ trợ: {', '.join(FORECASTERS)})")
+    return FORECASTERS[name]()
+
+
+# ----------------- benchmark -----------------
+def synthetic_series(days: int = 365, seed: int = 0, start: date | None = None):
+    """
+    Chuỗi chi tiêu giả lập: mức nền + xu hướng + mùa vụ tuần + nhiễu,
+    kèm ~20% ngày không chi. Trả về (ds, y) chỉ gồm ngày có chi.
+    """
+    rng = np.random.default_rng(seed)
+    start = start or date(2024, 1, 1)
+    t = np.arange(days)
+    dow = (start.weekday() + t) % 7
+    weekly = rng.uniform(0.6, 1.6, 7)
+    level = rng.uniform(80_000, 250_000)
+    trend = 1 + rng.uniform(-0.3, 0.5) * t / days
+    values = level * trend * weekly[dow] * rng.lognormal(0, 0.35, days)
+    values[rng.random(days) < 0.2] = 0
+    ds = [start + timedelta(days=int(i)) for i in t if values[i] > 0]
+    return ds, [float(v) for v in values if v > 0]
+
+
+def benchmark(backends=None, series: int = 5, days: int = 365, horizon: int = 30) -> dict:
+    """
+    So sánh các backend trên chuỗi giả lập: giữ lại 'horizon' ngày cuối làm
+    tập kiểm tra, đo sai số tổng chi dự báo (%), MAE theo ngày và thời gian fit.
+    """
+    out = {}
+    for name in backends or list(FORECASTERS):
+        fc = get_forecaster(name)
+        total_err, mae, fit_ms = [], [], []
+        for seed in range(series):
+            ds, y = synthetic_series(days + horizon, seed)
+            cutoff = ds[0] + timedelta(days=days)
+            train = [(d, v) for d, v in zip(ds, y) if d < cutoff]
+            actual = np.zeros(horizon)
+            for d, v in zip(ds, y):
+                if d >= cutoff:
+                    actual[(d - cutoff).days] = v
+
+            t0 = time.perf_counter()
+            res = fc.fit_predict([d for d, _ in train], [v for _, v in train], horizon)
+            fit_ms.append((time.perf_counter() - t0) * 1000)
+
+            # Prophet dự báo tính từ ngày có chi cuối cùng -> căn theo ngày thực
+            pred = np.zeros(horizon)
+            for d, v in zip(res["future_ds"], res["future_yhat"]):
+                i = (d.date() - cutoff).days
+                if 0 <= i < horizon:
+                    pred[i] = v
+            mae.append(float(np.abs(pred - actual).mean()))
+            total_err.append(float(abs(pred.sum() - actual.sum()) / actual.sum() * 100))
+
+        out[name] = {
+            "total_error_pct": round(float(np.mean(total_err)), 2),
+            "daily_mae": round(float(np.mean(mae)), 2),
+            "fit_ms": round(float(np.mean(fit_ms)), 3),
+        }
+    return out
@@ -0,0 +1,476 @@
+# backend/app/services/import_service.py
+"""
+Import hàng loạt giao dịch thu / chi từ file CSV hoặc XLSX (sao kê ngân hàng,
+file Excel tự ghi...).
+
+- Đọc dạng stream: CSV qua csv.reader trên luồng upload, XLSX qua openpyxl
+  read_only -> bộ nhớ chỉ phụ thuộc kích thước lô, không phụ thuộc file.
+- Cột -> trường theo mapping {trường: tên cột | số thứ tự cột}; không có
+  mapping thì tự nhận theo tên cột (FIELD_ALIASES).
+- Danh mục / phương thức / nguồn tiền tra trong bảng tra nạp 1 lần; khoản
+  chi thiếu danh mục được phân loại bằng classifier theo lô (predict_many).
+- Mỗi lô IMPORT_CHUNK_SIZE dòng: 1 câu insert().values([...]) cho mỗi bảng
+  + 1 UPSERT rollup nhiều dòng. Số dư nguồn tiền cộng dồn, cuối cùng mỗi
+  nguồn chỉ cập nhật 1 lần. Toàn bộ nằm trong 1 transaction.
+- Dòng lỗi bị bỏ qua và báo lại (số dòng trong file + lý do).
+"""
+from __future__ import annotations
+
+import csv
+import io
+import itertools
+import os
+import re
+import time
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import insert, or_
+
+from ..extensions import db
+from ..models.category import Category
+from ..models.expense import Expense
+from ..models.income import Income
+from ..models.money_source import MoneySource
+from ..models.payment_method import PaymentMethod
+from . import data_version_service, month_snapshot_service, rollup_service
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "50000"))
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "200"))
+PREVIEW_ROWS = 10
+
+FIELDS = ("date", "amount", "desc", "category", "method", "money_source", "type")
+REQUIRED_FIELDS = ("date", "amount")
+
+# tên cột (viết thường) được tự nhận cho từng trường
+FIELD_ALIASES = {
+    "date": ("date", "ngày", "ngay", "ngày giao dịch", "ngày gd", "transaction date", "posting date"),
+    "amount": ("amount", "số tiền", "so tien", "số tiền (vnd)", "giá trị", "value"),
+    "desc": ("desc", "description", "mô tả", "mo ta", "nội dung", "noi dung", "diễn giải", "ghi chú", "note"),
+    "category": ("category", "danh mục", "danh muc"),
+    "method": ("method", "payment method", "phương thức", "phuong thuc"),
+    "money_source": ("money_source", "money source", "nguồn tiền", "nguon tien", "tài khoản", "account"),
+    "type": ("type", "kind", "loại", "loai"),
+}
+
+_KIND_VALUES = {
+    "expense": "expense", "chi": "expense", "chi tiêu": "expense", "debit": "expense", "-": "expense",
+    "income": "income", "thu": "income", "thu nhập": "income", "credit": "income", "+": "income",
+}
+_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%Y/%m/%d", "%d/%m/%y")
+_MAX_AMOUNT = Decimal("9999999999.99")  # Numeric(12, 2)
+
+
+class ImportFormatError(ValueError):
+    """File / mapping không đọc được (lỗi cả file, không phải từng dòng)."""
+
+
+# ----------------- đọc file -----------------
+def _iter_csv(stream):
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    first = text.readline()
+    # sao kê VN hay dùng ';' hoặc tab thay cho ','
+    delimiter = max((",", ";", "\t"), key=first.count)
+    yield from csv.reader(itertools.chain([first], text), delimiter=delimiter)
+
+
+def _iter_xlsx(stream):
+    from openpyxl import load_workbook
+
+    try:
+        wb = load_workbook(stream, read_only=True, data_only=True)
+    except Exception as e:
+        raise ImportFormatError(f"Không đọc được file Excel: {e}")
+    try:
+        yield from wb.active.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def iter_rows(stream, filename: str = "", fmt: str | None = None):
+    """Các dòng của file dưới dạng list/tuple giá trị ô."""
+    fmt = (fmt or os.path.splitext(filename or "")[1].lstrip(".") or "csv").lower()
+    if fmt in ("xlsx", "xlsm"):
+        return _iter_xlsx(stream)
+    if fmt in ("csv", "txt"):
+        return _iter_csv(stream)
+    raise ImportFormatError(f"Định dạng '{fmt}' không hỗ trợ (chỉ CSV / XLSX)")
+
+
+def resolve_mapping(header: list | None, mapping: dict | None) -> dict[str, int]:
+    """{trường: chỉ số cột}; mapping có thể dùng tên cột hoặc số thứ tự (0-based)."""
+    names = [str(h or "").strip().lower() for h in (header or [])]
+    out = {}
+    if mapping:
+        for field, col in mapping.items():
+            if field not in FIELDS:
+                raise ImportFormatError(f"Trường không hỗ trợ: {field}")
+            if col is None or col == "":
+                continue
+            if isinstance(col, int) or str(col).isdigit():
+                out[field] = int(col)
+            elif str(col).strip().lower() in names:
+                out[field] = names.index(str(col).strip().lower())
+            else:
+                raise ImportFormatError(f"Không thấy cột '{col}' cho trường {field}")
+    else:
+        for field, aliases in FIELD_ALIASES.items():
+            for i, name in enumerate(names):
+                if name in aliases:
+                    out[field] = i
+                    break
+
+    missing = [f for f in REQUIRED_FIELDS if f not in out]
+    if missing:
+        raise ImportFormatError(
+            f"Thiếu cột bắt buộc {missing}; các cột trong file: {[h for h in header or []]}"
+        )
+    return out
+
+
+# ----------------- parse từng ô -----------------
+def _finite(d: Decimal, v) -> Decimal:
+    # ô số XLSX có thể là NaN / Infinity -> lỗi dòng, không phải lỗi cả file
+    if not d.is_finite():
+        raise ValueError(f"số tiền không hợp lệ: {v}")
+    return d
+
+
+def parse_amount(v) -> Decimal:
+    if isinstance(v, (int, float, Decimal)) and not isinstance(v, bool):
+        return _finite(Decimal(str(v)), v)
+    raw = str(v or "").strip()
+    if not raw:
+        raise ValueError("thiếu số tiền")
+    s = re.sub(r"[^\d,.\-+]", "", raw)
+    if not re.search(r"\d", s):
+        raise ValueError(f"số tiền không hợp lệ: {v}")
+    if re.fullmatch(r"[-+]?\d{1,3}([.,]\d{3})+", s):
+        s = s.replace(".", "").replace(",", "")  # 1.250.000 / 1,250,000
+    elif "," in s and "." in s:
+        # dấu xuất hiện sau cùng là dấu thập phân
+        if s.rfind(",") > s.rfind("."):
+            s = s.replace(".", "").replace(",", ".")
+        else:
+            s = s.replace(",", "")
+    else:
+        s = s.replace(",", ".")
+    try:
+        return _finite(Decimal(s), v)
+    except InvalidOperation:
+        raise ValueError(f"số tiền không hợp lệ: {v}")
+
+
+def parse_date(v, fmt: str | None = None) -> date:
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    s = str(v or "").strip()
+    if not s:
+        raise ValueError("thiếu ngày")
+    s = s.split("T")[0].split(" ")[0]  # bỏ phần giờ
+    for f in (fmt,) if fmt else _DATE_FORMATS:
+        try:
+            return datetime.strptime(s, f).date()
+        except ValueError:
+            continue
+    raise ValueError(f"ngày không hợp lệ: {v}")
+
+
+def _cell(row, idx):
+    if idx is None or idx >= len(row):
+        return None
+    v = row[idx]
+    return v.strip() if isinstance(v, str) else v
+
+
+# ----------------- bảng tra -----------------
+class _Lookups:
+    """Danh mục / phương thức / nguồn tiền của user, nạp 1 lần cho cả file."""
+
+    def __init__(self, user_id: int):
+        self.categories: dict[tuple[str, str], int] = {}
+        cats = Category.query.filter(
+            or_(Category.user_id.is_(None), Category.user_id == user_id),
+            Category.type.in_(("expense", "income")),
+        ).order_by(Category.user_id.is_(None).desc(), Category.id.desc())
+        # danh mục chung trước, của user sau (ghi đè); trùng tên lấy id nhỏ nhất
+        for c in cats:
+            self.categories[(c.type, c.name.strip().lower())] = c.id
+
+        self.methods: dict[str, int] = {}
+        for m in PaymentMethod.query.filter(
+            or_(PaymentMethod.user_id.is_(None), PaymentMethod.user_id == user_id)
+        ).order_by(PaymentMethod.user_id.is_(None).desc(), PaymentMethod.id.desc()):
+            self.methods[m.name.strip().lower()] = m.id
+        self.method_names = {mid: name for name, mid in self.methods.items()}
+
+        self.sources: dict[str, MoneySource] = {}
+        self.sources_by_id: dict[int, MoneySource] = {}
+        for s in MoneySource.query.filter_by(user_id=user_id, is_active=True):
+            self.sources.setdefault(s.name.strip().lower(), s)
+            self.sources_by_id[s.id] = s
+
+    def category(self, kind: str, name: str | None):
+        return self.categories.get((kind, name.strip().lower())) if name else None
+
+    def source_for_method(self, method_id: int | None):
+        """Như _auto_money_source_id: nguồn tiền trùng tên với phương thức."""
+        name = self.method_names.get(method_id)
+        src = self.sources.get(name) if name else None
+        return src.id if src else None
+
+
+# ----------------- import -----------------
+class _Report:
+    def __init__(self):
+        self.rows = 0
+        self.inserted = {"expense": 0, "income": 0}
+        self.classified = 0
+        self.failed = 0
+        self.errors: list[dict] = []
+        self.preview: list[dict] = []
+        self.source_deltas: dict[int, Decimal] = {}
+
+    def error(self, row_no: int, message: str):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"row": row_no, "message": message})
+
+
+def _parse_row(row, cols, opts, lookups: _Lookups) -> dict:
+    """1 dòng file -> dict giao dịch (category_id có thể None = cần phân loại)."""
+    amount = parse_amount(_cell(row, cols["amount"]))
+    raw_kind = _cell(row, cols.get("type"))
+    if raw_kind not in (None, ""):
+        kind = _KIND_VALUES.get(str(raw_kind).strip().lower())
+        if kind is None:
+            raise ValueError(f"loại giao dịch không hợp lệ: {raw_kind}")
+    elif opts["signed"]:
+        kind = "expense" if amount < 0 else "income"
+    else:
+        kind = opts["kind"]
+    # so độ lớn trước quantize: số quá nhiều chữ số làm quantize ném InvalidOperation
+    amount = abs(amount)
+    if amount <= _MAX_AMOUNT:
+        amount = amount.quantize(Decimal("0.01"))
+    if amount <= 0 or amount > _MAX_AMOUNT:
+        raise ValueError(f"số tiền phải > 0 và <= {_MAX_AMOUNT:,}")
+
+    desc = str(_cell(row, cols.get("desc")) or "").strip()
+    cat_name = str(_cell(row, cols.get("category")) or "").strip()
+    category_id = lookups.category(kind, cat_name)
+    if cat_name and category_id is None:
+        raise ValueError(f"danh mục '{cat_name}' không tồn tại (loại {kind})")
+    if category_id is None and kind == "income":
+        raise ValueError("thiếu danh mục thu nhập")
+    if category_id is None and not desc:
+        raise ValueError("thiếu danh mục và mô tả để phân loại")
+
+    method_id = None
+    if kind == "expense":
+        method_name = str(_cell(row, cols.get("method")) or "").strip().lower()
+        method_id = lookups.methods.get(method_name) if method_name else None
+
+    source_name = str(_cell(row, cols.get("money_source")) or "").strip()
+    if source_name:
+        src = lookups.sources.get(source_name.lower())
+        if src is None:
+            raise ValueError(f"nguồn tiền '{source_name}' không tồn tại")
+        source_id = src.id
+    else:
+        source_id = opts["money_source_id"] or lookups.source_for_method(method_id)
+
+    return {
+        "kind": kind,
+        "day": parse_date(_cell(row, cols["date"]), opts["date_format"]),
+        "amount": amount,
+        "note": desc,
+        "category_id": category_id,
+        "payment_method_id": method_id,
+        "money_source_id": source_id,
+    }
+
+
+def _classify(chunk: list[tuple[int, dict]], lookups: _Lookups, report: _Report):
+    """Gán danh mục cho các khoản chi thiếu danh mục trong lô: 1 lần predict_many."""
+    todo = [(no, tx) for no, tx in chunk if tx["category_id"] is None]
+    if not todo:
+        return chunk
+    try:
+        from ..ai.classifier import predict_many
+
+        preds = predict_many([tx["note"] for _, tx in todo])
+    except Exception as e:  # model chưa có / lỗi -> báo lỗi từng dòng, không hỏng cả file
+        preds = [(None, 0.0)] * len(todo)
+        reason = f"không phân loại được danh mục ({type(e).__name__})"
+    else:
+        reason = "classifier trả về danh mục không có trong hệ thống"
+
+    failed = set()
+    for (no, tx), (label, _prob) in zip(todo, preds):
+        tx["category_id"] = lookups.category("expense", label)
+        if tx["category_id"] is None:
+            report.error(no, reason)
+            failed.add(no)
+        else:
+            report.classified += 1
+    return [(no, tx) for no, tx in chunk if no not in failed]
+
+
+def _write_chunk(user_id: int, chunk: list[tuple[int, dict]], report: _Report, dry_run: bool):
+    by_kind = {"expense": [], "income": []}
+    for no, tx in chunk:
+        by_kind[tx["kind"]].append(tx)
+        if tx["money_source_id"]:
+            sign = -1 if tx["kind"] == "expense" else 1
+            report.source_deltas[tx["money_source_id"]] = (
+                report.source_deltas.get(tx["money_source_id"], Decimal(0)) + sign * tx["amount"]
+            )
+        if len(report.preview) < PREVIEW_ROWS:
+            report.preview.append(
+                {
+                    "row": no,
+                    "type": tx["kind"],
+                    "date": tx["day"].isoformat(),
+                    "amount": float(tx["amount"]),
+                    "desc": tx["note"],
+                    "category_id": tx["category_id"],
+                    "payment_method_id": tx["payment_method_id"],
+                    "money_source_id": tx["money_source_id"],
+                }
+            )
+
+    for kind, txs in by_kind.items():
+        if not txs:
+            continue
+        report.inserted[kind] += len(txs)
+        if dry_run:
+            continue
+        if kind == "expense":
+            values = [
+                {
+                    "user_id": user_id,
+                    "category_id": t["category_id"],
+                    "payment_method_id": t["payment_method_id"],
+                    "money_source_id": t["money_source_id"],
+                    "amount": t["amount"],
+                    "spent_at": t["day"],
+                    "note": t["note"],
+                }
+                for t in txs
+            ]
+            db.session.execute(insert(Expense).values(values))
+        else:
+            values = [
+                {
+                    "user_id": user_id,
+                    "category_id": t["category_id"],
+                    "money_source_id": t["money_source_id"],
+                    "amount": t["amount"],
+                    "received_at": t["day"],
+                    "note": t["note"],
+                }
+                for t in txs
+            ]
+            db.session.execute(insert(Income).values(values))
+        rollup_service.add_many(
+            user_id, kind, ((t["day"], t["category_id"], t["amount"]) for t in txs)
+        )
+
+
+def import_transactions(
+    user_id: int,
+    rows,
+    mapping: dict | None = None,
+    has_header: bool = True,
+    kind: str = "expense",
+    signed: bool = False,
+    money_source_id: int | None = None,
+    date_format: str | None = None,
+    dry_run: bool = False,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+) -> dict:
+    """
+    Import các dòng (iter_rows) cho user. kind: loại mặc định khi không có
+    cột 'type'; signed=True: số âm là chi, số dương là thu (sao kê ngân hàng).
+    dry_run: kiểm tra + phân loại, không ghi DB (trả thêm preview).
+    """
+    if kind not in ("expense", "income"):
+        raise ImportFormatError("kind phải là 'expense' hoặc 'income'")
+    t0 = time.perf_counter()
+    user_id = int(user_id)
+    lookups = _Lookups(user_id)
+    if money_source_id and int(money_source_id) not in lookups.sources_by_id:
+        raise ImportFormatError("money_source_id không thuộc user")
+    opts = {
+        "kind": kind,
+        "signed": signed,
+        "money_source_id": int(money_source_id) if money_source_id else None,
+        "date_format": date_format,
+    }
+
+    rows = iter(rows)
+    header = next(rows, None) if has_header else None
+    if has_header and header is None:
+        raise ImportFormatError("File rỗng")
+    cols = resolve_mapping(header, mapping)
+    first_no = 2 if has_header else 1  # số dòng như khi mở file (1-based)
+
+    report = _Report()
+    try:
+        chunk: list[tuple[int, dict]] = []
+        for no, row in enumerate(rows, start=first_no):
+            if not row or all(v in (None, "") for v in row):
+                continue
+            report.rows += 1
+            if report.rows > IMPORT_MAX_ROWS:
+                raise ImportFormatError(f"File vượt quá {IMPORT_MAX_ROWS} dòng")
+            try:
+                chunk.append((no, _parse_row(row, cols, opts, lookups)))
+            except ValueError as e:
+                report.error(no, str(e))
+            if len(chunk) >= chunk_size:
+                _write_chunk(user_id, _classify(chunk, lookups, report), report, dry_run)
+                chunk = []
+        if chunk:
+            _write_chunk(user_id, _classify(chunk, lookups, report), report, dry_run)
+
+        if dry_run or not any(report.inserted.values()):
+            db.session.rollback()
+        else:
+            # mỗi nguồn tiền cập nhật số dư 1 lần cho cả file
+            for sid, delta in report.source_deltas.items():
+                src = lookups.sources_by_id.get(sid)
+                if src is not None:
+                    src.balance = float(src.balance or 0) + float(delta)
+            data_version_service.bump(db.session, [user_id])
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if not dry_run and report.inserted["expense"]:
+        from .forecast_service import invalidate
+
+        invalidate(user_id)
+        month_snapshot_service.invalidate(user_id)
+
+    out = {
+        "success": True,
+        "dry_run": dry_run,
+        "rows": report.rows,
+        "inserted": report.inserted,
+        "failed": report.failed,
+        "classified": report.classified,
+        "errors": report.errors,
+        "errors_truncated": report.failed > len(report.errors),
+        "money_sources": {str(k): float(v) for k, v in report.source_deltas.items()},
+        "columns": {f: (header[i] if header and i < len(header) else i) for f, i in cols.items()},
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
+    if dry_run:
+        out["preview"] = report.preview
+    return out
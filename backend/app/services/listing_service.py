@@ -0,0 +1,348 @@
+# backend/app/services/listing_service.py
+"""
+Liệt kê giao dịch (chi / thu / gộp thu + chi) cho các API danh sách.
+
+- Chỉ SELECT các cột cần trả về, tên danh mục / phương thức lấy bằng JOIN
+  trong cùng query (không lazy-load từng dòng).
+- Phân trang keyset theo (ngày, id) giảm dần, dùng index
+  idx_expenses_user_spent / idx_incomes_user_date: trang nào cũng chỉ đọc
+  limit + 1 dòng, không OFFSET. Cursor là token base64 mờ (kèm loại danh
+  sách), client chỉ việc gửi lại next_cursor.
+- limit=None: trả toàn bộ (tương thích FE cũ đang lọc phía client).
+- KPI (tổng, số lượng, trung bình) tính trong SQL trên rollup
+  (rollup_service.category_totals), không cộng trong Python.
+"""
+from __future__ import annotations
+
+import base64
+import json
+import os
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import and_, func, literal, or_, select, union_all
+
+from ..extensions import db
+from ..models.category import Category
+from ..models.expense import Expense
+from ..models.income import Income
+from ..models.payment_method import PaymentMethod
+from .rollup_service import category_totals
+
+LIST_MAX_LIMIT = int(os.getenv("LIST_MAX_LIMIT", "500"))
+
+# thứ tự trong danh sách gộp khi cùng ngày: chi trước thu (như sort cũ)
+_KIND_RANK = {"expense": 1, "income": 0}
+
+
+class CursorError(ValueError):
+    """Cursor không hợp lệ / không thuộc danh sách này."""
+
+
+# ----------------- cursor -----------------
+def encode_cursor(listing: str, *values) -> str:
+    raw = json.dumps([listing, *values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(listing: str, token: str, n: int) -> list:
+    """Giải mã cursor -> [ngày (date), ...n-1 giá trị còn lại]."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+        if not isinstance(data, list) or len(data) != n + 1 or data[0] != listing:
+            raise ValueError
+        values = data[1:]
+        values[0] = date.fromisoformat(values[0])
+        if not all(isinstance(v, int) for v in values[1:]):
+            raise ValueError
+        return values
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise CursorError("cursor không hợp lệ")
+
+
+def clamp_limit(raw) -> int | None:
+    """?limit= -> số dòng mỗi trang (None nếu không phân trang)."""
+    if raw in (None, ""):
+        return None
+    try:
+        return max(1, min(LIST_MAX_LIMIT, int(raw)))
+    except (TypeError, ValueError):
+        raise CursorError("limit phải là số nguyên")
+
+
+def _after(date_col, id_col, day: date, last_id: int):
+    """(ngày, id) < (day, last_id) theo thứ tự giảm dần."""
+    return or_(date_col < day, and_(date_col == day, id_col < last_id))
+
+
+def _page(rows: list, limit: int | None, cursor_of):
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, cursor_of(rows[-1])
+
+
+# ----------------- KPI -----------------
+def _kpi(user_id: int, kind: str, d_from, d_to, category_id=None, category=None) -> dict:
+    sub = category_totals(user_id, d_from or date.min, d_to or date.max, kind=kind)
+    q = db.session.query(
+        func.coalesce(func.sum(sub.c.total), 0), func.coalesce(func.sum(sub.c.n), 0)
+    )
+    if category_id:
+        q = q.filter(sub.c.category_id == category_id)
+    elif category:
+        q = q.join(Category, Category.id == sub.c.category_id).filter(Category.name == category)
+    total, count = q.one()
+    total = int(Decimal(total))
+    count = int(count)
+    return {"total": total, "count": count, "avg": int(total / count) if count else 0}
+
+
+# ----------------- chi -----------------
+def expenses_query(
+    user_id: int,
+    d_from: date | None = None,
+    d_to: date | None = None,
+    category_id: int | None = None,
+    category: str | None = None,
+):
+    """Query projection khoản chi theo bộ lọc của /api/expenses (chưa sắp xếp)."""
+    q = (
+        db.session.query(
+            Expense.id,
+            Expense.user_id,
+            Expense.category_id,
+            Expense.payment_method_id,
+            Expense.money_source_id,
+            Expense.amount,
+            Expense.spent_at,
+            Expense.note,
+            Category.name.label("category"),
+            PaymentMethod.name.label("method"),
+        )
+        .outerjoin(Category, Category.id == Expense.category_id)
+        .outerjoin(PaymentMethod, PaymentMethod.id == Expense.payment_method_id)
+        .filter(Expense.user_id == user_id)
+    )
+    if category:
+        q = q.filter(Category.name == category)
+    if category_id:
+        q = q.filter(Expense.category_id == category_id)
+    if d_from:
+        q = q.filter(Expense.spent_at >= d_from)
+    if d_to:
+        q = q.filter(Expense.spent_at <= d_to)
+    return q
+
+
+def list_expenses(
+    user_id: int,
+    d_from: date | None = None,
+    d_to: date | None = None,
+    category_id: int | None = None,
+    category: str | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> dict:
+    q = expenses_query(user_id, d_from, d_to, category_id, category)
+    if cursor:
+        day, last_id = decode_cursor("e", cursor, 2)
+        q = q.filter(_after(Expense.spent_at, Expense.id, day, last_id))
+
+    q = q.order_by(Expense.spent_at.desc(), Expense.id.desc())
+    if limit is not None:
+        q = q.limit(limit + 1)
+
+    rows, next_cursor = _page(
+        q.all(), limit, lambda r: encode_cursor("e", r.spent_at.isoformat(), r.id)
+    )
+    items = [
+        {
+            "id": r.id,
+            "user_id": r.user_id,
+            "category": r.category,
+            "category_id": r.category_id,
+            "method": r.method,
+            "payment_method_id": r.payment_method_id,
+            "money_source_id": r.money_source_id,
+            "amount": int(Decimal(r.amount)),  # front đang dùng VND không lẻ
+            "date": r.spent_at.strftime("%Y-%m-%d"),
+            "desc": r.note or "",
+        }
+        for r in rows
+    ]
+    out = {"items": items, "next_cursor": next_cursor, "has_more": next_cursor is not None}
+    if not cursor:
+        # KPI cho cả bộ lọc, chỉ tính ở trang đầu
+        out["kpi"] = _kpi(user_id, "expense", d_from, d_to, category_id, category)
+    return out
+
+
+# ----------------- thu -----------------
+def incomes_query(
+    user_id: int,
+    d_from: date | None = None,
+    d_to: date | None = None,
+    category_id: int | None = None,
+):
+    """Query projection khoản thu theo bộ lọc của /api/incomes (chưa sắp xếp)."""
+    q = (
+        db.session.query(
+            Income.id,
+            Income.category_id,
+            Income.money_source_id,
+            Income.amount,
+            Income.received_at,
+            Income.note,
+            Category.name.label("category"),
+        )
+        .outerjoin(Category, Category.id == Income.category_id)
+        .filter(Income.user_id == user_id)
+    )
+    if category_id:
+        q = q.filter(Income.category_id == category_id)
+    if d_from:
+        q = q.filter(Income.received_at >= d_from)
+    if d_to:
+        q = q.filter(Income.received_at <= d_to)
+    return q
+
+
+def list_incomes(
+    user_id: int,
+    d_from: date | None = None,
+    d_to: date | None = None,
+    category_id: int | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> dict:
+    q = incomes_query(user_id, d_from, d_to, category_id)
+    if cursor:
+        day, last_id = decode_cursor("i", cursor, 2)
+        q = q.filter(_after(Income.received_at, Income.id, day, last_id))
+
+    q = q.order_by(Income.received_at.desc(), Income.id.desc())
+    if limit is not None:
+        q = q.limit(limit + 1)
+
+    rows, next_cursor = _page(
+        q.all(), limit, lambda r: encode_cursor("i", r.received_at.isoformat(), r.id)
+    )
+    items = [
+        {
+            "id": r.id,
+            "type": "income",
+            "category_id": r.category_id,
+            "category": r.category,
+            "money_source_id": r.money_source_id,
+            "amount": float(r.amount or 0),
+            "received_at": r.received_at.isoformat() if r.received_at else None,
+            "note": r.note or "",
+        }
+        for r in rows
+    ]
+    out = {"items": items, "next_cursor": next_cursor, "has_more": next_cursor is not None}
+    if not cursor:
+        out["kpi"] = _kpi(user_id, "income", d_from, d_to, category_id)
+    return out
+
+
+# ----------------- thu + chi -----------------
+def _branch_after(date_col, id_col, rank: int, cursor: list):
+    """Điều kiện keyset (ngày, hạng loại, id) < cursor cho 1 nhánh UNION."""
+    day, c_rank, last_id = cursor
+    if rank < c_rank:
+        return date_col <= day
+    if rank > c_rank:
+        return date_col < day
+    return _after(date_col, id_col, day, last_id)
+
+
+def transactions_stmt(
+    user_id: int,
+    d_from: date,
+    d_to: date,
+    category_id: int | None = None,
+    category: str | None = None,
+    limit: int | None = None,
+    after: list | None = None,
+):
+    """
+    SELECT thu + chi trong [d_from, d_to], mới nhất trước (day, rank, id,
+    note, category, method, amount). Có limit / after: mỗi nhánh tự lọc
+    keyset + LIMIT theo index của bảng mình trước khi UNION.
+    """
+    branches = []
+    for kind, model, date_col, method_col, join_pm in (
+        ("expense", Expense, Expense.spent_at, PaymentMethod.name, True),
+        ("income", Income, Income.received_at, literal(""), False),
+    ):
+        rank = _KIND_RANK[kind]
+        stmt = (
+            select(
+                date_col.label("day"),
+                literal(rank).label("rank"),
+                model.id.label("id"),
+                model.note.label("note"),
+                Category.name.label("category"),
+                method_col.label("method"),
+                model.amount.label("amount"),
+            )
+            .join(Category, Category.id == model.category_id)
+            .where(model.user_id == user_id, date_col >= d_from, date_col <= d_to)
+        )
+        if join_pm:
+            stmt = stmt.outerjoin(PaymentMethod, PaymentMethod.id == Expense.payment_method_id)
+        if category_id:
+            stmt = stmt.where(model.category_id == category_id)
+        elif category:
+            stmt = stmt.where(Category.name == category)
+        if after:
+            stmt = stmt.where(_branch_after(date_col, model.id, rank, after))
+        if limit is not None:
+            stmt = stmt.order_by(date_col.desc(), model.id.desc()).limit(limit + 1)
+        branches.append(stmt.subquery().select())
+
+    u = union_all(*branches).subquery()
+    stmt = select(u).order_by(u.c.day.desc(), u.c.rank.desc(), u.c.id.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)
+    return stmt
+
+
+def list_transactions(
+    user_id: int,
+    d_from: date,
+    d_to: date,
+    category_id: int | None = None,
+    category: str | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> dict:
+    """Thu + chi trong [d_from, d_to], mới nhất trước (phân trang keyset)."""
+    after = decode_cursor("t", cursor, 3) if cursor else None
+    stmt = transactions_stmt(user_id, d_from, d_to, category_id, category, limit, after)
+
+    rows, next_cursor = _page(
+        db.session.execute(stmt).all(),
+        limit,
+        lambda r: encode_cursor("t", iso_day(r.day), r.rank, r.id),
+    )
+    items = [
+        {
+            "date": iso_day(r.day),
+            "desc": r.note or "",
+            "category": r.category or ("Khác" if r.rank else "Thu nhập"),
+            "method": r.method or "",
+            "amount": float(r.amount or 0),
+            "kind": "expense" if r.rank else "income",
+        }
+        for r in rows
+    ]
+    return {"items": items, "next_cursor": next_cursor, "has_more": next_cursor is not None}
+
+
+def iso_day(d) -> str:
+    # cột ngày qua UNION trên SQLite có thể trả về chuỗi
+    return d if isinstance(d, str) else d.isoformat()
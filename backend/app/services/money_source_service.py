@@ -63,6 +63,11 @@ class MoneySourceService:
 
         db.session.delete(source)
         db.session.commit()
+
+        # Xoá nguồn tiền cascade xoá luôn giao dịch -> dựng lại rollup của user
+        from app.services.rollup_service import rebuild
+
+        rebuild(user_id)
         return True
 
     @staticmethod
@@ -0,0 +1,266 @@
+# backend/app/services/month_snapshot_service.py
+"""
+Snapshot "tháng hiện tại" theo user cho chatbot (tổng chi, ngân sách,
+top danh mục) -> câu hỏi kiểu báo cáo trả lời không cần query DB.
+
+- Dựng 1 lần từ rollup (UserDailyTotal + category_totals) + Budget, khoá
+  theo user; sang ngày mới hoặc quá MONTH_SNAPSHOT_TTL giây thì dựng lại.
+- Cập nhật khi ghi: rollup_service._bump gọi record() cho mỗi khoản chi
+  thêm / trừ, delta được giữ trong session.info và chỉ cộng vào snapshot
+  sau khi transaction commit (rollback -> bỏ). Khoản chi rơi vào danh mục
+  snapshot chưa biết tên -> xoá snapshot, lần đọc sau dựng lại.
+- Ngân sách đổi / rollup dựng lại -> invalidate().
+- Lưu trong Flask-Caching nếu app có CACHE_TYPE (chia sẻ giữa worker),
+  ngược lại LRU trong tiến trình (MONTH_SNAPSHOT_CACHE_SIZE user). Với
+  LRU nhiều worker, khoản chi ghi ở worker khác chỉ thấy sau tối đa TTL.
+- get() trả kèm "meta": nguồn (cache / db), thời điểm dựng / cập nhật,
+  số delta đã cộng, tuổi và thời gian còn lại trước khi dựng lại.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+
+from flask import current_app
+from sqlalchemy import event, func, or_
+from sqlalchemy.orm import Session
+
+from ..extensions import cache, db
+from ..models.budget import Budget
+from ..models.category import Category
+from ..models.rollup import UserDailyTotal
+from .rollup_service import category_totals
+
+MONTH_SNAPSHOT_TTL = int(os.getenv("MONTH_SNAPSHOT_TTL", "600"))
+MONTH_SNAPSHOT_CACHE_SIZE = int(os.getenv("MONTH_SNAPSHOT_CACHE_SIZE", "2048"))
+MONTH_SNAPSHOT_TOP_N = 5
+
+_PENDING = "month_snapshot_pending"  # khoá trong session.info
+
+_lock = threading.Lock()
+_entries: "OrderedDict[int, dict]" = OrderedDict()
+_counters = {"hits": 0, "builds": 0, "deltas": 0, "invalidations": 0}
+
+
+def _count(name: str, n: int = 1):
+    with _lock:
+        _counters[name] += n
+
+
+# ----------------- store -----------------
+def _shared() -> bool:
+    return "cache" in current_app.extensions
+
+
+def _load(uid: int) -> dict | None:
+    if _shared():
+        return cache.get(f"month_snapshot:{uid}")
+    with _lock:
+        snap = _entries.get(uid)
+        if snap is not None:
+            _entries.move_to_end(uid)
+        return snap
+
+
+def _save(uid: int, snap: dict):
+    if _shared():
+        cache.set(f"month_snapshot:{uid}", snap, timeout=MONTH_SNAPSHOT_TTL)
+        return
+    with _lock:
+        _entries[uid] = snap
+        _entries.move_to_end(uid)
+        while len(_entries) > MONTH_SNAPSHOT_CACHE_SIZE:
+            _entries.popitem(last=False)
+
+
+def _delete(uid: int | None):
+    if _shared():
+        if uid is None:
+            return  # không liệt kê được khoá -> để TTL tự hết hạn
+        cache.delete(f"month_snapshot:{uid}")
+        return
+    with _lock:
+        if uid is None:
+            _entries.clear()
+        else:
+            _entries.pop(uid, None)
+
+
+# ----------------- build -----------------
+def _build(uid: int, today: date) -> dict:
+    month_start = today.replace(day=1)
+
+    spent, count = (
+        db.session.query(
+            func.coalesce(func.sum(UserDailyTotal.expense_total), 0),
+            func.coalesce(func.sum(UserDailyTotal.expense_count), 0),
+        )
+        .filter(
+            UserDailyTotal.user_id == uid,
+            UserDailyTotal.day >= month_start,
+            UserDailyTotal.day <= today,
+        )
+        .one()
+    )
+
+    budget = (
+        db.session.query(func.coalesce(func.sum(Budget.limit_amount), 0))
+        .filter(
+            Budget.user_id == uid,
+            Budget.period_year == today.year,
+            Budget.period_month == today.month,
+        )
+        .scalar()
+    )
+
+    cat_sub = category_totals(uid, month_start, today, kind="expense")
+    by_category = {
+        str(r.category_id): float(r.total)
+        for r in db.session.query(cat_sub.c.category_id, cat_sub.c.total)
+        if r.category_id is not None
+    }
+
+    # tên mọi danh mục chi user có thể dùng (để cộng delta không cần query)
+    names = {
+        str(cid): name
+        for cid, name in db.session.query(Category.id, Category.name).filter(
+            Category.type == "expense",
+            or_(
+                Category.user_id.is_(None),
+                Category.user_id == uid,
+                Category.id.in_([int(c) for c in by_category]),
+            ),
+        )
+    }
+
+    now = time.time()
+    _count("builds")
+    return {
+        "month": month_start.strftime("%Y-%m"),
+        "as_of": today.isoformat(),
+        "spent": float(spent),
+        "expense_count": int(count),
+        "budget": float(budget),
+        "by_category": by_category,
+        "category_names": names,
+        "computed_at": now,
+        "updated_at": now,
+        "deltas": 0,
+    }
+
+
+def _view(snap: dict, source: str) -> dict:
+    totals: dict[str, float] = {}
+    for cid, total in snap["by_category"].items():
+        name = snap["category_names"].get(cid)
+        if name is not None:  # chỉ danh mục loại chi (như join Category.type cũ)
+            totals[name] = totals.get(name, 0.0) + total
+    top = sorted(
+        ({"name": n, "total": round(t, 2)} for n, t in totals.items() if t > 0),
+        key=lambda c: -c["total"],
+    )[:MONTH_SNAPSHOT_TOP_N]
+
+    now = time.time()
+    return {
+        "month": snap["month"],
+        "spent": round(snap["spent"], 2),
+        "expense_count": snap["expense_count"],
+        "budget": round(snap["budget"], 2),
+        "remaining": round(snap["budget"] - snap["spent"], 2),
+        "top_categories": top,
+        "meta": {
+            "source": source,
+            "as_of": snap["as_of"],
+            "computed_at": datetime.fromtimestamp(snap["computed_at"]).isoformat(timespec="seconds"),
+            "updated_at": datetime.fromtimestamp(snap["updated_at"]).isoformat(timespec="seconds"),
+            "age_seconds": round(now - snap["computed_at"], 1),
+            "deltas_applied": snap["deltas"],
+            "expires_in": max(0, round(snap["computed_at"] + MONTH_SNAPSHOT_TTL - now)),
+        },
+    }
+
+
+# ----------------- write path -----------------
+def record(user_id, day: date, category_id, amount: float, sign: int):
+    """Ghi nhận 1 khoản chi thêm (+1) / trừ (-1); áp vào snapshot khi commit."""
+    db.session.info.setdefault(_PENDING, []).append(
+        (int(user_id), day, category_id, float(amount), sign)
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session):
+    pending = session.info.pop(_PENDING, None)
+    if not pending:
+        return
+    by_user: dict[int, list] = {}
+    for item in pending:
+        by_user.setdefault(item[0], []).append(item)
+
+    for uid, items in by_user.items():
+        snap = _load(uid)
+        if snap is None:
+            continue
+        month_start = date.fromisoformat(snap["as_of"]).replace(day=1)
+        as_of = date.fromisoformat(snap["as_of"])
+        for _, day, category_id, amount, sign in items:
+            if not (month_start <= day <= as_of):
+                continue  # khác tháng / ngày tương lai: không thuộc snapshot
+            cid = None if category_id is None else str(category_id)
+            if cid is not None and cid not in snap["category_names"]:
+                snap = None  # danh mục mới: dựng lại ở lần đọc sau
+                break
+            snap["spent"] += amount
+            snap["expense_count"] += sign
+            if cid is not None:
+                snap["by_category"][cid] = snap["by_category"].get(cid, 0.0) + amount
+            snap["deltas"] += 1
+        if snap is None:
+            _delete(uid)
+            continue
+        snap["updated_at"] = time.time()
+        _save(uid, snap)
+        _count("deltas", len(items))
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session):
+    session.info.pop(_PENDING, None)
+
+
+def invalidate(user_id=None):
+    """Xoá snapshot (1 user, hoặc tất cả khi user_id=None) -> lần đọc sau dựng lại."""
+    _delete(None if user_id is None else int(user_id))
+    _count("invalidations")
+
+
+# ----------------- public -----------------
+def get(user_id) -> dict:
+    """Snapshot tháng hiện tại của user, kèm meta về độ cũ."""
+    uid = int(user_id)
+    today = date.today()
+    snap = _load(uid)
+    if (
+        snap is not None
+        and snap["as_of"] == today.isoformat()
+        and time.time() - snap["computed_at"] < MONTH_SNAPSHOT_TTL
+    ):
+        _count("hits")
+        return _view(snap, "cache")
+
+    snap = _build(uid, today)
+    _save(uid, snap)
+    return _view(snap, "db")
+
+
+def stats() -> dict:
+    with _lock:
+        out = dict(_counters)
+        size = len(_entries)
+    out["backend"] = "cache" if _shared() else "memory"
+    out["size"] = None if out["backend"] == "cache" else size
+    out["ttl"] = MONTH_SNAPSHOT_TTL
+    return out
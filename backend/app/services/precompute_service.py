@@ -0,0 +1,181 @@
+# backend/app/services/precompute_service.py
+"""
+Job tính sẵn dự báo chi + điểm sức khoẻ tài chính cho mọi user
+(`flask precompute run`, chạy ban đêm bằng cron).
+
+- Duyệt user theo id tăng dần, từng lô PRECOMPUTE_CHUNK_SIZE user; mỗi lô
+  chia cho process pool (PRECOMPUTE_WORKERS tiến trình, mỗi tiến trình tự
+  tạo app + kết nối DB riêng). workers <= 1: chạy ngay trong tiến trình.
+- Worker chỉ đọc DB và trả kết quả; tiến trình chính ghi kết quả của cả lô
+  vào precomputed_results + cập nhật checkpoint (precompute_runs.last_user_id)
+  trong cùng 1 transaction -> dừng giữa chừng thì chạy lại tiếp tục từ lô
+  chưa xong (mặc định resume lần chạy dở gần nhất).
+- Request đọc kết quả qua forecast_service / financial_health_service khi
+  cache trong tiến trình trống; kết quả chỉ được dùng khi data_version còn
+  khớp (dự báo lệch version vẫn trả tạm và refit ở background như cache).
+"""
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+from sqlalchemy import func
+
+from ..extensions import db
+from ..models.precompute import PrecomputedResult, PrecomputeRun
+from ..models.user import User
+
+PRECOMPUTE_CHUNK_SIZE = int(os.getenv("PRECOMPUTE_CHUNK_SIZE", "100"))
+PRECOMPUTE_WORKERS = int(os.getenv("PRECOMPUTE_WORKERS", str(os.cpu_count() or 1)))
+FORECAST_PERIODS = 30
+
+_worker_app = None
+
+
+# ----------------- worker -----------------
+def _init_worker(database_url: str):
+    """Mỗi tiến trình con tạo app riêng (engine / pool kết nối riêng)."""
+    global _worker_app
+    os.environ["DATABASE_URL"] = database_url
+    from .. import create_app
+
+    _worker_app = create_app()
+
+
+def compute_user(user_id: int, today: date | None = None) -> dict:
+    """
+    Tính dự báo + điểm tháng hiện tại cho 1 user (cần app context).
+    Trả {"user_id", "results": [...]} hoặc {"user_id", "error"}.
+    """
+    from . import financial_health_service, forecast_service
+
+    today = today or date.today()
+    try:
+        key, entry = forecast_service.refresh_expense_forecast(user_id, FORECAST_PERIODS)
+        version, health = financial_health_service.evaluate(user_id, today.year, today.month)
+        return {
+            "user_id": user_id,
+            "results": [
+                ("forecast", key, entry["version"], forecast_service.entry_to_json(entry)),
+                ("health", f"{today.year:04d}-{today.month:02d}", version, health),
+            ],
+        }
+    except Exception as e:  # 1 user lỗi không được làm hỏng cả lô
+        db.session.rollback()
+        return {"user_id": user_id, "error": f"{type(e).__name__}: {e}"}
+
+
+def _compute_in_worker(user_id: int) -> dict:
+    with _worker_app.app_context():
+        return compute_user(user_id)
+
+
+# ----------------- checkpoint / lưu kết quả -----------------
+def _open_run(resume: bool) -> PrecomputeRun:
+    run = None
+    if resume:
+        run = (
+            PrecomputeRun.query.filter(PrecomputeRun.status.in_(("running", "failed")))
+            .order_by(PrecomputeRun.id.desc())
+            .first()
+        )
+    if run is None:
+        run = PrecomputeRun(status="running", last_user_id=0, started_at=datetime.now())
+        db.session.add(run)
+    run.status = "running"
+    run.total_users = db.session.query(func.count(User.id)).scalar() or 0
+    db.session.commit()
+    return run
+
+
+def _save_chunk(run: PrecomputeRun, outputs: list[dict], last_user_id: int):
+    """Upsert kết quả của lô + dời checkpoint (1 transaction)."""
+    user_ids = [o["user_id"] for o in outputs if "results" in o]
+    existing = {
+        (r.user_id, r.kind, r.period_key): r
+        for r in PrecomputedResult.query.filter(PrecomputedResult.user_id.in_(user_ids))
+    } if user_ids else {}
+    now = datetime.now()
+
+    for out in outputs:
+        if "error" in out:
+            run.failed_users += 1
+            run.last_error = f"user {out['user_id']}: {out['error']}"
+            continue
+        for kind, key, version, result in out["results"]:
+            row = existing.get((out["user_id"], kind, key))
+            if row is None:
+                row = PrecomputedResult(user_id=out["user_id"], kind=kind, period_key=key)
+                db.session.add(row)
+            row.data_version = version
+            row.result = result
+            row.computed_at = now
+        run.done_users += 1
+
+    run.last_user_id = last_user_id
+    db.session.commit()
+
+
+# ----------------- public -----------------
+def run(
+    chunk_size: int = PRECOMPUTE_CHUNK_SIZE,
+    workers: int = PRECOMPUTE_WORKERS,
+    resume: bool = True,
+    limit: int | None = None,
+    progress=None,
+) -> PrecomputeRun:
+    """
+    Chạy job. progress(run, số user đã xử lý lần này, elapsed_s) được gọi sau mỗi lô.
+    limit: dừng sau ~limit user (lô cuối vẫn chạy trọn) — để thử / chia ca.
+    """
+    run_ = _open_run(resume)
+    t0 = time.perf_counter()
+    processed = 0
+
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(str(db.engine.url.render_as_string(hide_password=False)),),
+        )
+    try:
+        while limit is None or processed < limit:
+            ids = [
+                uid
+                for (uid,) in db.session.query(User.id)
+                .filter(User.id > run_.last_user_id)
+                .order_by(User.id)
+                .limit(chunk_size)
+            ]
+            if not ids:
+                run_.status = "done"
+                run_.finished_at = datetime.now()
+                db.session.commit()
+                break
+
+            if pool is not None:
+                outputs = list(pool.map(_compute_in_worker, ids))
+            else:
+                outputs = [compute_user(uid) for uid in ids]
+
+            _save_chunk(run_, outputs, ids[-1])
+            processed += len(ids)
+            if progress is not None:
+                progress(run_, processed, time.perf_counter() - t0)
+    except BaseException as e:
+        db.session.rollback()
+        run_.status = "failed"
+        run_.last_error = f"{type(e).__name__}: {e}"
+        db.session.commit()
+        raise
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return run_
+
+
+def latest_runs(n: int = 5) -> list[PrecomputeRun]:
+    return PrecomputeRun.query.order_by(PrecomputeRun.id.desc()).limit(n).all()
@@ -0,0 +1,420 @@
+# backend/app/services/rollup_service.py
+"""
+Rollup theo ngày / theo (tháng, danh mục) cho Expense & Income.
+
+- Ghi: add_* / remove_* được gọi trong cùng transaction với thao tác
+  tạo / sửa / xoá giao dịch (UPSERT cộng dồn, không đọc lại bảng gốc).
+- Đọc: category_totals() trả subquery tổng theo danh mục cho khoảng ngày
+  bất kỳ, dựa trên rollup tháng + điều chỉnh phần lẻ ở 2 đầu khoảng.
+- Bảo trì: rebuild() dựng lại từ bảng gốc, check_consistency() so sánh
+  rollup với dữ liệu gốc (dùng qua `flask rollup rebuild|check`).
+"""
+from __future__ import annotations
+
+from calendar import monthrange
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import Integer, cast, extract, func, literal, select, union_all
+
+from ..extensions import db
+from ..models.expense import Expense
+from ..models.income import Income
+from ..models.rollup import UserDailyTotal, UserMonthCategoryTotal
+
+
+# ----------------- helpers -----------------
+def _as_date(d):
+    if isinstance(d, datetime):
+        return d.date()
+    return d
+
+
+def _as_decimal(v) -> Decimal:
+    if v is None:
+        return Decimal(0)
+    if isinstance(v, Decimal):
+        return v
+    return Decimal(str(v))
+
+
+def _dialect_insert(table):
+    """INSERT hỗ trợ ON CONFLICT cho PostgreSQL / SQLite."""
+    name = db.session.get_bind().dialect.name
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert(table)
+
+
+def _upsert_add(model, keys: dict, deltas: dict):
+    """
+    Cộng dồn `deltas` vào dòng rollup có khoá `keys` (tạo mới nếu chưa có).
+    Một câu lệnh, nguyên tử với các UPSERT đồng thời.
+    """
+    table = model.__table__
+    ins = _dialect_insert(table)
+    if ins is None:
+        # fallback cho dialect không có ON CONFLICT
+        row = model.query.filter_by(**keys).first()
+        if row is None:
+            row = model(**keys, **{k: 0 for k in deltas})
+            db.session.add(row)
+        for k, v in deltas.items():
+            setattr(row, k, (getattr(row, k) or 0) + v)
+        db.session.flush()
+        return
+
+    stmt = ins.values(**keys, **deltas)
+    set_ = {k: table.c[k] + stmt.excluded[k] for k in deltas}
+    set_["updated_at"] = func.current_timestamp()
+    stmt = stmt.on_conflict_do_update(index_elements=list(keys), set_=set_)
+    db.session.execute(stmt)
+
+
+def _upsert_add_many(model, key_cols: list[str], rows: list[dict], delta_cols: list[str]):
+    """_upsert_add cho nhiều khoá khác nhau: 1 câu INSERT nhiều dòng."""
+    if not rows:
+        return
+    table = model.__table__
+    ins = _dialect_insert(table)
+    if ins is None:
+        for r in rows:
+            _upsert_add(model, {k: r[k] for k in key_cols}, {k: r[k] for k in delta_cols})
+        return
+
+    stmt = ins.values(rows)
+    set_ = {k: table.c[k] + stmt.excluded[k] for k in delta_cols}
+    set_["updated_at"] = func.current_timestamp()
+    db.session.execute(stmt.on_conflict_do_update(index_elements=key_cols, set_=set_))
+
+
+def _bump(user_id, day, category_id, kind: str, amount, sign: int):
+    day = _as_date(day)
+    if user_id is None or day is None:
+        return
+    amt = _as_decimal(amount) * sign
+
+    _upsert_add(
+        UserDailyTotal,
+        {"user_id": int(user_id), "day": day},
+        {f"{kind}_total": amt, f"{kind}_count": sign},
+    )
+    if category_id is not None:
+        _upsert_add(
+            UserMonthCategoryTotal,
+            {
+                "user_id": int(user_id),
+                "period_year": day.year,
+                "period_month": day.month,
+                "category_id": int(category_id),
+                "kind": kind,
+            },
+            {"total": amt, "tx_count": sign},
+        )
+
+    if kind == "expense":
+        # dự báo chi phụ thuộc dữ liệu chi -> đánh dấu cache cũ
+        from . import month_snapshot_service
+        from .forecast_service import invalidate
+
+        invalidate(user_id)
+        month_snapshot_service.record(user_id, day, category_id, amt, sign)
+
+
+# ----------------- write path -----------------
+def add_expense(e: Expense):
+    _bump(e.user_id, e.spent_at, e.category_id, "expense", e.amount, +1)
+
+
+def remove_expense(e: Expense):
+    """Gọi TRƯỚC khi sửa / xoá để trừ giá trị cũ khỏi rollup."""
+    _bump(e.user_id, e.spent_at, e.category_id, "expense", e.amount, -1)
+
+
+def add_income(i: Income):
+    _bump(i.user_id, i.received_at, i.category_id, "income", i.amount, +1)
+
+
+def remove_income(i: Income):
+    """Gọi TRƯỚC khi sửa / xoá để trừ giá trị cũ khỏi rollup."""
+    _bump(i.user_id, i.received_at, i.category_id, "income", i.amount, -1)
+
+
+def add_many(user_id: int, kind: str, rows) -> None:
+    """
+    Cộng 1 lô giao dịch mới (day, category_id, amount) của 1 user vào rollup
+    (import hàng loạt): gộp theo khoá rồi UPSERT nhiều dòng / 1 câu cho mỗi
+    bảng. Không đụng cache -> người gọi invalidate dự báo / snapshot sau commit.
+    """
+    uid = int(user_id)
+    daily: dict = {}
+    monthly: dict = {}
+    for day, category_id, amount in rows:
+        day = _as_date(day)
+        amt = _as_decimal(amount)
+        total, n = daily.get(day, (Decimal(0), 0))
+        daily[day] = (total + amt, n + 1)
+        key = (day.year, day.month, int(category_id))
+        total, n = monthly.get(key, (Decimal(0), 0))
+        monthly[key] = (total + amt, n + 1)
+
+    _upsert_add_many(
+        UserDailyTotal,
+        ["user_id", "day"],
+        [
+            {"user_id": uid, "day": day, f"{kind}_total": total, f"{kind}_count": n}
+            for day, (total, n) in daily.items()
+        ],
+        [f"{kind}_total", f"{kind}_count"],
+    )
+    _upsert_add_many(
+        UserMonthCategoryTotal,
+        ["user_id", "period_year", "period_month", "category_id", "kind"],
+        [
+            {
+                "user_id": uid,
+                "period_year": y,
+                "period_month": m,
+                "category_id": cid,
+                "kind": kind,
+                "total": total,
+                "tx_count": n,
+            }
+            for (y, m, cid), (total, n) in monthly.items()
+        ],
+        ["total", "tx_count"],
+    )
+
+
+# ----------------- read path -----------------
+def _month_key(y, m):
+    return y * 100 + m
+
+
+def category_totals(user_id: int, start: date, end: date, kind: str = "expense"):
+    """
+    Subquery (category_id, total, n) = tổng theo danh mục trong [start, end].
+
+    Lấy rollup của mọi tháng chạm khoảng, rồi trừ phần giao dịch gốc nằm
+    ngoài khoảng ở tháng đầu [đầu tháng, start) và tháng cuối (end, cuối tháng].
+    Chỉ phần lẻ 2 đầu mới đọc bảng gốc (theo index user_id + ngày).
+    """
+    model, date_col = (Expense, Expense.spent_at) if kind == "expense" else (
+        Income, Income.received_at
+    )
+    R = UserMonthCategoryTotal
+    month_key = R.period_year * 100 + R.period_month
+
+    parts = [
+        select(
+            R.category_id.label("category_id"),
+            R.total.label("total"),
+            R.tx_count.label("n"),
+        ).where(
+            R.user_id == user_id,
+            R.kind == kind,
+            month_key >= _month_key(start.year, start.month),
+            month_key <= _month_key(end.year, end.month),
+        )
+    ]
+
+    head_start = start.replace(day=1)
+    if head_start < start:
+        parts.append(
+            select(model.category_id, -model.amount, literal(-1)).where(
+                model.user_id == user_id,
+                date_col >= head_start,
+                date_col < start,
+            )
+        )
+
+    tail_end = end.replace(day=monthrange(end.year, end.month)[1])
+    if end < tail_end:
+        parts.append(
+            select(model.category_id, -model.amount, literal(-1)).where(
+                model.user_id == user_id,
+                date_col > end,
+                date_col <= tail_end,
+            )
+        )
+
+    u = union_all(*parts).subquery()
+    return (
+        select(
+            u.c.category_id,
+            func.sum(u.c.total).label("total"),
+            func.sum(u.c.n).label("n"),
+        )
+        .group_by(u.c.category_id)
+        .having(func.sum(u.c.n) > 0)
+        .subquery()
+    )
+
+
+# ----------------- rebuild / check -----------------
+def _ym(col):
+    return cast(extract("year", col), Integer), cast(extract("month", col), Integer)
+
+
+def _daily_source(user_id: int | None = None):
+    """Tổng theo (user, ngày) tính lại từ bảng gốc."""
+    exp = select(
+        Expense.user_id.label("user_id"),
+        Expense.spent_at.label("day"),
+        Expense.amount.label("expense_total"),
+        literal(1).label("expense_count"),
+        literal(0).label("income_total"),
+        literal(0).label("income_count"),
+    )
+    inc = select(
+        Income.user_id,
+        Income.received_at,
+        literal(0),
+        literal(0),
+        Income.amount,
+        literal(1),
+    )
+    if user_id is not None:
+        exp = exp.where(Expense.user_id == user_id)
+        inc = inc.where(Income.user_id == user_id)
+
+    u = union_all(exp, inc).subquery()
+    return select(
+        u.c.user_id,
+        u.c.day,
+        func.sum(u.c.expense_total).label("expense_total"),
+        func.sum(u.c.expense_count).label("expense_count"),
+        func.sum(u.c.income_total).label("income_total"),
+        func.sum(u.c.income_count).label("income_count"),
+    ).group_by(u.c.user_id, u.c.day)
+
+
+def _month_category_source(user_id: int | None = None):
+    """Tổng theo (user, tháng, danh mục, loại) tính lại từ bảng gốc."""
+    parts = []
+    for kind, model, date_col in (
+        ("expense", Expense, Expense.spent_at),
+        ("income", Income, Income.received_at),
+    ):
+        y, m = _ym(date_col)
+        q = select(
+            model.user_id.label("user_id"),
+            y.label("period_year"),
+            m.label("period_month"),
+            model.category_id.label("category_id"),
+            literal(kind).label("kind"),
+            func.sum(model.amount).label("total"),
+            func.count(model.id).label("tx_count"),
+        ).group_by(model.user_id, y, m, model.category_id)
+        if user_id is not None:
+            q = q.where(model.user_id == user_id)
+        parts.append(q)
+    return union_all(*parts)
+
+
+_DAILY_COLS = ["user_id", "day", "expense_total", "expense_count",
+               "income_total", "income_count"]
+_MONTH_COLS = ["user_id", "period_year", "period_month", "category_id",
+               "kind", "total", "tx_count"]
+
+
+def rebuild(user_id: int | None = None) -> dict:
+    """
+    Xoá và dựng lại rollup (1 user hoặc toàn bộ) bằng INSERT ... SELECT.
+    Trả về số dòng rollup sau khi dựng.
+    """
+    for model in (UserDailyTotal, UserMonthCategoryTotal):
+        q = db.session.query(model)
+        if user_id is not None:
+            q = q.filter(model.user_id == user_id)
+        q.delete(synchronize_session=False)
+
+    db.session.execute(
+        UserDailyTotal.__table__.insert().from_select(
+            _DAILY_COLS, _daily_source(user_id)
+        )
+    )
+    db.session.execute(
+        UserMonthCategoryTotal.__table__.insert().from_select(
+            _MONTH_COLS, _month_category_source(user_id)
+        )
+    )
+    db.session.commit()
+
+    from .month_snapshot_service import invalidate
+
+    invalidate(user_id)
+
+    def _count(model):
+        q = db.session.query(func.count(model.id))
+        if user_id is not None:
+            q = q.filter(model.user_id == user_id)
+        return q.scalar() or 0
+
+    return {
+        "user_daily_totals": _count(UserDailyTotal),
+        "user_month_category_totals": _count(UserMonthCategoryTotal),
+    }
+
+
+def _diff(table: str, expected: dict, actual: dict, fields: list[str]) -> list[dict]:
+    out = []
+    for key in expected.keys() | actual.keys():
+        exp = expected.get(key)
+        act = actual.get(key)
+        exp_vals = [_as_decimal(v) for v in exp] if exp else [Decimal(0)] * len(fields)
+        act_vals = [_as_decimal(v) for v in act] if act else [Decimal(0)] * len(fields)
+        if exp_vals != act_vals:
+            out.append(
+                {
+                    "table": table,
+                    "key": [str(k) for k in key],
+                    "expected": dict(zip(fields, map(float, exp_vals))),
+                    "actual": dict(zip(fields, map(float, act_vals))),
+                }
+            )
+    return out
+
+
+def check_consistency(user_id: int | None = None) -> list[dict]:
+    """
+    So sánh rollup với dữ liệu gốc. Trả về danh sách dòng lệch
+    (rỗng = nhất quán). Dòng rollup toàn 0 coi như không tồn tại.
+    """
+    d_fields = _DAILY_COLS[2:]
+    expected = {
+        (r.user_id, _as_date(r.day)): tuple(getattr(r, f) for f in d_fields)
+        for r in db.session.execute(_daily_source(user_id))
+    }
+    q = db.session.query(UserDailyTotal)
+    if user_id is not None:
+        q = q.filter(UserDailyTotal.user_id == user_id)
+    actual = {
+        (r.user_id, r.day): tuple(getattr(r, f) for f in d_fields) for r in q
+    }
+    issues = _diff("user_daily_totals", expected, actual, d_fields)
+
+    m_fields = ["total", "tx_count"]
+    expected = {
+        (r.user_id, r.period_year, r.period_month, r.category_id, r.kind): (
+            r.total,
+            r.tx_count,
+        )
+        for r in db.session.execute(_month_category_source(user_id))
+    }
+    q = db.session.query(UserMonthCategoryTotal)
+    if user_id is not None:
+        q = q.filter(UserMonthCategoryTotal.user_id == user_id)
+    actual = {
+        (r.user_id, r.period_year, r.period_month, r.category_id, r.kind): (
+            r.total,
+            r.tx_count,
+        )
+        for r in q
+    }
+    issues += _diff("user_month_category_totals", expected, actual, m_fields)
+    return issues
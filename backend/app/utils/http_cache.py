@@ -0,0 +1,127 @@
+# backend/app/utils/http_cache.py
+"""
+ETag + cache JSON cho API đọc theo user (dashboard / analytics / ngân sách).
+
+@versioned_json đặt SAU @jwt_required():
+  - ETag mạnh = user + data_version (services/data_version_service) + ngày
+    hiện tại (số liệu "tháng này", dự báo... đổi theo ngày) + hash
+    path & query string.
+  - If-None-Match khớp -> 304 không chạy view (có Flask-Caching: chỉ 1 lần
+    đọc cache; không có: 1 query khoá chính lấy data_version).
+  - Không khớp -> trả JSON đã serialize trong cache nếu có, không thì chạy
+    view và lưu lại (chỉ response 200 JSON; view có thể đặt
+    response.cache_control.no_store = True để bỏ qua, vd kết quả tạm).
+  - Cache-Control: private, no-cache -> trình duyệt tự gửi If-None-Match
+    khi FE poll, không cần sửa JS.
+Cache JSON: Flask-Caching nếu có CACHE_TYPE, không thì LRU trong tiến trình
+(RESPONSE_CACHE_SIZE). Khoá gồm data_version nên không cần xoá khi ghi.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+
+from flask import current_app, make_response, request
+from flask_jwt_extended import get_jwt_identity
+
+from ..extensions import cache
+from ..services import data_version_service
+
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "600"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+
+_lock = threading.Lock()
+_entries: "OrderedDict[str, bytes]" = OrderedDict()
+_counters = {"not_modified": 0, "hits": 0, "misses": 0}
+
+
+def _count(name: str):
+    with _lock:
+        _counters[name] += 1
+
+
+def _get(tag: str) -> bytes | None:
+    if "cache" in current_app.extensions:
+        return cache.get(f"resp:{tag}")
+    with _lock:
+        body = _entries.get(tag)
+        if body is not None:
+            _entries.move_to_end(tag)
+        return body
+
+
+def _put(tag: str, body: bytes):
+    if "cache" in current_app.extensions:
+        cache.set(f"resp:{tag}", body, timeout=RESPONSE_CACHE_TTL)
+        return
+    with _lock:
+        _entries[tag] = body
+        _entries.move_to_end(tag)
+        while len(_entries) > RESPONSE_CACHE_SIZE:
+            _entries.popitem(last=False)
+
+
+def _user_id():
+    uid = get_jwt_identity()
+    if isinstance(uid, dict):
+        uid = uid.get("id")
+    try:
+        return int(uid)
+    except (TypeError, ValueError):
+        return None
+
+
+def make_etag(user_id: int, version: int) -> str:
+    target = hashlib.sha1(request.full_path.encode()).hexdigest()[:12]
+    return f"{user_id}-{version}-{date.today():%Y%m%d}-{target}"
+
+
+def versioned_json(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        uid = _user_id()
+        version = data_version_service.current(uid) if uid is not None else None
+        if version is None:
+            return view(*args, **kwargs)
+
+        tag = make_etag(uid, version)
+        if request.if_none_match.contains(tag):
+            _count("not_modified")
+            resp = current_app.response_class(status=304)
+        else:
+            body = _get(tag)
+            if body is not None:
+                _count("hits")
+                resp = current_app.response_class(body, mimetype="application/json")
+            else:
+                _count("misses")
+                resp = make_response(view(*args, **kwargs))
+                if (
+                    resp.status_code != 200
+                    or not resp.is_json
+                    or resp.cache_control.no_store
+                ):
+                    return resp
+                _put(tag, resp.get_data())
+
+        resp.set_etag(tag)
+        resp.cache_control.private = True
+        resp.cache_control.no_cache = True
+        return resp
+
+    return wrapper
+
+
+def stats() -> dict:
+    with _lock:
+        out = dict(_counters)
+        out["size"] = None if "cache" in current_app.extensions else len(_entries)
+    total = out["not_modified"] + out["hits"] + out["misses"]
+    out["served_without_view"] = (
+        round((out["not_modified"] + out["hits"]) / total, 3) if total else None
+    )
+    return out
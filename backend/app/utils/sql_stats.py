@@ -0,0 +1,148 @@
+# backend/app/utils/sql_stats.py
+"""
+Đếm + đo thời gian câu lệnh SQL theo request (bắt N+1 trước khi lên prod).
+
+- Listener before/after_cursor_execute trên mọi Engine cộng từng câu lệnh
+  vào các bộ đếm đang mở (ContextVar) -> không tốn gì khi không đo.
+- init_app(app): mỗi request có 1 bộ đếm.
+    SQL_STATS_HEADER=1 (hoặc app.debug): thêm header X-SQL-Count,
+      X-SQL-Time-Ms và Server-Timing (DevTools hiện luôn).
+    SQL_STATEMENT_BUDGET=N (>0): log cảnh báo request vượt N câu lệnh.
+- Test: với assert_max_statements(n): ... -> AssertionError (kèm danh sách
+  câu lệnh) nếu khối code / request bên trong chạy quá n câu lệnh:
+
+      with assert_max_statements(3):
+          client.get("/api/budgets/?month=2025-10")
+"""
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SQL_STATS_HEADER = os.getenv("SQL_STATS_HEADER", "0") == "1"
+SQL_STATEMENT_BUDGET = int(os.getenv("SQL_STATEMENT_BUDGET", "0"))
+
+_active: ContextVar[tuple] = ContextVar("sql_stats_active", default=())
+_T0 = "_sql_stats_t0"  # thời điểm bắt đầu câu lệnh
+
+
+class QueryStats:
+    """Số câu lệnh + tổng thời gian (ms); keep=True giữ cả SQL để in ra."""
+
+    __slots__ = ("count", "total_ms", "statements")
+
+    def __init__(self, keep: bool = False):
+        self.count = 0
+        self.total_ms = 0.0
+        self.statements: list[str] | None = [] if keep else None
+
+    def add(self, statement: str, ms: float):
+        self.count += 1
+        self.total_ms += ms
+        if self.statements is not None:
+            self.statements.append(statement)
+
+
+# Lưu 1 giá trị trên execution context (mỗi lần execute 1 context riêng):
+# câu lệnh lỗi không có after_cursor_execute cũng không để lại thời điểm cũ
+# trên connection trong pool. Không có context thì ghi đè conn.info[_T0].
+def _set_t0(conn, context, t0):
+    if context is not None:
+        setattr(context, _T0, t0)
+    else:
+        conn.info[_T0] = t0
+
+
+def _pop_t0(conn, context):
+    if context is not None:
+        t0 = getattr(context, _T0, None)
+        setattr(context, _T0, None)
+        return t0
+    return conn.info.pop(_T0, None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before(conn, cursor, statement, parameters, context, executemany):
+    if _active.get():
+        _set_t0(conn, context, time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after(conn, cursor, statement, parameters, context, executemany):
+    stats = _active.get()
+    t0 = _pop_t0(conn, context)
+    if not stats or t0 is None:
+        return
+    ms = (time.perf_counter() - t0) * 1000
+    for s in stats:
+        s.add(statement, ms)
+
+
+@contextmanager
+def track(keep: bool = False):
+    """Đo mọi câu lệnh chạy trong khối with (lồng nhau được)."""
+    stats = QueryStats(keep)
+    token = _active.set(_active.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _active.reset(token)
+
+
+@contextmanager
+def assert_max_statements(n: int, label: str = ""):
+    """Helper cho test: fail nếu khối with chạy quá n câu lệnh SQL."""
+    with track(keep=True) as stats:
+        yield stats
+    if stats.count > n:
+        listing = "\n".join(f"  {i + 1}. {s}" for i, s in enumerate(stats.statements))
+        raise AssertionError(
+            f"{label or 'block'}: {stats.count} câu lệnh SQL (ngân sách {n}):\n{listing}"
+        )
+
+
+# ----------------- gắn vào request -----------------
+def init_app(app):
+    @app.before_request
+    def _start():
+        g._sql_stats = QueryStats()
+        g._sql_stats_token = _active.set(_active.get() + (g._sql_stats,))
+
+    @app.after_request
+    def _report(resp):
+        stats = g.get("_sql_stats")
+        if stats is None:
+            return resp
+        if SQL_STATS_HEADER or current_app.debug:
+            resp.headers["X-SQL-Count"] = str(stats.count)
+            resp.headers["X-SQL-Time-Ms"] = f"{stats.total_ms:.1f}"
+            resp.headers.add(
+                "Server-Timing", f'sql;dur={stats.total_ms:.1f};desc="{stats.count} queries"'
+            )
+        if SQL_STATEMENT_BUDGET and stats.count > SQL_STATEMENT_BUDGET:
+            current_app.logger.warning(
+                "[SQL] %s %s %s: %d câu lệnh (ngân sách %d), %.1f ms",
+                request.method,
+                request.full_path.rstrip("?"),
+                resp.status_code,
+                stats.count,
+                SQL_STATEMENT_BUDGET,
+                stats.total_ms,
+            )
+        return resp
+
+    @app.teardown_request
+    def _stop(exc):
+        token = g.pop("_sql_stats_token", None)
+        if token is not None:
+            try:
+                _active.reset(token)
+            except ValueError:  # token thuộc context khác (không nên xảy ra)
+                pass
+
@@ -0,0 +1,76 @@
+"""Add precomputed_results / precompute_runs for the nightly precompute job
+
+Revision ID: add_precomputed_results
+Revises: add_user_rollups
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "add_precomputed_results"
+down_revision = "add_user_rollups"
+branch_labels = None
+depends_on = None
+
+
+def _timestamps():
+    return [
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            server_default=sa.func.current_timestamp(),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(),
+            server_default=sa.func.current_timestamp(),
+            nullable=False,
+        ),
+    ]
+
+
+def upgrade():
+    op.create_table(
+        "precomputed_results",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        *_timestamps(),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(length=20), nullable=False),
+        sa.Column("period_key", sa.String(length=32), nullable=False),
+        sa.Column("data_version", sa.String(length=32), nullable=False),
+        sa.Column("result", sa.JSON(), nullable=False),
+        sa.Column("computed_at", sa.DateTime(), nullable=False),
+        sa.CheckConstraint("kind IN ('forecast','health')", name="ck_precomputed_kind"),
+        sa.ForeignKeyConstraint(
+            ["user_id"], ["users.id"], onupdate="CASCADE", ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "user_id", "kind", "period_key", name="uq_precomputed_user_kind_key"
+        ),
+    )
+
+    op.create_table(
+        "precompute_runs",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        *_timestamps(),
+        sa.Column("status", sa.String(length=16), nullable=False),
+        sa.Column("last_user_id", sa.Integer(), nullable=False),
+        sa.Column("total_users", sa.Integer(), nullable=False),
+        sa.Column("done_users", sa.Integer(), nullable=False),
+        sa.Column("failed_users", sa.Integer(), nullable=False),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("started_at", sa.DateTime(), nullable=False),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade():
+    op.drop_table("precompute_runs")
+    op.drop_table("precomputed_results")
@@ -0,0 +1,28 @@
+"""Add users.data_version counter (ETag / response cache)
+
+Revision ID: add_user_data_version
+Revises: add_precomputed_results
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "add_user_data_version"
+down_revision = "add_precomputed_results"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "users",
+        sa.Column("data_version", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade():
+    op.drop_column("users", "data_version")
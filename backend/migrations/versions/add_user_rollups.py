@@ -0,0 +1,149 @@
+"""Add per-user daily / month-category rollup tables
+
+Revision ID: add_user_rollups
+Revises: add_money_sources_to_transactions
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "add_user_rollups"
+down_revision = "add_money_sources_to_transactions"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "user_daily_totals",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            server_default=sa.func.current_timestamp(),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(),
+            server_default=sa.func.current_timestamp(),
+            nullable=False,
+        ),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("expense_total", sa.Numeric(14, 2), nullable=False),
+        sa.Column("expense_count", sa.Integer(), nullable=False),
+        sa.Column("income_total", sa.Numeric(14, 2), nullable=False),
+        sa.Column("income_count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["user_id"], ["users.id"], onupdate="CASCADE", ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id", "day", name="uq_udt_user_day"),
+    )
+    op.create_index(
+        "idx_udt_user_day", "user_daily_totals", ["user_id", "day"], unique=False
+    )
+
+    op.create_table(
+        "user_month_category_totals",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            server_default=sa.func.current_timestamp(),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(),
+            server_default=sa.func.current_timestamp(),
+            nullable=False,
+        ),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("category_id", sa.Integer(), nullable=False),
+        sa.Column("period_year", sa.Integer(), nullable=False),
+        sa.Column("period_month", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(length=10), nullable=False),
+        sa.Column("total", sa.Numeric(14, 2), nullable=False),
+        sa.Column("tx_count", sa.Integer(), nullable=False),
+        sa.CheckConstraint("period_month BETWEEN 1 AND 12", name="ck_umct_month_1_12"),
+        sa.CheckConstraint("kind IN ('expense','income')", name="ck_umct_kind"),
+        sa.ForeignKeyConstraint(
+            ["user_id"], ["users.id"], onupdate="CASCADE", ondelete="CASCADE"
+        ),
+        sa.ForeignKeyConstraint(
+            ["category_id"], ["categories.id"], onupdate="CASCADE", ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "user_id",
+            "period_year",
+            "period_month",
+            "category_id",
+            "kind",
+            name="uq_umct_user_period_cat_kind",
+        ),
+    )
+    op.create_index(
+        "idx_umct_user_period",
+        "user_month_category_totals",
+        ["user_id", "period_year", "period_month"],
+        unique=False,
+    )
+
+    # Backfill từ dữ liệu hiện có
+    op.execute(
+        """
+        INSERT INTO user_daily_totals
+            (user_id, day, expense_total, expense_count, income_total, income_count)
+        SELECT user_id, day,
+               SUM(expense_total), SUM(expense_count),
+               SUM(income_total), SUM(income_count)
+        FROM (
+            SELECT user_id, spent_at AS day, amount AS expense_total,
+                   1 AS expense_count, 0 AS income_total, 0 AS income_count
+            FROM expenses
+            UNION ALL
+            SELECT user_id, received_at, 0, 0, amount, 1
+            FROM incomes
+        ) t
+        GROUP BY user_id, day
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO user_month_category_totals
+            (user_id, period_year, period_month, category_id, kind, total, tx_count)
+        SELECT user_id,
+               CAST(EXTRACT(YEAR FROM spent_at) AS INTEGER),
+               CAST(EXTRACT(MONTH FROM spent_at) AS INTEGER),
+               category_id, 'expense', SUM(amount), COUNT(id)
+        FROM expenses
+        GROUP BY user_id,
+                 CAST(EXTRACT(YEAR FROM spent_at) AS INTEGER),
+                 CAST(EXTRACT(MONTH FROM spent_at) AS INTEGER),
+                 category_id
+        UNION ALL
+        SELECT user_id,
+               CAST(EXTRACT(YEAR FROM received_at) AS INTEGER),
+               CAST(EXTRACT(MONTH FROM received_at) AS INTEGER),
+               category_id, 'income', SUM(amount), COUNT(id)
+        FROM incomes
+        GROUP BY user_id,
+                 CAST(EXTRACT(YEAR FROM received_at) AS INTEGER),
+                 CAST(EXTRACT(MONTH FROM received_at) AS INTEGER),
+                 category_id
+        """
+    )
+
+
+def downgrade():
+    op.drop_index("idx_umct_user_period", table_name="user_month_category_totals")
+    op.drop_table("user_month_category_totals")
+    op.drop_index("idx_udt_user_day", table_name="user_daily_totals")
+    op.drop_table("user_daily_totals")
@@ -0,0 +1,73 @@
+import itertools
+import sys
+from pathlib import Path
+
+import pytest
+
+# app dùng import tuyệt đối "app.*" (giống wsgi.py / run.py) -> cần backend/ trên sys.path
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """
+    1 app cho cả phiên test trên SQLite tạm (không Flask-Caching, không
+    preload model). Các cache trong tiến trình (JSON response, dự báo...)
+    khoá theo user_id -> mỗi module test tự tạo user riêng qua new_user.
+    """
+    mp = pytest.MonkeyPatch()
+    db_file = tmp_path_factory.mktemp("db") / "app.db"
+    mp.setenv("DATABASE_URL", f"sqlite:///{db_file.as_posix()}")
+    mp.delenv("CACHE_TYPE", raising=False)
+    mp.delenv("MODEL_PRELOAD", raising=False)
+
+    from app import create_app
+    from app.extensions import db
+
+    flask_app = create_app()
+    flask_app.config["TESTING"] = True
+    with flask_app.app_context():
+        db.create_all()
+    yield flask_app
+    mp.undo()
+
+
+@pytest.fixture(scope="session")
+def new_user(app):
+    """Factory: new_user() -> id của 1 user mới."""
+    from app.extensions import db
+    from app.models import User
+
+    seq = itertools.count(1)
+
+    def _new(**fields) -> int:
+        n = next(seq)
+        with app.app_context():
+            user = User(
+                email=fields.pop("email", f"user{n}@test.vn"),
+                password_hash="x",
+                full_name=fields.pop("full_name", f"User {n}"),
+                **fields,
+            )
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+
+    return _new
+
+
+@pytest.fixture(scope="session")
+def client_for(app):
+    """Factory: client_for(user_id) -> test client đã gắn Bearer token."""
+    from flask_jwt_extended import create_access_token
+
+    def _client(user_id: int):
+        with app.app_context():
+            token = create_access_token(identity=str(user_id))
+        client = app.test_client()
+        client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+        return client
+
+    return _client
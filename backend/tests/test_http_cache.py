@@ -0,0 +1,178 @@
+"""
+ETag / 304 + cache JSON cho API đọc (utils/http_cache.versioned_json) và
+bộ đếm users.data_version (services/data_version_service).
+"""
+from datetime import date
+
+import pytest
+from flask import jsonify
+from flask_jwt_extended import create_access_token, verify_jwt_in_request
+
+from app.utils.http_cache import versioned_json
+
+
+@pytest.fixture
+def user(app, new_user):
+    from app.extensions import db
+    from app.models import Category
+
+    uid = new_user()
+    with app.app_context():
+        cat = Category(name="Ăn uống", type="expense", user_id=uid)
+        db.session.add(cat)
+        db.session.commit()
+        cat_id = cat.id
+    return uid, cat_id
+
+
+class _View:
+    """View đếm số lần chạy, bọc bằng versioned_json."""
+
+    def __init__(self, no_store=False):
+        self.calls = 0
+        self.no_store = no_store
+
+    def __call__(self):
+        self.calls += 1
+        resp = jsonify({"calls": self.calls})
+        resp.cache_control.no_store = self.no_store
+        return resp
+
+
+def _call(app, uid, view, etag=None, path="/t?x=1"):
+    """Gọi view đã bọc trong 1 request có JWT của uid (+ If-None-Match)."""
+    with app.app_context():
+        token = create_access_token(identity=str(uid))
+    headers = {"Authorization": f"Bearer {token}"}
+    if etag:
+        headers["If-None-Match"] = f'"{etag}"'
+    with app.test_request_context(path, headers=headers):
+        verify_jwt_in_request()
+        return versioned_json(view)()
+
+
+def _add_expense(uid, cat_id, amount=10_000):
+    from app.extensions import db
+    from app.models import Expense
+
+    db.session.add(Expense(user_id=uid, category_id=cat_id, amount=amount, spent_at=date.today()))
+
+
+def _version(app, uid):
+    from app.services import data_version_service
+
+    with app.app_context():
+        return data_version_service.current(uid)
+
+
+def test_repeat_poll_is_304_without_running_view(app, user):
+    uid, _ = user
+    view = _View()
+    first = _call(app, uid, view)
+    etag, _weak = first.get_etag()
+    assert first.status_code == 200 and etag
+    assert "no-cache" in first.headers["Cache-Control"]
+
+    again = _call(app, uid, view, etag=etag)
+    assert again.status_code == 304
+    assert again.get_etag()[0] == etag
+    # không If-None-Match: trả body đã cache, cũng không chạy lại view
+    cached = _call(app, uid, view)
+    assert cached.status_code == 200 and cached.get_json() == {"calls": 1}
+    assert view.calls == 1
+
+
+def test_etag_differs_by_query_string(app, user):
+    uid, _ = user
+    view = _View()
+    a = _call(app, uid, view, path="/t?month=2026-09").get_etag()[0]
+    b = _call(app, uid, view, path="/t?month=2026-10").get_etag()[0]
+    assert a != b and view.calls == 2
+
+
+def test_orm_write_changes_etag(app, user):
+    from app.extensions import db
+
+    uid, cat_id = user
+    view = _View()
+    old = _call(app, uid, view).get_etag()[0]
+    v0 = _version(app, uid)
+
+    with app.app_context():
+        _add_expense(uid, cat_id)
+        db.session.commit()
+
+    assert _version(app, uid) == v0 + 1
+    resp = _call(app, uid, view, etag=old)
+    assert resp.status_code == 200
+    assert resp.get_etag()[0] != old
+    assert view.calls == 2
+
+
+def test_rolled_back_write_keeps_etag(app, user):
+    from app.extensions import db
+
+    uid, cat_id = user
+    view = _View()
+    old = _call(app, uid, view).get_etag()[0]
+    v0 = _version(app, uid)
+
+    with app.app_context():
+        _add_expense(uid, cat_id)
+        db.session.flush()  # after_flush đã tăng data_version trong transaction
+        db.session.rollback()
+
+    assert _version(app, uid) == v0
+    resp = _call(app, uid, view, etag=old)
+    assert resp.status_code == 304
+    assert view.calls == 1
+
+
+def test_no_store_response_is_not_cached_or_tagged(app, user):
+    uid, _ = user
+    view = _View(no_store=True)
+    first = _call(app, uid, view)
+    assert first.status_code == 200
+    assert first.get_etag() == (None, None)
+    assert "no-store" in first.headers["Cache-Control"]
+
+    second = _call(app, uid, view)
+    assert second.get_json() == {"calls": 2}
+    assert second.get_etag() == (None, None)
+
+
+def test_health_score_forecast_pending_not_cached(app, user, client_for, monkeypatch):
+    """Điểm sức khoẻ tạm (dự báo chưa có) không gắn ETag; có dự báo thì có."""
+    from app.services import forecast_service
+
+    uid, _ = user
+    client = client_for(uid)
+    monkeypatch.setattr(forecast_service, "cached_expense_forecast", lambda *a, **k: None)
+    for _ in range(2):
+        resp = client.get("/api/dashboard/health_score")
+        assert resp.status_code == 200
+        assert resp.get_json()["forecast_pending"] is True
+        assert resp.headers.get("ETag") is None
+        assert "no-store" in resp.headers["Cache-Control"]
+
+    monkeypatch.setattr(
+        forecast_service,
+        "cached_expense_forecast",
+        lambda *a, **k: {"total_forecast": 0, "change_pct": 0},
+    )
+    resp = client.get("/api/dashboard/health_score")
+    assert resp.get_json()["forecast_pending"] is False
+    etag = resp.headers["ETag"]
+    assert client.get("/api/dashboard/health_score", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_real_endpoint_304_costs_one_query(app, user, client_for):
+    from app.utils.sql_stats import assert_max_statements
+
+    uid, _ = user
+    client = client_for(uid)
+    url = f"/api/dashboard/summary?month={date.today():%Y-%m}"
+    etag = client.get(url).headers["ETag"]
+    with assert_max_statements(1, "304"):  # chỉ đọc data_version
+        resp = client.get(url, headers={"If-None-Match": etag})
+    assert resp.status_code == 304
@@ -0,0 +1,252 @@
+"""
+Import CSV / XLSX (services/import_service): parse từng ô, nhận cột, và
+import thật vào DB (dòng đã ghi, rollup, số dư nguồn tiền).
+"""
+import io
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from app.services.import_service import (
+    ImportFormatError,
+    import_transactions,
+    iter_rows,
+    parse_amount,
+    parse_date,
+    resolve_mapping,
+)
+
+
+# ----------------- parse_amount -----------------
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ("120000", Decimal("120000")),
+        ("1.250.000", Decimal("1250000")),
+        ("1,250,000", Decimal("1250000")),
+        ("1.234,56", Decimal("1234.56")),
+        ("1,234.56", Decimal("1234.56")),
+        ("12,5", Decimal("12.5")),
+        ("-45.000", Decimal("-45000")),
+        ("120.000 đ", Decimal("120000")),
+        ("VND 50,000", Decimal("50000")),
+        (75000, Decimal("75000")),
+        (1234.5, Decimal("1234.5")),
+        (Decimal("99.99"), Decimal("99.99")),
+    ],
+)
+def test_parse_amount(raw, expected):
+    assert parse_amount(raw) == expected
+
+
+@pytest.mark.parametrize(
+    "raw", ["", None, "abc", "--", float("nan"), float("inf"), Decimal("NaN"), True]
+)
+def test_parse_amount_invalid(raw):
+    with pytest.raises(ValueError):
+        parse_amount(raw)
+
+
+# ----------------- parse_date -----------------
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ("2026-10-05", date(2026, 10, 5)),
+        ("05/10/2026", date(2026, 10, 5)),
+        ("05-10-2026", date(2026, 10, 5)),
+        ("05.10.2026", date(2026, 10, 5)),
+        ("2026/10/05", date(2026, 10, 5)),
+        ("05/10/26", date(2026, 10, 5)),
+        ("2026-10-05T08:30:00", date(2026, 10, 5)),
+        ("05/10/2026 08:30", date(2026, 10, 5)),
+        (datetime(2026, 10, 5, 8, 30), date(2026, 10, 5)),
+        (date(2026, 10, 5), date(2026, 10, 5)),
+    ],
+)
+def test_parse_date(raw, expected):
+    assert parse_date(raw) == expected
+
+
+def test_parse_date_with_format():
+    assert parse_date("10/05/2026", "%m/%d/%Y") == date(2026, 10, 5)
+    with pytest.raises(ValueError):
+        parse_date("2026-10-05", "%m/%d/%Y")
+
+
+@pytest.mark.parametrize("raw", ["", None, "32/13/2026", "hôm qua"])
+def test_parse_date_invalid(raw):
+    with pytest.raises(ValueError):
+        parse_date(raw)
+
+
+# ----------------- resolve_mapping -----------------
+def test_resolve_mapping_aliases():
+    header = ["Mã GD", "Ngày", "Mô tả", "Số tiền", "Danh mục", "Nguồn tiền", "Loại"]
+    assert resolve_mapping(header, None) == {
+        "date": 1,
+        "desc": 2,
+        "amount": 3,
+        "category": 4,
+        "money_source": 5,
+        "type": 6,
+    }
+
+
+def test_resolve_mapping_explicit():
+    header = ["Ngày GD", "Nội dung", "Ghi có", "Ghi nợ"]
+    cols = resolve_mapping(header, {"date": "ngày gd", "amount": 3, "desc": "1", "category": ""})
+    assert cols == {"date": 0, "amount": 3, "desc": 1}
+
+
+@pytest.mark.parametrize(
+    "header, mapping",
+    [
+        (["Ngày", "Số tiền"], {"date": "Ngày", "amount": "Số tiền", "foo": "Ngày"}),
+        (["Ngày", "Số tiền"], {"date": "Ngày", "amount": "Thành tiền"}),
+        (["Ngày", "Mô tả"], None),
+        (None, None),
+    ],
+)
+def test_resolve_mapping_errors(header, mapping):
+    with pytest.raises(ImportFormatError):
+        resolve_mapping(header, mapping)
+
+
+# ----------------- import vào DB -----------------
+@pytest.fixture
+def user(app, new_user):
+    """User có danh mục / phương thức / 2 nguồn tiền riêng."""
+    from app.extensions import db
+    from app.models import Category, PaymentMethod
+    from app.models.money_source import MoneySource
+
+    uid = new_user()
+    with app.app_context():
+        db.session.add_all([
+            Category(name="Ăn uống", type="expense", user_id=uid),
+            Category(name="Di chuyển", type="expense", user_id=uid),
+            Category(name="Lương", type="income", user_id=uid),
+            PaymentMethod(name="Thẻ", user_id=uid),
+            MoneySource(user_id=uid, name="Ví", type="cash", balance=1_000_000),
+            MoneySource(user_id=uid, name="Ngân hàng", type="bank_account", balance=5_000_000),
+        ])
+        db.session.commit()
+    return uid
+
+
+def _csv(text: str):
+    return iter_rows(io.BytesIO(text.encode("utf-8")), "sao_ke.csv")
+
+
+def _balances(uid):
+    from app.models.money_source import MoneySource
+
+    return {s.name: s.balance for s in MoneySource.query.filter_by(user_id=uid)}
+
+
+def test_import_round_trip(app, user):
+    from sqlalchemy import func
+
+    from app.extensions import db
+    from app.models import Category, Expense, Income
+    from app.services import rollup_service
+    from app.utils.sql_stats import track
+
+    csv_text = (
+        "Ngày;Loại;Danh mục;Mô tả;Phương thức;Nguồn tiền;Số tiền\n"
+        "30/09/2026;chi;Ăn uống;Phở;Thẻ;Ví;45.000\n"
+        "01/10/2026;chi;Ăn uống;Cơm;;Ví;35.000\n"
+        "01/10/2026;chi;Di chuyển;Grab;Thẻ;Ngân hàng;120.000\n"
+        "05/10/2026;thu;Lương;Lương T9;;Ngân hàng;8.000.000\n"
+        "06/10/2026;chi;Ăn uống;Quá lớn;;Ví;" + "9" * 40 + "\n"
+        "07/10/2026;chi;Không có;Sai danh mục;;Ví;10.000\n"
+        "08/10/2026;chi;Ăn uống;Sai ngày;;Ví;10000\n"
+        "xx;chi;Ăn uống;Ngày hỏng;;Ví;10.000\n"
+    )
+
+    with app.app_context():
+        before = _balances(user)
+        with track(keep=True) as stats:
+            out = import_transactions(user, _csv(csv_text), chunk_size=2)
+
+        assert out["inserted"] == {"expense": 4, "income": 1}
+        assert out["failed"] == 3
+        assert [e["row"] for e in out["errors"]] == [6, 7, 9]
+        assert "9,999,999,999.99" in out["errors"][0]["message"]
+
+        # dòng đã ghi
+        assert db.session.query(func.count(Expense.id)).filter_by(user_id=user).scalar() == 4
+        assert db.session.query(func.sum(Expense.amount)).filter_by(user_id=user).scalar() == (
+            Decimal("210000")
+        )
+        inc = Income.query.filter_by(user_id=user).one()
+        assert (inc.received_at, inc.amount) == (date(2026, 10, 5), Decimal("8000000"))
+
+        # rollup khớp bảng gốc, kể cả tổng theo danh mục trong 1 khoảng ngày
+        assert rollup_service.check_consistency(user) == []
+        sub = rollup_service.category_totals(user, date(2026, 10, 1), date(2026, 10, 31))
+        totals = {
+            name: (Decimal(total), n)
+            for name, total, n in db.session.query(Category.name, sub.c.total, sub.c.n).join(
+                sub, sub.c.category_id == Category.id
+            )
+        }
+        assert totals == {
+            "Ăn uống": (Decimal("45000"), 2),
+            "Di chuyển": (Decimal("120000"), 1),
+        }
+
+        # số dư mỗi nguồn tiền cập nhật đúng 1 lần cho cả file
+        after = _balances(user)
+        assert after["Ví"] == before["Ví"] - 45_000 - 35_000 - 10_000
+        assert after["Ngân hàng"] == before["Ngân hàng"] - 120_000 + 8_000_000
+        # (SQLAlchemy có thể gộp các UPDATE cùng dạng thành 1 executemany)
+        updates = [s for s in stats.statements if s.lstrip().upper().startswith("UPDATE MONEY_SOURCES")]
+        assert 1 <= len(updates) <= 2
+
+
+def test_import_non_finite_xlsx_cells(app, user):
+    """Ô số NaN / Infinity (XLSX) và số quá lớn là lỗi dòng, không hỏng cả file."""
+    from app.models import Expense
+
+    rows = [
+        ("Ngày", "Danh mục", "Mô tả", "Số tiền"),
+        (datetime(2026, 10, 1), "Ăn uống", "NaN", float("nan")),
+        (datetime(2026, 10, 1), "Ăn uống", "Inf", float("-inf")),
+        (datetime(2026, 10, 1), "Ăn uống", "To", Decimal("9" * 40)),
+        (datetime(2026, 10, 2), "Ăn uống", "Bún", 30000.0),
+    ]
+    with app.app_context():
+        out = import_transactions(user, rows)
+        assert out["inserted"] == {"expense": 1, "income": 0}
+        assert [e["row"] for e in out["errors"]] == [2, 3, 4]
+        assert Expense.query.filter_by(user_id=user).count() == 1
+
+
+def test_import_dry_run_writes_nothing(app, user):
+    from app.models import Expense
+
+    with app.app_context():
+        before = _balances(user)
+        out = import_transactions(
+            user, _csv("Ngày,Danh mục,Mô tả,Số tiền,Nguồn tiền\n2026-10-01,Ăn uống,Phở,45000,Ví\n"),
+            dry_run=True,
+        )
+        assert out["inserted"]["expense"] == 1
+        assert out["preview"][0]["amount"] == 45000.0
+        assert Expense.query.filter_by(user_id=user).count() == 0
+        assert _balances(user) == before
+
+
+def test_import_api_reports_oversized_row(user, client_for):
+    body = "Ngày,Danh mục,Mô tả,Số tiền\n2026-10-01,Ăn uống,Phở,45000\n2026-10-02,Ăn uống,To," + "9" * 40 + "\n"
+    resp = client_for(user).post(
+        "/api/import",
+        data={"file": (io.BytesIO(body.encode()), "a.csv")},
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    data = resp.get_json()
+    assert data["inserted"]["expense"] == 1
+    assert [e["row"] for e in data["errors"]] == [3]
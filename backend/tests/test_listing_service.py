@@ -0,0 +1,185 @@
+"""
+Phân trang keyset + KPI của các API danh sách (services/listing_service).
+
+Dữ liệu cố tình có nhiều giao dịch cùng ngày ở cả bảng chi lẫn bảng thu,
+trải qua ranh giới tháng: đi hết các trang phải ra đúng danh sách đầy đủ
+(không trùng, không sót) và KPI phải khớp SUM / COUNT trên bảng gốc.
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from app.services import listing_service
+
+D_FROM = date(2026, 8, 29)
+D_TO = date(2026, 9, 3)
+RANGE = f"from={D_FROM}&to={D_TO}"
+
+
+@pytest.fixture(scope="module")
+def seeded(app, new_user, client_for):
+    from app.extensions import db
+    from app.models import Category, Expense, Income
+    from app.services import rollup_service
+
+    uid = new_user()
+    with app.app_context():
+        food = Category(name="Ăn uống", type="expense", user_id=uid)
+        move = Category(name="Di chuyển", type="expense", user_id=uid)
+        salary = Category(name="Lương", type="income", user_id=uid)
+        db.session.add_all([food, move, salary])
+        db.session.flush()
+
+        n = 0
+        # 25/08 .. 06/09: rộng hơn [D_FROM, D_TO] để KPI phải trừ phần lẻ 2 đầu tháng
+        day = date(2026, 8, 25)
+        while day <= date(2026, 9, 6):
+            for k in range(3):
+                n += 1
+                e = Expense(
+                    user_id=uid, category_id=(food, move)[k % 2].id,
+                    amount=10_000 * n, spent_at=day, note=f"chi {n}",
+                )
+                db.session.add(e)
+                rollup_service.add_expense(e)  # như route tạo khoản chi
+            for k in range(2):
+                n += 1
+                i = Income(
+                    user_id=uid, category_id=salary.id,
+                    amount=100_000 * n, received_at=day, note=f"thu {n}",
+                )
+                db.session.add(i)
+                rollup_service.add_income(i)
+            day += timedelta(days=1)
+        db.session.commit()
+        ids = {"food": food.id, "salary": salary.id}
+
+    return uid, client_for(uid), ids
+
+
+def _walk(client, url, limit, key):
+    """Đi hết các trang (?limit=&cursor=) -> (danh sách item, KPI trang đầu)."""
+    items, kpi, cursor, pages = [], None, None, 0
+    while True:
+        page_url = f"{url}&limit={limit}" + (f"&cursor={cursor}" if cursor else "")
+        resp = client.get(page_url)
+        assert resp.status_code == 200, resp.get_data(as_text=True)
+        data = resp.get_json()
+        if kpi is None:
+            kpi = data.get("kpi")
+        else:
+            assert "kpi" not in data  # KPI chỉ tính ở trang đầu
+        assert len(data["items"]) <= limit
+        items += data["items"]
+        pages += 1
+        assert data["has_more"] == (data["next_cursor"] is not None)
+        cursor = data["next_cursor"]
+        if not cursor:
+            break
+        assert pages < 200
+    keys = [key(it) for it in items]
+    assert len(keys) == len(set(keys)), "trùng item giữa các trang"
+    return items, kpi
+
+
+def _sum_count(app, model, date_col, uid, category_id=None):
+    from sqlalchemy import func
+
+    from app.extensions import db
+
+    with app.app_context():
+        q = db.session.query(func.coalesce(func.sum(model.amount), 0), func.count(model.id)).filter(
+            model.user_id == uid, date_col >= D_FROM, date_col <= D_TO
+        )
+        if category_id:
+            q = q.filter(model.category_id == category_id)
+        total, count = q.one()
+    return int(total), count
+
+
+@pytest.mark.parametrize("limit", [1, 4, 7])
+def test_expenses_pages_match_full_list(app, seeded, limit):
+    from app.models import Expense
+
+    uid, client, _ = seeded
+    full = client.get(f"/api/expenses?{RANGE}").get_json()["items"]
+    paged, kpi = _walk(client, f"/api/expenses?{RANGE}", limit, key=lambda it: it["id"])
+    assert [it["id"] for it in paged] == [it["id"] for it in full]
+    keys = [(it["date"], it["id"]) for it in paged]
+    assert keys == sorted(keys, reverse=True)
+
+    total, count = _sum_count(app, Expense, Expense.spent_at, uid)
+    assert len(full) == count
+    assert kpi == {"total": total, "count": count, "avg": int(total / count)}
+
+
+def test_expenses_kpi_by_category(app, seeded):
+    from app.models import Expense
+
+    uid, client, ids = seeded
+    data = client.get(f"/api/expenses?{RANGE}&category_id={ids['food']}&limit=2").get_json()
+    total, count = _sum_count(app, Expense, Expense.spent_at, uid, ids["food"])
+    assert data["kpi"]["total"] == total and data["kpi"]["count"] == count
+
+
+@pytest.mark.parametrize("limit", [1, 3])
+def test_incomes_pages_match_full_list(app, seeded, limit):
+    from app.models import Income
+
+    uid, client, _ = seeded
+    full = client.get(f"/api/incomes?{RANGE}").get_json()["items"]
+    paged, kpi = _walk(client, f"/api/incomes?{RANGE}", limit, key=lambda it: it["id"])
+    assert [it["id"] for it in paged] == [it["id"] for it in full]
+
+    total, count = _sum_count(app, Income, Income.received_at, uid)
+    assert (kpi["total"], kpi["count"]) == (total, count)
+
+
+@pytest.mark.parametrize("limit", [1, 2, 5, 6])
+def test_transactions_pages_mix_both_tables(seeded, limit):
+    _, client, _ = seeded
+    url = f"/api/analytics/transactions?{RANGE}"
+    full = client.get(url).get_json()
+    paged, _ = _walk(client, url, limit, key=lambda it: it["desc"])
+    assert paged == full
+
+    # mới nhất trước; cùng ngày: chi trước thu; cùng loại: id (số trong note) giảm dần
+    days = (D_TO - D_FROM).days + 1
+    assert len(paged) == days * 5
+    first_day = paged[:5]
+    assert [it["kind"] for it in first_day] == ["expense"] * 3 + ["income"] * 2
+    assert all(it["date"] == D_TO.isoformat() for it in first_day)
+    numbers = [int(it["desc"].split()[1]) for it in first_day]
+    assert numbers[:3] == sorted(numbers[:3], reverse=True)
+    assert numbers[3:] == sorted(numbers[3:], reverse=True)
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        f"/api/expenses?{RANGE}&limit=2&cursor=not-a-cursor",
+        f"/api/incomes?{RANGE}&limit=2&cursor=not-a-cursor",
+        f"/api/analytics/transactions?{RANGE}&limit=2&cursor=not-a-cursor",
+        f"/api/expenses?{RANGE}&limit=abc",
+        # cursor hợp lệ nhưng của danh sách khác
+        f"/api/incomes?{RANGE}&limit=2&cursor=" + listing_service.encode_cursor("e", "2026-09-01", 5),
+    ],
+)
+def test_bad_cursor_is_400(seeded, url):
+    _, client, _ = seeded
+    assert client.get(url).status_code == 400
+
+
+def test_cursor_round_trip():
+    token = listing_service.encode_cursor("t", "2026-09-01", 1, 42)
+    assert listing_service.decode_cursor("t", token, 3) == [date(2026, 9, 1), 1, 42]
+    with pytest.raises(listing_service.CursorError):
+        listing_service.decode_cursor("e", token, 3)
+    with pytest.raises(listing_service.CursorError):
+        listing_service.decode_cursor("t", token, 2)
+
+
+def test_iso_day_accepts_sqlite_strings():
+    # qua UNION trên SQLite cột ngày có thể là chuỗi
+    assert listing_service.iso_day("2026-09-01") == "2026-09-01"
+    assert listing_service.iso_day(date(2026, 9, 1)) == "2026-09-01"
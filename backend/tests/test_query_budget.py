@@ -0,0 +1,114 @@
+"""
+Ngân sách số câu lệnh SQL cho các API danh sách (bắt N+1).
+
+Dữ liệu seed có nhiều danh mục / ngân sách / mục tiêu: nếu có endpoint quay
+lại kiểu "mỗi dòng 1 query" thì số câu lệnh vượt ngân sách và test fail
+(kèm danh sách câu lệnh đã chạy).
+"""
+from datetime import date, timedelta
+
+import pytest
+
+N_CATEGORIES = 6
+N_GOALS = 4
+
+
+@pytest.fixture(scope="module")
+def client(app, new_user, client_for):
+    from app.extensions import db
+    from app.models import Budget, Category, Expense, Income, PaymentMethod, SavingsGoal
+    from app.models.saving import SavingsHistory
+
+    today = date.today()
+    uid = new_user()
+
+    with app.app_context():
+        pm = PaymentMethod(name="Tiền mặt", user_id=uid)
+        cats = [
+            Category(name=f"Chi {i}", type="expense", user_id=uid) for i in range(N_CATEGORIES)
+        ]
+        salary = Category(name="Lương", type="income", user_id=uid)
+        db.session.add_all([pm, *cats, salary])
+        db.session.flush()
+
+        for i, c in enumerate(cats):
+            db.session.add(Budget(
+                user_id=uid, category_id=c.id,
+                period_year=today.year, period_month=today.month,
+                limit_amount=1_000_000 * (i + 1),
+            ))
+            for d in range(3):
+                db.session.add(Expense(
+                    user_id=uid, category_id=c.id, payment_method_id=pm.id,
+                    amount=50_000 * (d + 1), spent_at=today - timedelta(days=d), note=c.name,
+                ))
+        db.session.add(Income(
+            user_id=uid, category_id=salary.id, amount=8_000_000, received_at=today,
+        ))
+
+        for i in range(N_GOALS):
+            goal = SavingsGoal(
+                user_id=uid, name=f"Mục tiêu {i}", target_amount=20_000_000,
+                current_amount=1_000_000, monthly_contribution=500_000,
+                auto_contribute=True,
+            )
+            db.session.add(goal)
+            db.session.flush()
+            # đã góp AUTO tháng này -> GET /api/savings không ghi thêm
+            for method in ("auto", "manual", "manual"):
+                db.session.add(SavingsHistory(
+                    goal_id=goal.id, user_id=uid, amount=500_000,
+                    method=method, interval="monthly",
+                ))
+        db.session.commit()
+        goal_id = goal.id
+
+    c = client_for(uid)
+    c.month = today.strftime("%Y-%m")
+    c.goal_id = goal_id
+    return c
+
+
+def _get(client, url, n):
+    from app.utils.sql_stats import assert_max_statements
+
+    with assert_max_statements(n, url):
+        resp = client.get(url)
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    return resp.get_json()
+
+
+def test_budgets_list(client):
+    data = _get(client, f"/api/budgets/?month={client.month}", 3)
+    assert len(data["items"]) == N_CATEGORIES
+
+
+def test_budgets_summary(client):
+    _get(client, f"/api/budgets/summary?month={client.month}", 3)
+
+
+def test_budget_warnings(client):
+    _get(client, f"/api/budgets/ai/warnings?month={client.month}", 3)
+
+
+def test_dashboard_summary(client):
+    _get(client, f"/api/dashboard/summary?month={client.month}", 4)
+
+
+def test_expenses_list(client):
+    data = _get(client, "/api/expenses?limit=5", 2)
+    assert len(data["items"]) == 5
+
+
+def test_incomes_list(client):
+    _get(client, "/api/incomes?limit=5", 2)
+
+
+def test_savings_list(client):
+    data = _get(client, "/api/savings", 3)
+    assert len(data["items"]) == N_GOALS
+
+
+def test_savings_history(client):
+    data = _get(client, f"/api/savings/{client.goal_id}/history", 1)
+    assert len(data["items"]) == 3
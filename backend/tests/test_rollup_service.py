@@ -0,0 +1,142 @@
+"""
+Rollup ngày / (tháng, danh mục) luôn khớp bảng gốc sau khi tạo / sửa / xoá
+giao dịch qua API, và category_totals() trừ đúng phần lẻ tháng đầu / cuối.
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import func
+
+from app.services import rollup_service
+
+# tháng 8 -> 10/2026: đủ để có tháng đầu, tháng giữa và tháng cuối
+EXPENSES = [
+    # (ngày, danh mục, số tiền)
+    ("2026-08-03", "food", 40_000),
+    ("2026-08-20", "food", 55_000),
+    ("2026-08-31", "move", 30_000),
+    ("2026-09-01", "food", 70_000),
+    ("2026-09-15", "move", 25_000),
+    ("2026-09-30", "food", 15_000),
+    ("2026-10-01", "move", 90_000),
+    ("2026-10-10", "food", 60_000),
+    ("2026-10-31", "food", 35_000),
+]
+
+RANGES = [
+    (date(2026, 8, 1), date(2026, 10, 31)),   # trọn 3 tháng
+    (date(2026, 8, 20), date(2026, 10, 10)),  # lẻ cả 2 đầu
+    (date(2026, 8, 21), date(2026, 10, 9)),   # 2 đầu rơi giữa các giao dịch
+    (date(2026, 8, 31), date(2026, 9, 1)),    # qua đúng ranh giới tháng
+    (date(2026, 9, 2), date(2026, 9, 29)),    # trong 1 tháng, lẻ 2 đầu
+    (date(2026, 9, 1), date(2026, 9, 30)),    # trọn 1 tháng
+    (date(2026, 10, 11), date(2026, 10, 30)), # không có giao dịch
+]
+
+
+@pytest.fixture(scope="module")
+def seeded(app, new_user, client_for):
+    from app.extensions import db
+    from app.models import Category
+
+    uid = new_user()
+    with app.app_context():
+        cats = {
+            "food": Category(name="Ăn uống", type="expense", user_id=uid),
+            "move": Category(name="Di chuyển", type="expense", user_id=uid),
+            "salary": Category(name="Lương", type="income", user_id=uid),
+        }
+        db.session.add_all(cats.values())
+        db.session.commit()
+        cat_ids = {k: c.id for k, c in cats.items()}
+    return uid, client_for(uid), cat_ids
+
+
+def _direct_totals(uid, start, end, kind="expense"):
+    from app.extensions import db
+    from app.models import Expense, Income
+
+    model, col = (Expense, Expense.spent_at) if kind == "expense" else (Income, Income.received_at)
+    rows = (
+        db.session.query(model.category_id, func.sum(model.amount), func.count(model.id))
+        .filter(model.user_id == uid, col >= start, col <= end)
+        .group_by(model.category_id)
+    )
+    return {cid: (int(total), n) for cid, total, n in rows}
+
+
+def _rollup_totals(uid, start, end, kind="expense"):
+    from app.extensions import db
+
+    sub = rollup_service.category_totals(uid, start, end, kind=kind)
+    return {cid: (int(total), int(n)) for cid, total, n in db.session.query(sub)}
+
+
+def _assert_consistent(app, uid):
+    with app.app_context():
+        assert rollup_service.check_consistency(uid) == []
+        for start, end in RANGES:
+            for kind in ("expense", "income"):
+                assert _rollup_totals(uid, start, end, kind) == _direct_totals(uid, start, end, kind), (
+                    kind, start, end,
+                )
+
+
+def test_rollup_follows_create_update_delete(app, seeded):
+    uid, client, cats = seeded
+
+    created = []
+    for day, cat, amount in EXPENSES:
+        resp = client.post(
+            "/api/expenses",
+            json={"desc": f"{cat} {day}", "amount": amount, "category_id": cats[cat], "date": day},
+        )
+        assert resp.status_code == 201, resp.get_data(as_text=True)
+        created.append(resp.get_json()["item"]["id"])
+    for day, amount in (("2026-08-31", 5_000_000), ("2026-10-01", 5_200_000)):
+        resp = client.post(
+            "/api/incomes",
+            json={"amount": amount, "category_id": cats["salary"], "date": day, "note": "lương"},
+        )
+        assert resp.status_code == 201, resp.get_data(as_text=True)
+    _assert_consistent(app, uid)
+
+    # sửa: đổi số tiền, đổi ngày sang tháng khác, đổi danh mục
+    edits = [
+        (created[0], {"amount": 41_000}),
+        (created[2], {"date": "2026-09-02"}),          # 31/08 -> 02/09
+        (created[3], {"date": "2026-08-31", "amount": 75_000}),  # 01/09 -> 31/08
+        (created[6], {"category_id": cats["food"]}),
+        (created[8], {"date": "2026-09-30", "category_id": cats["move"]}),
+    ]
+    for expense_id, patch in edits:
+        resp = client.patch(f"/api/expenses/{expense_id}", json=patch)
+        assert resp.status_code == 200, resp.get_data(as_text=True)
+    _assert_consistent(app, uid)
+
+    # xoá: giao dịch đầu tháng, cuối tháng và giữa tháng
+    for expense_id in (created[1], created[5], created[7]):
+        assert client.delete(f"/api/expenses/{expense_id}").status_code == 200
+    _assert_consistent(app, uid)
+
+    with app.app_context():
+        # tháng 10 chỉ còn 1 khoản (đã đổi sang "food"): "move" không còn dòng nào
+        assert _rollup_totals(uid, date(2026, 10, 1), date(2026, 10, 31)) == {cats["food"]: (90_000, 1)}
+
+
+def test_check_consistency_reports_drift(app, seeded):
+    """Rollup bị lệch (ghi thẳng bảng gốc, bỏ qua rollup) -> check phát hiện, rebuild sửa."""
+    from app.extensions import db
+    from app.models import Expense
+
+    uid, _, cats = seeded
+    with app.app_context():
+        db.session.add(Expense(
+            user_id=uid, category_id=cats["move"], amount=12_345, spent_at=date(2026, 9, 10),
+        ))
+        db.session.commit()
+        issues = rollup_service.check_consistency(uid)
+        assert {i["table"] for i in issues} == {"user_daily_totals", "user_month_category_totals"}
+
+        rollup_service.rebuild(uid)
+    _assert_consistent(app, uid)